@@ -0,0 +1,102 @@
+"""
+Сравнение модели сценария на __slots__ с прежними вложенными словарями: память на кадр,
+fromJson/toJson и чтение полей, как в горячих путях сцены и инспектора.
+
+    python bench/bench_model.py [scenario.json] [--frames N] [--repeat R]
+
+Без файла сценарий собирается из tests/data/sample_scenario.json, повторенного до N кадров.
+"""
+import argparse
+import copy
+import gc
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+sys.path.insert(0, os.path.join(ROOT, "main"))
+
+from main import Scenario  # noqa: E402
+
+SAMPLE_SCENARIO = os.path.join(ROOT, "tests", "data", "sample_scenario.json")
+
+
+def loadData(path, frames):
+    with open(path or SAMPLE_SCENARIO, encoding="utf-8") as file:
+        data = json.load(file)
+    if path:
+        return data
+    sample = list(data.values())
+    return {str(i): copy.deepcopy(sample[i % len(sample)]) for i in range(frames)}
+
+
+def measureMemory(build):
+    gc.collect()
+    tracemalloc.start()
+    result = build()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return result, size
+
+
+def timed(repeat, function):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def readDicts(data):
+    # Как load_images/inspectorLoad до перехода на модель: строковые ключи и str(int(count))
+    total = 0
+    for frame in data.values():
+        total += frame["background"]["position"]["x"] + frame["background"]["scale"]["x"]
+        sprites = frame["sprite"]
+        for i in range(int(sprites["count"])):
+            sprite = sprites[str(i)]
+            total += sprite["position"]["x"] + sprite["scale"]["x"]
+        total += len(frame["text"]["text"]) + len(frame["ui"]["chapter"])
+    return total
+
+
+def readModel(scenario):
+    total = 0
+    for frame in scenario.values():
+        total += frame.background.position.x + frame.background.scale.x
+        for sprite in frame.sprites:
+            total += sprite.position.x + sprite.scale.x
+        total += len(frame.text.text) + len(frame.ui.chapter)
+    return total
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("scenario", nargs="?")
+    parser.add_argument("--frames", type=int, default=20000)
+    parser.add_argument("--repeat", type=int, default=5)
+    arguments = parser.parse_args()
+
+    text = json.dumps(loadData(arguments.scenario, arguments.frames), ensure_ascii=False)
+    data, dict_bytes = measureMemory(lambda: json.loads(text))
+    scenario, model_bytes = measureMemory(lambda: Scenario.fromJson(json.loads(text)))
+    assert scenario.toJson() == data
+    count = len(data)
+
+    print(f"{count} frames")
+    print(f"memory per frame: dicts {dict_bytes / count:.0f} B, model {model_bytes / count:.0f} B "
+          f"({model_bytes / dict_bytes:.0%})")
+    print(f"fromJson: {timed(arguments.repeat, lambda: Scenario.fromJson(data)) * 1000:.1f} ms")
+    print(f"toJson:   {timed(arguments.repeat, scenario.toJson) * 1000:.1f} ms")
+    dict_read = timed(arguments.repeat, lambda: readDicts(data))
+    model_read = timed(arguments.repeat, lambda: readModel(scenario))
+    print(f"field reads: dicts {dict_read * 1000:.1f} ms, model {model_read * 1000:.1f} ms "
+          f"({dict_read / model_read:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -3,60 +3,3080 @@ import os
 import subprocess
 import json
 import copy
+import hashlib
+import codecs
+import gc
+import math
+import contextlib
+import threading
+import argparse
+import re
+import multiprocessing
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from functools import partial
 from PyQt6.QtWidgets import (QApplication, QMainWindow, QScrollArea, QDialog, QWidget, 
-                             QGridLayout, QHBoxLayout, QGroupBox, QVBoxLayout, QFormLayout, 
-                             QLabel, QPushButton, QDockWidget, QTreeWidget, QTreeWidgetItem, 
+                             QHBoxLayout, QGroupBox, QVBoxLayout, QFormLayout, 
+                             QLabel, QPushButton, QDockWidget, 
                              QFileDialog, QToolBar, QGraphicsView, QGraphicsScene, 
-                             QGraphicsRectItem, QMessageBox, QSpinBox, QCheckBox,
+                             QMessageBox, QSpinBox, QCheckBox,
                              QComboBox, QTextEdit, QListWidget, QDoubleSpinBox, QFrame,
-                             QLineEdit, QListWidgetItem, QMenu,QGraphicsPixmapItem, QGraphicsTextItem, QSizePolicy)
+                             QLineEdit, QListWidgetItem, QMenu,QGraphicsPixmapItem, QGraphicsItem, QProgressBar, QGraphicsTextItem, QSizePolicy,
+                             QListView, QStackedWidget)
 from PyQt6.QtGui import (QAction, QIcon, QWheelEvent, QPainter, QPen, QBrush,
                           QPixmap, QTransform, QColor, QFont, QRegion, QPolygonF,
-                          QPainterPath) 
-from PyQt6.QtCore import Qt, pyqtSignal, QRectF, QPointF, QTimer, QElapsedTimer
+                          QPainterPath, QImage, QImageReader) 
+from PyQt6.QtCore import (Qt, pyqtSignal, QObject, QRectF, QPointF, QTimer, QElapsedTimer, QFileSystemWatcher,
+                          QRunnable, QThreadPool, QAbstractListModel, QModelIndex, QSize,
+                          QSortFilterProxyModel)
+from PyQt6 import sip
+
+try:
+    import numpy as np
+except ImportError:  # NumPy необязателен: без него таймлайн анимаций считается на списках
+    np = None
 
 BACKGROUND_FOLDER = "backgrounds/"
 SPRITES_FOLDER = "sprites/basic"
 MAIN_HERO_EMOTION_FOLDER = "sprites/makishiro"
-
-BUFFER_DATA = {}
+THUMBNAIL_CACHE_FOLDER = "cache/thumbnails"
+JOURNAL_PATH = "cache/journal.jsonl"
+ASSET_INDEX_PATH = "cache/asset_index.json"
+# QFileSystemWatcher следит только за папками: правку файла на месте видит лишь Refresh
+ASSET_REFRESH_TOOLTIP = "New, deleted and renamed files are picked up automatically.\nRefresh after editing a file in place."
+HERO_DIALOGUE_THEME = "packages/HeroMainDialogueTheme.png"
+DIALOGUE_THEME = "packages/notNeroMainDialogueTheme.png"
+
+
+_GC_PAUSE_LOCK = threading.Lock()
+_GC_PAUSE_DEPTH = 0
+
+
+@contextlib.contextmanager
+def gcPaused():
+    """
+    Отключает сборщик мусора на время массового создания объектов модели (загрузка, снимок
+    для сохранения): иначе он раз за разом обходит все уже созданные кадры. Вложенные вызовы
+    из разных потоков считаются, сборщик включается после выхода из последнего.
+    """
+    global _GC_PAUSE_DEPTH
+    with _GC_PAUSE_LOCK:
+        _GC_PAUSE_DEPTH += 1
+        gc.disable()
+    try:
+        yield
+    finally:
+        with _GC_PAUSE_LOCK:
+            _GC_PAUSE_DEPTH -= 1
+            if _GC_PAUSE_DEPTH == 0:
+                gc.enable()
+
+
+# Модель сценария. Кадры хранятся в компактных объектах со __slots__ вместо вложенных словарей;
+# fromJson/toJson переводят их в формат JSON-файла сценария и обратно без изменения схемы.
+
+def splitExtra(data, known):
+    """Неизвестные ключи сохраняются как есть, чтобы не потерять их при сохранении."""
+    if data.keys() <= known:
+        return None
+    extra = {key: value for key, value in data.items() if key not in known}
+    return extra or None
+
+
+class Vec2:
+    __slots__ = ("x", "y")
+
+    def __init__(self, x=0, y=0):
+        self.x = x
+        self.y = y
+
+    @classmethod
+    def fromJson(cls, data):
+        return cls(data.get("x", 0), data.get("y", 0))
+
+    def toJson(self):
+        return {"x": self.x, "y": self.y}
+
+
+class AnimationSettings:
+    """
+    Цель анимации. position — конечная позиция, scale — множитель к масштабу элемента в покое,
+    opacity — конечная прозрачность, easing — имя кривой из EASING_CURVES.
+    opacity и easing необязательны: None означает «не задано» и в JSON не пишется.
+    """
+    __slots__ = ("time", "position", "scale", "opacity", "easing", "extra")
+    KEYS = frozenset(("time", "position", "scale", "opacity", "easing"))
+
+    def __init__(self, time=0, position=None, scale=None, opacity=None, easing=None, extra=None):
+        self.time = time
+        self.position = position or Vec2(0, 0)
+        self.scale = scale or Vec2(1.0, 1.0)
+        self.opacity = opacity
+        self.easing = easing
+        self.extra = extra
+
+    @classmethod
+    def fromJson(cls, data):
+        return cls(data.get("time", 0),
+                   Vec2.fromJson(data.get("position", {})),
+                   Vec2.fromJson(data.get("scale", {"x": 1.0, "y": 1.0})),
+                   data.get("opacity"),
+                   data.get("easing"),
+                   splitExtra(data, cls.KEYS))
+
+    def toJson(self):
+        data = {"time": self.time, "position": self.position.toJson(), "scale": self.scale.toJson()}
+        if self.opacity is not None:
+            data["opacity"] = self.opacity
+        if self.easing is not None:
+            data["easing"] = self.easing
+        if self.extra:
+            data.update(self.extra)
+        return data
+
+
+class Background:
+    __slots__ = ("name", "position", "scale", "animation", "animationSettings", "extra")
+    KEYS = frozenset(("name", "position", "scale", "animation", "animationSettings"))
+
+    def __init__(self, name="", position=None, scale=None, animation=False, animationSettings=None, extra=None):
+        self.name = name
+        self.position = position or Vec2(0, 0)
+        self.scale = scale or Vec2(1, 1)
+        self.animation = animation
+        self.animationSettings = animationSettings
+        self.extra = extra
+
+    @classmethod
+    def fromJson(cls, data):
+        animationSettings = data.get("animationSettings")
+        return cls(data.get("name", ""),
+                   Vec2.fromJson(data.get("position", {})),
+                   Vec2.fromJson(data.get("scale", {"x": 1, "y": 1})),
+                   data.get("animation", False),
+                   AnimationSettings.fromJson(animationSettings) if animationSettings is not None else None,
+                   splitExtra(data, cls.KEYS))
+
+    def toJson(self):
+        data = {"name": self.name, "position": self.position.toJson(), "scale": self.scale.toJson(),
+                "animation": self.animation}
+        if self.animationSettings is not None:
+            data["animationSettings"] = self.animationSettings.toJson()
+        if self.extra:
+            data.update(self.extra)
+        return data
+
+
+class Sprite:
+    __slots__ = ("spriteId", "name", "position", "scale", "animation", "animationSettings", "extra")
+    KEYS = frozenset(("spriteId", "name", "position", "scale", "animation", "animationSettings"))
+
+    def __init__(self, spriteId="", name="", position=None, scale=None, animation=False, animationSettings=None, extra=None):
+        self.spriteId = spriteId
+        self.name = name
+        self.position = position or Vec2(0, 0)
+        self.scale = scale or Vec2(0.6, 0.6)
+        self.animation = animation
+        self.animationSettings = animationSettings
+        self.extra = extra
+
+    @classmethod
+    def fromJson(cls, data):
+        animationSettings = data.get("animationSettings")
+        return cls(data.get("spriteId", ""),
+                   data.get("name", ""),
+                   Vec2.fromJson(data.get("position", {})),
+                   Vec2.fromJson(data.get("scale", {"x": 0.6, "y": 0.6})),
+                   data.get("animation", False),
+                   AnimationSettings.fromJson(animationSettings) if animationSettings is not None else None,
+                   splitExtra(data, cls.KEYS))
+
+    def toJson(self):
+        data = {"spriteId": self.spriteId, "name": self.name, "position": self.position.toJson(),
+                "scale": self.scale.toJson(), "animation": self.animation}
+        if self.animationSettings is not None:
+            data["animationSettings"] = self.animationSettings.toJson()
+        if self.extra:
+            data.update(self.extra)
+        return data
+
+
+class Text:
+    __slots__ = ("charaName", "text", "extra")
+    KEYS = frozenset(("charaName", "text"))
+
+    def __init__(self, charaName="", text="", extra=None):
+        self.charaName = charaName
+        self.text = text
+        self.extra = extra
+
+    @classmethod
+    def fromJson(cls, data):
+        return cls(data.get("charaName", ""), data.get("text", ""), splitExtra(data, cls.KEYS))
+
+    def toJson(self):
+        data = {"charaName": self.charaName, "text": self.text}
+        if self.extra:
+            data.update(self.extra)
+        return data
+
+
+class UI:
+    __slots__ = ("time", "chapter", "emotion", "charaEmotion", "charaEmotionBackground",
+                 "charaEmotionBackgroundPosition", "charaEmotionBackgroundScale", "extra")
+    KEYS = frozenset(("time", "chapter", "emotion", "charaEmotion", "charaEmotionBackground",
+                       "charaEmotionBackgroundPosition", "charaEmotionBackgroundScale"))
+
+    def __init__(self, time="", chapter="", emotion=False, charaEmotion="", charaEmotionBackground="",
+                 charaEmotionBackgroundPosition=None, charaEmotionBackgroundScale=None, extra=None):
+        self.time = time
+        self.chapter = chapter
+        self.emotion = emotion
+        self.charaEmotion = charaEmotion
+        self.charaEmotionBackground = charaEmotionBackground
+        # В старых файлах этих полей может не быть — тогда они None и не попадают в JSON
+        self.charaEmotionBackgroundPosition = charaEmotionBackgroundPosition
+        self.charaEmotionBackgroundScale = charaEmotionBackgroundScale
+        self.extra = extra
+
+    @classmethod
+    def fromJson(cls, data):
+        position = data.get("charaEmotionBackgroundPosition")
+        scale = data.get("charaEmotionBackgroundScale")
+        return cls(data.get("time", ""),
+                   data.get("chapter", ""),
+                   data.get("emotion", False),
+                   data.get("charaEmotion", ""),
+                   data.get("charaEmotionBackground", ""),
+                   Vec2.fromJson(position) if position is not None else None,
+                   Vec2.fromJson(scale) if scale is not None else None,
+                   splitExtra(data, cls.KEYS))
+
+    def toJson(self):
+        data = {"time": self.time, "chapter": self.chapter, "emotion": self.emotion,
+                "charaEmotion": self.charaEmotion, "charaEmotionBackground": self.charaEmotionBackground}
+        if self.charaEmotionBackgroundPosition is not None:
+            data["charaEmotionBackgroundPosition"] = self.charaEmotionBackgroundPosition.toJson()
+        if self.charaEmotionBackgroundScale is not None:
+            data["charaEmotionBackgroundScale"] = self.charaEmotionBackgroundScale.toJson()
+        if self.extra:
+            data.update(self.extra)
+        return data
+
+
+class Frame:
+    """Кадр сценария. Спрайты — обычный список, поле count в JSON вычисляется при сохранении."""
+    __slots__ = ("background", "text", "ui", "sprites", "comment", "extra")
+    KEYS = frozenset(("background", "text", "ui", "sprite", "comment"))
+
+    def __init__(self, background=None, text=None, ui=None, sprites=None, comment="", extra=None):
+        self.background = background or Background()
+        self.text = text or Text()
+        self.ui = ui or UI(charaEmotionBackgroundPosition=Vec2(0, 0), charaEmotionBackgroundScale=Vec2(1, 1))
+        self.sprites = sprites if sprites is not None else []
+        self.comment = comment
+        self.extra = extra
+
+    @classmethod
+    def fromJson(cls, data):
+        sprite_data = data.get("sprite", {"count": 0})
+        sprites = [Sprite.fromJson(sprite_data[str(i)]) for i in range(int(sprite_data.get("count", 0)))]
+        return cls(Background.fromJson(data.get("background", {})),
+                   Text.fromJson(data.get("text", {})),
+                   UI.fromJson(data.get("ui", {})),
+                   sprites,
+                   data.get("comment", ""),
+                   splitExtra(data, cls.KEYS))
+
+    def toJson(self):
+        sprite_data = {"count": len(self.sprites)}
+        for i, sprite in enumerate(self.sprites):
+            sprite_data[str(i)] = sprite.toJson()
+        data = {"background": self.background.toJson(), "text": self.text.toJson(), "ui": self.ui.toJson(),
+                "sprite": sprite_data, "comment": self.comment}
+        if self.extra:
+            data.update(self.extra)
+        return data
+
+
+class Scenario(dict):
+    """Кадры сценария по ключам "0".."N" в порядке файла."""
+
+    @classmethod
+    def fromJson(cls, data):
+        return cls((key, Frame.fromJson(value)) for key, value in data.items())
+
+    def toJson(self):
+        return {key: frame.toJson() for key, frame in self.items()}
+
+
+BUFFER_DATA = Scenario()
 
 SETTINGS = {
     "scale_factor": 1.0,
-    "position": {"x": 0, "y": 0}
+    "position": {"x": 0, "y": 0},
+    "pixmap_cache_mb": 512,
+    "canvas_refresh_ms": 16,
+    "load_chunk_frames": 500,
+    "compact_json": False,
+    "preview_fps": 60,
+    "typing_ms_per_char": 30,
+    "frame_hold_ms": 1500,
+    "preload_frames": 2,
+    "prefetch_frames": 3,
+    "prefetch_budget_mb": 128,
+    "journal_flush_ms": 1000,
+    "asset_max_side": 4096,
+    "asset_max_mb": 20,
+    "undo_limit": 10000,
+    "undo_merge_ms": 1000
 }
 
 
+class PixmapCache:
+    """
+    Общий LRU-кэш декодированных QPixmap.
+    Ключ — путь к файлу, его mtime и уровень детализации, размер ограничен суммарным
+    объёмом пикселей в байтах. Уровень L — копия, уменьшенная в 2^(L/2) раз: сцена
+    держит изображение в том разрешении, в котором оно реально видно на экране.
+    """
+    LOD_MAX_LEVEL = 8  # 1/16 исходного размера
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._items = OrderedDict()  # (path, mtime) -> QPixmap
+        self._versions = {}          # path -> ключи загруженных уровней текущей версии файла
+        self._sizes = {}             # (path, mtime) -> исходный размер изображения
+
+    def pixmap(self, path, level=0):
+        """Возвращает QPixmap из кэша или декодирует файл. Для отсутствующего файла — пустой QPixmap."""
+        if not path:
+            return QPixmap()
+        key = self.cacheKey(path, level)
+        if key is None:
+            self.misses += 1
+            return QPixmap()
+
+        pixmap = self._items.get(key)
+        if pixmap is not None:
+            self._items.move_to_end(key)
+            self.hits += 1
+            return pixmap
+
+        self.misses += 1
+        pixmap = QPixmap.fromImage(self.readImage(key, self.sourceSize(key)))
+        if not pixmap.isNull():
+            self.insert(key, pixmap)
+        return pixmap
+
+    @staticmethod
+    def cacheKey(path, level=0):
+        """Ключ кэша (путь, mtime, уровень) или None, если файла нет."""
+        path = os.path.normpath(path)
+        try:
+            return path, os.stat(path).st_mtime_ns, level
+        except OSError:
+            return None
+
+    @staticmethod
+    def lodFactor(level):
+        return 2 ** (-level / 2)
+
+    @classmethod
+    def lodLevel(cls, display_scale):
+        """Самый мелкий уровень, разрешение которого не ниже нужного для масштаба на экране."""
+        if display_scale >= 1:
+            return 0
+        if display_scale <= 0:
+            return cls.LOD_MAX_LEVEL
+        return min(int(-2 * math.log2(display_scale) + 1e-9), cls.LOD_MAX_LEVEL)
+
+    def sourceSize(self, key):
+        """Размер исходного изображения по заголовку файла, без декодирования пикселей."""
+        size = self._sizes.get(key[:2])
+        if size is None:
+            size = QImageReader(key[0]).size()
+            self._sizes[key[:2]] = size
+        return size
+
+    @classmethod
+    def readImage(cls, key, source_size=None):
+        """Декодирует изображение нужного уровня. Безопасно вызывать из потока пула."""
+        reader = QImageReader(key[0])
+        if key[2]:
+            size = source_size if source_size is not None else reader.size()
+            if size.isValid():
+                factor = cls.lodFactor(key[2])
+                reader.setScaledSize(QSize(max(1, round(size.width() * factor)),
+                                           max(1, round(size.height() * factor))))
+        return reader.read()
+
+    def cached(self, key):
+        """Возвращает QPixmap по готовому ключу без декодирования или None."""
+        pixmap = self._items.get(key)
+        if pixmap is None:
+            self.misses += 1
+            return None
+        self._items.move_to_end(key)
+        self.hits += 1
+        return pixmap
+
+    def contains(self, key):
+        return key in self._items
+
+    def sizeOf(self, key):
+        """Объём закэшированного изображения в байтах или None, не трогая порядок LRU."""
+        pixmap = self._items.get(key)
+        return None if pixmap is None else self.pixmapBytes(pixmap)
+
+    def insert(self, key, pixmap):
+        # Файл изменился на диске — все уровни старой версии больше не нужны
+        for old_key in [old_key for old_key in self._versions.get(key[0], ()) if old_key[1] != key[1]]:
+            self._remove(old_key)
+
+        self._remove(key)
+        self._items[key] = pixmap
+        self._versions.setdefault(key[0], set()).add(key)
+        self.current_bytes += self.pixmapBytes(pixmap)
+
+        while self.current_bytes > self.max_bytes and len(self._items) > 1:
+            old_key, _ = next(iter(self._items.items()))
+            self._remove(old_key)
+            self.evictions += 1
+
+    def _remove(self, key):
+        pixmap = self._items.pop(key, None)
+        if pixmap is not None:
+            self.current_bytes -= self.pixmapBytes(pixmap)
+            versions = self._versions.get(key[0])
+            if versions is not None:
+                versions.discard(key)
+                if not versions:
+                    del self._versions[key[0]]
+
+    def clear(self):
+        self._items.clear()
+        self._versions.clear()
+        self._sizes.clear()
+        self.current_bytes = 0
+
+    @staticmethod
+    def pixmapBytes(pixmap):
+        return pixmap.width() * pixmap.height() * max(pixmap.depth(), 8) // 8
+
+    def stats(self):
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "items": len(self._items),
+            "bytes": self.current_bytes,
+            "max_bytes": self.max_bytes
+        }
+
+
+PIXMAP_CACHE = PixmapCache(SETTINGS["pixmap_cache_mb"] * 1024 * 1024)
+
+
+class ImagePreloadTask(QRunnable):
+    """Декодирует изображение в QImage в потоке пула."""
+
+    def __init__(self, preloader, key):
+        super().__init__()
+        self.preloader = preloader
+        self.key = key
+
+    def run(self):
+        image = PixmapCache.readImage(self.key)
+        if not sip.isdeleted(self.preloader):
+            self.preloader._loaded.emit(self.key, image)
+
+
+class ImagePreloader(QObject):
+    """
+    Заранее декодирует изображения следующих кадров в фоне и кладет их в PIXMAP_CACHE,
+    чтобы смена кадра при воспроизведении не ждала чтения PNG с диска.
+    """
+    _loaded = pyqtSignal(object, QImage)
+
+    def __init__(self):
+        super().__init__()
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(2)
+        self._pending = set()
+        self._loaded.connect(self._onLoaded)
+
+    def preloadKeys(self, keys, replace=False):
+        """
+        Ставит в очередь ключи кэша (путь, mtime, уровень) в порядке приоритета.
+        replace=True снимает еще не начатые задачи прежней очереди.
+        """
+        if replace:
+            self.pool.clear()
+            self._pending.clear()
+        for key in keys:
+            if key is None or key in self._pending or PIXMAP_CACHE.contains(key):
+                continue
+            self._pending.add(key)
+            self.pool.start(ImagePreloadTask(self, key))
+
+    def _onLoaded(self, key, image):
+        self._pending.discard(key)
+        # После replace уже идущая задача могла быть поставлена повторно
+        if not image.isNull() and not PIXMAP_CACHE.contains(key):
+            PIXMAP_CACHE.insert(key, QPixmap.fromImage(image))
+
+    def shutdown(self):
+        self.pool.clear()
+        self.pool.waitForDone()
+
+
+IMAGE_PRELOADER = ImagePreloader()
+
+
+class FramePrefetcher:
+    """
+    Предсказательная подгрузка изображений соседних кадров N±k при переходе по списку.
+    Текущий кадр грузит сама сцена, поэтому окно начинается с ±1: ближайшие кадры идут
+    первыми, следующий — раньше предыдущего. Суммарный объём окна ограничен
+    SETTINGS["prefetch_budget_mb"] (но не больше половины PIXMAP_CACHE),
+    чтобы подгрузка не вытесняла из кэша изображения текущего кадра.
+    """
+
+    def __init__(self, preloader):
+        self.preloader = preloader
+
+    @staticmethod
+    def offsets(window):
+        for distance in range(1, window + 1):
+            yield distance
+            yield -distance
+
+    @staticmethod
+    def imageBytes(key):
+        size = PIXMAP_CACHE.sizeOf(key)
+        if size is not None:
+            return size
+        source = PIXMAP_CACHE.sourceSize(key)
+        factor = PixmapCache.lodFactor(key[2])
+        return int(max(source.width(), 0) * max(source.height(), 0) * factor * factor * 4)
+
+    def prefetch(self, keys, row):
+        """keys — порядок кадров в списке, row — позиция текущего кадра."""
+        if row is None:
+            return
+        budget = min(SETTINGS["prefetch_budget_mb"] * 1024 * 1024, PIXMAP_CACHE.max_bytes // 2)
+        queue = []
+        # Изображения текущего кадра (общий фон и т.п.) не занимают бюджет окна
+        current = BUFFER_DATA.get(keys[row]) if 0 <= row < len(keys) else None
+        seen = set(FrameScene.frameImageKeys(current)) if current is not None else set()
+        used = 0
+        for offset in self.offsets(SETTINGS["prefetch_frames"]):
+            neighbour = row + offset
+            if not 0 <= neighbour < len(keys):
+                continue
+            frame = BUFFER_DATA.get(keys[neighbour])
+            if frame is None:
+                continue
+            for key in FrameScene.frameImageKeys(frame):
+                if key in seen:
+                    continue
+                seen.add(key)
+                used += self.imageBytes(key)
+                if used > budget:
+                    break
+                queue.append(key)
+            if used > budget:
+                break
+        self.preloader.preloadKeys(queue, replace=True)
+
+
+FRAME_PREFETCHER = FramePrefetcher(IMAGE_PRELOADER)
+
+
+class ThumbnailTask(QRunnable):
+    """Читает миниатюру из дискового кэша или декодирует и уменьшает исходное изображение."""
+
+    def __init__(self, loader, path, size, cache_path):
+        super().__init__()
+        self.loader = loader
+        self.path = path
+        self.size = size
+        self.cache_path = cache_path
+
+    def run(self):
+        image = QImage()
+        if os.path.exists(self.cache_path):
+            image.load(self.cache_path)
+
+        if image.isNull():
+            source = QImageReader(self.path).read()
+            if not source.isNull():
+                image = source.scaled(self.size, self.size, Qt.AspectRatioMode.KeepAspectRatio, Qt.TransformationMode.SmoothTransformation)
+                try:
+                    # Пишем во временный файл и переименовываем, чтобы не оставить битую миниатюру
+                    os.makedirs(os.path.dirname(self.cache_path), exist_ok=True)
+                    temp_path = f"{self.cache_path}.{os.getpid()}.tmp"
+                    if image.save(temp_path, "PNG"):
+                        os.replace(temp_path, self.cache_path)
+                except OSError as e:
+                    print(f"Failed to write thumbnail cache: {e}")
+
+        if not sip.isdeleted(self.loader):
+            self.loader._loaded.emit(self.path, self.size, image)
+
+
+class ThumbnailLoader(QObject):
+    """
+    Генерирует миниатюры для окон выбора в пуле потоков.
+    Готовые миниатюры лежат в PIXMAP_CACHE и на диске в THUMBNAIL_CACHE_FOLDER
+    (ключ — путь, размер и mtime), поэтому повторное открытие окна не декодирует PNG.
+    """
+    thumbnailReady = pyqtSignal(str, QPixmap)
+    _loaded = pyqtSignal(str, int, QImage)
+
+    def __init__(self):
+        super().__init__()
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(max(2, (os.cpu_count() or 2) - 1))
+        self._pending = {}  # (path, size) -> (ключ в PIXMAP_CACHE, отпечаток содержимого)
+        self._failed = set()  # (ключ, отпечаток) файлов, которые не декодируются
+        self._loaded.connect(self._onLoaded)
+
+    @staticmethod
+    def cacheKey(path, size):
+        """
+        Ключ миниатюры в PIXMAP_CACHE и отпечаток содержимого для имени файла на диске.
+        Для проиндексированных файлов отпечаток — хеш содержимого, так что копии одной
+        картинки делят одну миниатюру.
+        """
+        path = os.path.normpath(path)
+        record = ASSET_INDEX.record(path)
+        if record is not None and record.digest:
+            return (f"{path}@{size}", record.mtime), record.digest
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        return (f"{path}@{size}", stat.st_mtime_ns), f"{os.path.abspath(path)}|{stat.st_mtime_ns}|{stat.st_size}"
+
+    def thumbnail(self, path, size=200):
+        """Возвращает готовую миниатюру или None — тогда она придет сигналом thumbnailReady."""
+        if (path, size) in self._pending:
+            return None
+        result = self.cacheKey(path, size)
+        if result is None:
+            return QPixmap()
+        key, identity = result
+        # Битый файл не запрашивается повторно, пока не изменится
+        if (key, identity) in self._failed:
+            return QPixmap()
+
+        pixmap = PIXMAP_CACHE.cached(key)
+        if pixmap is not None:
+            return pixmap
+
+        digest = hashlib.sha1(f"{identity}|{size}".encode("utf-8")).hexdigest()
+        cache_path = os.path.join(THUMBNAIL_CACHE_FOLDER, f"{digest}.png")
+        self._pending[(path, size)] = (key, identity)
+        self.pool.start(ThumbnailTask(self, path, size, cache_path))
+        return None
+
+    def _onLoaded(self, path, size, image):
+        pending = self._pending.pop((path, size), None)
+        pixmap = QPixmap.fromImage(image) if not image.isNull() else QPixmap()
+        if pending is not None:
+            if pixmap.isNull():
+                self._failed.add(pending)
+            else:
+                PIXMAP_CACHE.insert(pending[0], pixmap)
+        self.thumbnailReady.emit(path, pixmap)
+
+    def shutdown(self):
+        """Отменяет ожидающие задачи и дожидается запущенных перед выходом."""
+        self.pool.clear()
+        self.pool.waitForDone()
+
+
+THUMBNAIL_LOADER = ThumbnailLoader()
+
+
+class ScenarioReader:
+    """
+    Потоковый разбор файла сценария: объект верхнего уровня читается по кадрам,
+    в памяти одновременно находится только небольшой кусок текста.
+    """
+    READ_SIZE = 1 << 20
+
+    def __init__(self, file):
+        self.file = file
+        self.decoder = json.JSONDecoder()
+        self.text_decoder = codecs.getincrementaldecoder("utf-8-sig")()
+        self.buffer = ""
+        self.pos = 0
+        self.eof = False
+        self.bytes_read = 0
+
+    def _fill(self):
+        """Дочитывает следующий блок файла; False — файл закончился."""
+        if self.eof:
+            return False
+        data = self.file.read(self.READ_SIZE)
+        self.bytes_read += len(data)
+        if not data:
+            self.eof = True
+        self.buffer = self.buffer[self.pos:] + self.text_decoder.decode(data, final=self.eof)
+        self.pos = 0
+        return not self.eof
+
+    def _skipSpace(self):
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in " \t\r\n":
+                self.pos += 1
+            if self.pos < len(self.buffer) or not self._fill():
+                return
+
+    def _expect(self, chars):
+        self._skipSpace()
+        char = self.buffer[self.pos] if self.pos < len(self.buffer) else ""
+        if not char or char not in chars:
+            raise ValueError(f"Expected one of {chars!r} at offset {self.bytes_read}")
+        self.pos += 1
+        return char
+
+    def _expectEnd(self):
+        """После объекта верхнего уровня допустимы только пробелы — как и в json.load."""
+        self._skipSpace()
+        if self.pos < len(self.buffer):
+            raise ValueError(f"Extra data after the scenario object at offset {self.bytes_read}")
+
+    def _value(self):
+        self._skipSpace()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError:
+                # Значение обрезано границей блока — дочитываем и пробуем снова
+                if self._fill():
+                    continue
+                raise
+            if end == len(self.buffer) and self._fill():
+                continue
+            self.pos = end
+            return value
+
+    def frames(self):
+        """Генерирует пары (ключ, словарь кадра) в порядке файла."""
+        self._expect("{")
+        self._skipSpace()
+        if self.buffer.startswith("}", self.pos):
+            self.pos += 1
+            self._expectEnd()
+            return
+        key = None
+        while True:
+            try:
+                key = self._value()
+                if not isinstance(key, str):
+                    raise ValueError(f"Expected frame key at offset {self.bytes_read}")
+                self._expect(":")
+                data = self._value()
+            except json.JSONDecodeError as e:
+                # Позиция в ошибке относится к текущему блоку, поэтому указываем кадр
+                raise ValueError(f"{e.msg} after frame '{key}'") from e
+            yield key, data
+            if self._expect(",}") == "}":
+                self._expectEnd()
+                return
+
+
+class ScenarioLoadTask(QRunnable):
+    """Разбирает файл в потоке пула и отдает кадры пачками."""
+
+    def __init__(self, loader, generation, path):
+        super().__init__()
+        self.loader = loader
+        self.generation = generation
+        self.path = path
+
+    def cancelled(self):
+        return sip.isdeleted(self.loader) or self.loader.generation != self.generation
+
+    def run(self):
+        error = ""
+        chunk = []
+        total = 0
+        try:
+            with gcPaused():
+                total = os.path.getsize(self.path)
+                with open(self.path, "rb") as file:
+                    reader = ScenarioReader(file)
+                    for key, data in reader.frames():
+                        chunk.append((key, Frame.fromJson(data)))
+                        if len(chunk) >= SETTINGS["load_chunk_frames"]:
+                            if self.cancelled():
+                                return
+                            self.loader._chunk.emit(self.generation, chunk, reader.bytes_read, total)
+                            chunk = []
+        except Exception as e:
+            error = str(e) or type(e).__name__
+
+        if self.cancelled():
+            return
+        if chunk:
+            self.loader._chunk.emit(self.generation, chunk, total, total)
+        self.loader._done.emit(self.generation, error)
+
+
+class ScenarioLoader(QObject):
+    """
+    Загружает сценарий в фоне. Кадры приходят сигналом framesLoaded пачками
+    по SETTINGS["load_chunk_frames"], так что первыми можно пользоваться до конца загрузки.
+    Новый вызов load отменяет предыдущую загрузку.
+    """
+    framesLoaded = pyqtSignal(str, object)   # путь, список (ключ, Frame)
+    progress = pyqtSignal(int, int)          # прочитано байт, размер файла
+    finished = pyqtSignal(str, str)          # путь, текст ошибки или ""
+    _chunk = pyqtSignal(int, object, int, int)
+    _done = pyqtSignal(int, str)
+
+    def __init__(self):
+        super().__init__()
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(1)
+        self.generation = 0
+        self.path = None
+        self._chunk.connect(self._onChunk)
+        self._done.connect(self._onDone)
+
+    def isLoading(self):
+        return self.path is not None
+
+    def load(self, path):
+        self.cancel()
+        self.path = path
+        self.pool.start(ScenarioLoadTask(self, self.generation, path))
+
+    def cancel(self):
+        self.generation += 1
+        self.path = None
+
+    def _onChunk(self, generation, chunk, done, total):
+        if generation != self.generation:
+            return
+        self.framesLoaded.emit(self.path, chunk)
+        self.progress.emit(done, total)
+
+    def _onDone(self, generation, error):
+        if generation != self.generation:
+            return
+        path, self.path = self.path, None
+        self.finished.emit(path, error)
+
+    def shutdown(self):
+        self.cancel()
+        self.pool.clear()
+        self.pool.waitForDone()
+
+
+SCENARIO_LOADER = ScenarioLoader()
+
 
+class ScenarioSaveTask(QRunnable):
+    """Пишет снимок сценария во временный файл рядом с целевым и атомарно подменяет его."""
+
+    def __init__(self, saver, path, snapshot, compact):
+        super().__init__()
+        self.saver = saver
+        self.path = path
+        self.snapshot = snapshot
+        self.compact = compact
+
+    def run(self):
+        error = ""
+        size = 0
+        timer = QElapsedTimer()
+        timer.start()
+        temp_path = f"{self.path}.{os.getpid()}.tmp"
+        try:
+            with open(temp_path, "w", encoding="utf-8") as file:
+                self.write(file)
+                file.flush()
+                os.fsync(file.fileno())
+                size = file.tell()
+            os.replace(temp_path, self.path)
+            self.syncDirectory(os.path.dirname(os.path.abspath(self.path)))
+        except Exception as e:
+            error = str(e) or type(e).__name__
+            try:
+                os.remove(temp_path)
+            except OSError:
+                pass
+
+        if not sip.isdeleted(self.saver):
+            self.saver._done.emit(self.path, error, timer.elapsed(), size)
+
+    def write(self, file):
+        """
+        Пишет кадры по одному. Кодировщик json держит GIL до конца вызова, и сериализация
+        всего сценария одним dumps останавливала бы интерфейс на время записи.
+        Отступы дают тот же текст, что json.dump(..., indent=4) для всего словаря.
+        """
+        if self.compact:
+            file.write("{")
+            for i, (key, frame) in enumerate(self.snapshot.items()):
+                if i:
+                    file.write(",")
+                file.write(json.dumps(key, ensure_ascii=False) + ":" +
+                           json.dumps(frame, ensure_ascii=False, separators=(",", ":")))
+            file.write("}")
+        else:
+            file.write("{")
+            for i, (key, frame) in enumerate(self.snapshot.items()):
+                file.write(",\n    " if i else "\n    ")
+                file.write(json.dumps(key, ensure_ascii=False) + ": " +
+                           json.dumps(frame, ensure_ascii=False, indent=4).replace("\n", "\n    "))
+            file.write("\n}" if self.snapshot else "}")
+
+    @staticmethod
+    def syncDirectory(directory):
+        """Фиксирует переименование на диске; на Windows каталог открыть нельзя — пропускаем."""
+        try:
+            fd = os.open(directory, os.O_RDONLY)
+        except OSError:
+            return
+        try:
+            os.fsync(fd)
+        except OSError:
+            pass
+        finally:
+            os.close(fd)
+
+
+class ScenarioSaver(QObject):
+    """
+    Сохраняет сценарий в фоне. Снимок BUFFER_DATA снимается в GUI-потоке при вызове save,
+    поэтому правки во время записи в файл не попадают. Сохранения выполняются по очереди.
+    """
+    finished = pyqtSignal(str, str, int, int, int)  # путь, ошибка или "", мс снимка, мс записи, байт
+    _done = pyqtSignal(str, str, int, int)
+
+    def __init__(self):
+        super().__init__()
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(1)
+        self.pending = []  # мс снимка для сохранений в очереди
+        self._done.connect(self._onDone)
+
+    def isSaving(self):
+        return bool(self.pending)
+
+    def save(self, path, compact=False):
+        timer = QElapsedTimer()
+        timer.start()
+        with gcPaused():
+            snapshot = BUFFER_DATA.toJson()
+        self.pending.append(timer.elapsed())
+        self.pool.start(ScenarioSaveTask(self, path, snapshot, compact))
+
+    def _onDone(self, path, error, write_ms, size):
+        snapshot_ms = self.pending.pop(0) if self.pending else 0
+        self.finished.emit(path, error, snapshot_ms, write_ms, size)
+
+    def shutdown(self):
+        """Дожидается записи начатых и поставленных в очередь сохранений."""
+        self.pool.waitForDone()
+
+
+SCENARIO_SAVER = ScenarioSaver()
+
+
+MISSING = object()  # значение отсутствует в JSON (ключ добавлен или удален)
+
+
+def jsonDiff(old, new, path=()):
+    """Отличия двух JSON-значений: список (путь, старое, новое), отсутствующее значение — MISSING."""
+    if isinstance(old, dict) and isinstance(new, dict):
+        changes = []
+        for name in list(new) + [name for name in old if name not in new]:
+            changes.extend(jsonDiff(old.get(name, MISSING), new.get(name, MISSING), path + (name,)))
+        return changes
+    # 1 == True в Python, но в JSON это разные значения
+    if old == new and type(old) is type(new):
+        return []
+    return [(list(path), old, new)]
+
+
+def jsonPatch(data, path, old, new):
+    """Применяет одно изменение jsonDiff к data. False, если текущее значение не совпало со старым."""
+    parent = data
+    for name in path[:-1]:
+        parent = parent.get(name) if isinstance(parent, dict) else None
+        if parent is None:
+            return False
+    if not isinstance(parent, dict):
+        return False
+    current = parent.get(path[-1], MISSING)
+    if current is not old and (current is MISSING or old is MISSING or current != old):
+        return False
+    if new is MISSING:
+        parent.pop(path[-1], None)
+    else:
+        parent[path[-1]] = copy.deepcopy(new)
+    return True
+
+
+class JournalWriteTask(QRunnable):
+    """Дописывает строки в журнал или атомарно переписывает его целиком."""
+
+    def __init__(self, path, lines, replace=False):
+        super().__init__()
+        self.path = path
+        self.lines = lines
+        self.replace = replace
+
+    def run(self):
+        text = "".join(line + "\n" for line in self.lines)
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            if self.replace:
+                temp_path = f"{self.path}.{os.getpid()}.tmp"
+                with open(temp_path, "w", encoding="utf-8") as file:
+                    file.write(text)
+                    file.flush()
+                    os.fsync(file.fileno())
+                os.replace(temp_path, self.path)
+                ScenarioSaveTask.syncDirectory(os.path.dirname(os.path.abspath(self.path)))
+            else:
+                with open(self.path, "a", encoding="utf-8") as file:
+                    file.write(text)
+                    file.flush()
+                    os.fsync(file.fileno())
+        except OSError as e:
+            print(f"Failed to write journal: {e}")
+
+
+class ScenarioJournal(QObject):
+    """
+    Журнал несохраненных правок: JSONL-файл, первая строка — файл сценария, на который
+    накладываются правки, дальше по записи на изменение поля кадра ("set"/"del" с путем,
+    старым и новым значением), добавление кадра ("add") или пакетную правку ("batch" —
+    список [ключ, путь, старое, новое], применяется целиком или не применяется).
+
+    Правки в инспекторе не сообщают о себе по отдельности: журнал держит JSON-снимок кадра,
+    открытого в инспекторе, и раз в SETTINGS["journal_flush_ms"], при смене кадра и перед
+    сохранением сравнивает его с BUFFER_DATA. Строки дописываются в файл в отдельном потоке
+    с fsync. После сохранения сценария журнал переписывается: в нем остаются только правки,
+    сделанные после снимка для сохранения.
+
+    Значения, которые инспектор и сцена дописывают в кадр сами (глава предыдущего кадра,
+    подогнанный масштаб фона), пишутся с пометкой "auto": без них последующие правки тех же
+    полей не наложились бы на файл, но и восстанавливать после одного просмотра кадров нечего.
+    """
+
+    def __init__(self, path):
+        super().__init__()
+        self.path = path
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(1)  # записи идут строго по порядку
+        self.timer = QTimer(self)
+        self.timer.timeout.connect(self.flush)
+        self.active = False
+        self.base = None
+        self.lines = []       # записи с последнего сохранения, уже сериализованные
+        self.queued = 0       # сколько из них отдано на запись
+        self.save_marks = []  # len(lines) на момент снимка каждого сохранения в очереди
+        self.key = None
+        self.shadow = None
+
+    def header(self):
+        return json.dumps({"op": "base", "file": self.base}, ensure_ascii=False)
+
+    def reset(self, base, records=()):
+        """Начинает журнал для сценария base (None — новый несохраненный) с уже известными записями."""
+        self.base = os.path.abspath(base) if base else None
+        self.lines = [json.dumps(record, ensure_ascii=False) for record in records]
+        self.queued = len(self.lines)
+        self.save_marks = []
+        self.shadow = BUFFER_DATA[self.key].toJson() if self.key in BUFFER_DATA else None
+        self.pool.start(JournalWriteTask(self.path, [self.header()] + self.lines, replace=True))
+        self.active = True
+        self.timer.start(SETTINGS["journal_flush_ms"])
+
+    def watch(self, key):
+        """Переключает отслеживание на кадр key; правки прежнего кадра записываются сразу."""
+        self.checkpoint()
+        self.key = key
+        self.shadow = BUFFER_DATA[key].toJson() if key in BUFFER_DATA else None
+
+    def checkpoint(self, auto=False):
+        if not self.active or self.shadow is None or self.key not in BUFFER_DATA:
+            return
+        current = BUFFER_DATA[self.key].toJson()
+        self.appendChanges([(self.key, path, old, new) for path, old, new in jsonDiff(self.shadow, current)], auto)
+        self.shadow = current
+
+    def absorb(self):
+        """Записывает как "auto" то, что инспектор или сцена дописали в кадр без правки пользователя."""
+        self.checkpoint(auto=True)
+
+    def appendChanges(self, changes, auto=False):
+        for key, path, old, new in changes:
+            record = {"op": "set" if new is not MISSING else "del", "key": key, "path": list(path)}
+            if old is not MISSING:
+                record["old"] = old
+            if new is not MISSING:
+                record["new"] = new
+            if auto:
+                record["auto"] = True
+            self.lines.append(json.dumps(record, ensure_ascii=False))
+
+    @staticmethod
+    def userEdits(records):
+        return sum(1 for record in records if not record.get("auto"))
+
+    def refreshShadow(self, changes):
+        if any(key == self.key for key, _, _, _ in changes) and self.key in BUFFER_DATA:
+            self.shadow = BUFFER_DATA[self.key].toJson()
+
+    def recordChanges(self, changes):
+        """Записывает изменения, внесенные в обход инспектора (отмена и повтор), по записи на поле."""
+        if self.active:
+            self.appendChanges(changes)
+        self.refreshShadow(changes)
+
+    def recordBatch(self, changes):
+        """
+        Записывает пакетную правку одной строкой. Вызывается после BatchEdit.apply; правки
+        инспектора, сделанные до пакета, должны быть зафиксированы checkpoint() перед ним.
+        """
+        if self.active and changes:
+            self.lines.append(json.dumps({"op": "batch", "changes": changes}, ensure_ascii=False))
+        self.refreshShadow(changes)
+
+    def frameAdded(self, key):
+        if self.active:
+            self.lines.append(json.dumps({"op": "add", "key": key, "frame": BUFFER_DATA[key].toJson()}, ensure_ascii=False))
+
+    def flush(self):
+        self.checkpoint()
+        if self.queued < len(self.lines):
+            self.pool.start(JournalWriteTask(self.path, self.lines[self.queued:]))
+            self.queued = len(self.lines)
+
+    def saveStarted(self):
+        """Вызывается непосредственно перед снимком BUFFER_DATA для сохранения."""
+        self.checkpoint()
+        self.save_marks.append(len(self.lines))
+
+    def saveFinished(self, path, error):
+        mark = self.save_marks.pop(0) if self.save_marks else 0
+        if error or not self.active:
+            return
+        # Все до снимка уже в файле сценария — переписываем журнал поверх него
+        self.base = os.path.abspath(path)
+        self.lines = self.lines[mark:]
+        self.save_marks = [saved - mark for saved in self.save_marks]
+        self.queued = len(self.lines)
+        self.pool.start(JournalWriteTask(self.path, [self.header()] + self.lines, replace=True))
+
+    @staticmethod
+    def read(path):
+        """Возвращает (файл сценария, записи) из журнала; оборванная последняя строка пропускается."""
+        try:
+            with open(path, encoding="utf-8") as file:
+                lines = file.read().splitlines()
+        except OSError:
+            return None, []
+        records = []
+        for line in lines:
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                break
+        if not records or records[0].get("op") != "base":
+            return None, []
+        return records[0].get("file"), records[1:]
+
+    @staticmethod
+    def patchBatch(frames, changes):
+        """Применяет пакет к JSON кадров целиком; при первом несовпадении откатывает уже внесенное."""
+        done = []
+        copied = []
+        for key, path, old, new in changes:
+            data = frames.get(key)
+            if data is None and key in BUFFER_DATA:
+                data = frames[key] = BUFFER_DATA[key].toJson()
+                copied.append(key)
+            if data is None or not path or not jsonPatch(data, path, old, new):
+                for key, path, old, new in reversed(done):
+                    jsonPatch(frames[key], path, new, old)
+                for key in copied:
+                    del frames[key]
+                return False
+            done.append((key, path, old, new))
+        return True
+
+    @staticmethod
+    def replay(records):
+        """
+        Применяет записи журнала к BUFFER_DATA. Останавливается на первой записи, старое
+        значение которой не совпадает с текущим (файл сценария изменился с тех пор).
+        Возвращает (число примененных записей, ключи добавленных кадров, ключи измененных кадров).
+        """
+        with gcPaused():
+            return ScenarioJournal.replayRecords(records)
+
+    @staticmethod
+    def replayRecords(records):
+        frames = {}
+        added = []
+        applied = 0
+        for record in records:
+            key = record.get("key")
+            if record.get("op") == "add":
+                # addFrame, как и при правке, записывает кадр под ключом целиком
+                frames[key] = copy.deepcopy(record["frame"])
+                if key not in BUFFER_DATA and key not in added:
+                    added.append(key)
+            elif record.get("op") in ("set", "del"):
+                data = frames.get(key)
+                if data is None:
+                    if key not in BUFFER_DATA:
+                        break
+                    data = frames[key] = BUFFER_DATA[key].toJson()
+                if not record.get("path") or not jsonPatch(data, record["path"], record.get("old", MISSING), record.get("new", MISSING)):
+                    break
+            elif record.get("op") == "batch":
+                if not ScenarioJournal.patchBatch(frames, record.get("changes", [])):
+                    break
+            else:
+                break
+            applied += 1
+
+        for key, data in frames.items():
+            BUFFER_DATA[key] = Frame.fromJson(data)
+        return applied, added, [key for key in frames if key not in added]
+
+    def shutdown(self):
+        """Дописывает последние правки перед выходом."""
+        self.timer.stop()
+        self.flush()
+        self.pool.waitForDone()
+
+
+JOURNAL = ScenarioJournal(JOURNAL_PATH)
 
 
+class FrameSearchIndex:
+    """
+    Инвертированный индекс для панели поиска: по каждому полю — слово -> номера кадров.
+    Номера выдаются в порядке файла, поэтому результаты сортируются как числа.
+    Индекс строится при первом запросе, дальше обновляется по кадрам: как и журнал,
+    он следит за кадром в инспекторе и переиндексирует его при смене кадра и перед запросом.
+
+    Запрос — слова через пробел, все должны найтись (AND):
+        слово  "фраза целиком"  поле:слово  поле:"фраза"  слово*  -слово
+    Поля: text, chara (name), chapter, comment, bg (background), sprite.
+    """
+    FIELDS = ("text", "chara", "chapter", "comment", "bg", "sprite")
+    ALIASES = {"name": "chara", "background": "bg"}
+    TOKEN = re.compile(r"\w+")
+    QUERY = re.compile(r'(-)?(?:(\w+):)?(?:"([^"]*)"?|(\S+))')
+
+    def __init__(self):
+        self.watched = None
+        self.clear()
+
+    def clear(self):
+        self.built = False
+        self.ids = {}     # key -> номер кадра
+        self.keys = []    # номер -> key
+        self.values = {}  # key -> значения FIELDS на момент индексации
+        self.postings = {field: {} for field in self.FIELDS}
+
+    @staticmethod
+    def frameValues(frame):
+        return (frame.text.text, frame.text.charaName, frame.ui.chapter, frame.comment,
+                frame.background.name, "\n".join([sprite.name for sprite in frame.sprites]))
+
+    @classmethod
+    def tokenize(cls, value):
+        return cls.TOKEN.findall(value.casefold()) if value else []
+
+    @classmethod
+    def indexTokens(cls, value):
+        """Слова значения; у слов с "_" (имена файлов) — еще и их части, чтобы sprite:blushed1 находил Rachel_blushed1."""
+        tokens = set(cls.tokenize(value))
+        for token in [token for token in tokens if "_" in token]:
+            tokens.update(part for part in token.split("_") if part)
+        return tokens
+
+    def rebuild(self):
+        self.clear()
+        self.built = True
+        # Имена, фоны, спрайты и главы повторяются — каждое значение разбирается один раз
+        groups = [{} for _ in self.FIELDS]  # значение -> номера кадров
+        for number, (key, frame) in enumerate(BUFFER_DATA.items()):
+            values = self.frameValues(frame)
+            self.ids[key] = number
+            self.keys.append(key)
+            self.values[key] = values
+            for group, value in zip(groups, values):
+                numbers = group.get(value)
+                if numbers is None:
+                    group[value] = [number]
+                else:
+                    numbers.append(number)
+        for field, group in zip(self.FIELDS, groups):
+            postings = self.postings[field]
+            for value, numbers in group.items():
+                for token in self.indexTokens(value):
+                    words = postings.get(token)
+                    if words is None:
+                        postings[token] = set(numbers)
+                    else:
+                        words.update(numbers)
+
+    def updateKeys(self, keys):
+        for key in keys:
+            self.update(key)
+
+    def update(self, key):
+        """Переиндексирует кадр, если его поля изменились; пропавший из BUFFER_DATA кадр убирается."""
+        if not self.built or key is None:
+            return
+        frame = BUFFER_DATA.get(key)
+        values = self.frameValues(frame) if frame is not None else None
+        old = self.values.get(key)
+        if values == old:
+            return
+        number = self.ids.get(key)
+        if number is None:
+            number = self.ids[key] = len(self.keys)
+            self.keys.append(key)
+        empty = ("",) * len(self.FIELDS)
+        for field, old_value, new_value in zip(self.FIELDS, old or empty, values or empty):
+            if old_value == new_value:
+                continue
+            postings = self.postings[field]
+            old_tokens = self.indexTokens(old_value)
+            new_tokens = self.indexTokens(new_value)
+            for token in old_tokens - new_tokens:
+                numbers = postings[token]
+                numbers.discard(number)
+                if not numbers:
+                    del postings[token]
+            for token in new_tokens - old_tokens:
+                postings.setdefault(token, set()).add(number)
+        if values is None:
+            del self.values[key]
+        else:
+            self.values[key] = values
+
+    def watch(self, key):
+        self.update(self.watched)
+        self.watched = key
+
+    def matchTerm(self, field, text, prefix):
+        """Номера кадров, где в поле field (None — в любом) есть все слова text подряд."""
+        tokens = self.tokenize(text)
+        if not tokens:
+            return None
+        # У префиксного запроса "*" в конце не входит во фразу
+        needle = (text.rstrip("*") if prefix else text).casefold() if len(tokens) > 1 else None
+        found = set()
+        for column, name in enumerate(self.FIELDS):
+            if field is not None and name != field:
+                continue
+            postings = self.postings[name]
+            numbers = None
+            for position, token in enumerate(tokens):
+                if prefix and position == len(tokens) - 1:
+                    candidates = set().union(*[words for word, words in postings.items() if word.startswith(token)])
+                else:
+                    candidates = postings.get(token, set())
+                numbers = candidates if numbers is None else numbers & candidates
+                if not numbers:
+                    break
+            if numbers and needle is not None:
+                # Слова найдены по отдельности — проверяем, что они идут подряд
+                numbers = {number for number in numbers if needle in self.values[self.keys[number]][column].casefold()}
+            if numbers:
+                found |= numbers
+        return found
+
+    def search(self, query):
+        """Возвращает (ключи найденных кадров в порядке файла, ошибка запроса)."""
+        if not self.built:
+            self.rebuild()
+        self.update(self.watched)
+        result = None
+        excluded = set()
+        terms = 0
+        for match in self.QUERY.finditer(query):
+            negated, field, phrase, word = match.groups()
+            if field is not None:
+                field = self.ALIASES.get(field.lower(), field.lower())
+                if field not in self.FIELDS:
+                    return [], f"Unknown field: {match.group(2)}"
+            prefix = phrase is None and word.endswith("*")
+            numbers = self.matchTerm(field, phrase if phrase is not None else word, prefix)
+            if numbers is None:
+                continue
+            terms += 1
+            if negated:
+                excluded |= numbers
+            else:
+                result = numbers if result is None else result & numbers
+        if result is None:
+            if not terms:
+                return [], ""
+            result = {self.ids[key] for key in self.values}
+        return [self.keys[number] for number in sorted(result - excluded)], ""
+
+
+SEARCH_INDEX = FrameSearchIndex()
+
+
+class BatchEdit:
+    """
+    Пакетная правка кадров. Операции только составляют список изменений
+    (ключ, путь в JSON кадра, старое значение, новое) — как записи журнала, — а apply
+    вносит их в BUFFER_DATA за один проход. Тот же список, примененный с reverse=True,
+    откатывает пакет целиком.
+    """
+    TEXT_FIELDS = {"text": "Dialogue text", "chara": "Speaker name", "chapter": "Chapter",
+                   "comment": "Comment", "bg": "Background image", "sprite": "Sprite image"}
+    TEXT_PATHS = {"text": ("text", "text"), "chara": ("text", "charaName"), "chapter": ("ui", "chapter"),
+                  "comment": ("comment",), "bg": ("background", "name")}
+
+    @staticmethod
+    def spritePath(index, *names):
+        return ("sprite", str(index)) + names
+
+    @classmethod
+    def textTargets(cls, frame, field):
+        """(путь, объект, атрибут) для текстового поля кадра; у спрайтов — по одному на спрайт."""
+        if field == "sprite":
+            return [(cls.spritePath(i, "name"), sprite, "name") for i, sprite in enumerate(frame.sprites)]
+        path = cls.TEXT_PATHS[field]
+        return [(path, getattr(frame, path[0]) if len(path) > 1 else frame, path[-1])]
+
+    @staticmethod
+    def frameTarget(frame, path):
+        """Объект кадра и имя атрибута по пути в JSON кадра (имена полей JSON совпадают с атрибутами)."""
+        target = frame
+        names = iter(path[:-1])
+        for name in names:
+            target = target.sprites[int(next(names))] if name == "sprite" else getattr(target, name)
+        return target, path[-1]
+
+    @classmethod
+    def apply(cls, changes, reverse=False):
+        for key, path, old, new in (reversed(changes) if reverse else changes):
+            target, name = cls.frameTarget(BUFFER_DATA[key], path)
+            setattr(target, name, old if reverse else new)
+
+    @classmethod
+    def replaceText(cls, keys, field, find, replacement, whole=False):
+        """Заменяет подстроку find (при whole — значение целиком) в текстовом поле."""
+        changes = []
+        for key in keys:
+            for path, target, name in cls.textTargets(BUFFER_DATA[key], field):
+                value = getattr(target, name)
+                if whole:
+                    new = replacement if value == find else value
+                else:
+                    new = value.replace(find, replacement) if find in value else value
+                if new != value:
+                    changes.append((key, path, value, new))
+        return changes
+
+    @classmethod
+    def shiftSprites(cls, keys, dx, dy, name=""):
+        """Сдвигает спрайты; name — часть имени файла, по которой выбираются спрайты."""
+        name = name.casefold()
+        # Целые координаты остаются целыми, если сдвиг целый
+        axes = [(axis, int(delta) if float(delta).is_integer() else delta)
+                for axis, delta in (("x", dx), ("y", dy)) if delta]
+        paths = {}  # пути неизменяемы и общие для всех изменений пакета
+        changes = []
+        for key in keys:
+            for i, sprite in enumerate(BUFFER_DATA[key].sprites):
+                if name and name not in sprite.name.casefold():
+                    continue
+                position = sprite.position
+                for axis, delta in axes:
+                    path = paths.get((i, axis))
+                    if path is None:
+                        path = paths[(i, axis)] = cls.spritePath(i, "position", axis)
+                    value = getattr(position, axis)
+                    new = value + delta
+                    changes.append((key, path, value, new if isinstance(new, int) else round(new, 6)))
+        return changes
+
+    @classmethod
+    def setChapter(cls, keys, chapter):
+        return [(key, cls.TEXT_PATHS["chapter"], BUFFER_DATA[key].ui.chapter, chapter)
+                for key in keys if BUFFER_DATA[key].ui.chapter != chapter]
+
+
+class UndoStep:
+    """Шаг истории: изменения (ключ, путь, старое, новое); batch — пакет BatchEdit, применяемый к атрибутам."""
+    __slots__ = ("changes", "batch", "time")
+
+    def __init__(self, changes, batch=False, time=0):
+        self.changes = changes
+        self.batch = batch
+        self.time = time
+
+    @staticmethod
+    def inverse(changes):
+        return [(key, path, new, old) for key, path, old, new in reversed(changes)]
+
+
+class UndoHistory(QObject):
+    """
+    История отмены правок BUFFER_DATA. Шаг хранит только изменившиеся поля — те же
+    (ключ, путь, старое, новое), что пишет журнал, — поэтому память растет с размером
+    правки, а не сценария. Как и журнал, история держит JSON-снимок кадра в инспекторе и
+    после каждой правки сравнивает его с кадром. Правки тех же полей того же кадра,
+    идущие чаще SETTINGS["undo_merge_ms"] (шаги спинбокса, набор текста), сливаются в один шаг.
+    """
+    changed = pyqtSignal()
+
+    def __init__(self):
+        super().__init__()
+        self.undoSteps = []
+        self.redoSteps = []
+        self.key = None
+        self.shadow = None
+        self.mergeable = False  # можно ли дописать следующую правку в последний шаг
+        self.clock = QElapsedTimer()
+        self.clock.start()
+
+    def reset(self):
+        self.undoSteps.clear()
+        self.redoSteps.clear()
+        self.mergeable = False
+        self.changed.emit()
+
+    def watch(self, key):
+        """Переключает историю на кадр key; снимок берется после привязки инспектора к кадру."""
+        self.checkpoint()
+        self.key = key
+        self.shadow = BUFFER_DATA[key].toJson() if key in BUFFER_DATA else None
+        self.mergeable = False
+
+    def checkpoint(self):
+        if self.shadow is None or self.key not in BUFFER_DATA:
+            return
+        current = BUFFER_DATA[self.key].toJson()
+        changes = [(self.key, tuple(path), old, new) for path, old, new in jsonDiff(self.shadow, current)]
+        self.shadow = current
+        if not changes:
+            return
+        now = self.clock.elapsed()
+        top = self.undoSteps[-1] if self.undoSteps else None
+        if (self.mergeable and top is not None and not top.batch and now - top.time <= SETTINGS["undo_merge_ms"]
+                and [change[:2] for change in top.changes] == [change[:2] for change in changes]):
+            merged = [(key, path, old, change[3]) for (key, path, old, _), change in zip(top.changes, changes)]
+            top.changes = [change for change in merged if change[2] != change[3] or type(change[2]) is not type(change[3])]
+            top.time = now
+            if not top.changes:
+                self.undoSteps.pop()
+                self.mergeable = False
+        else:
+            self.push(UndoStep(changes, time=now))
+            self.mergeable = True
+        self.changed.emit()
+
+    def pushBatch(self, changes):
+        """Добавляет уже внесенный пакет BatchEdit одним шагом."""
+        self.push(UndoStep(changes, batch=True, time=self.clock.elapsed()))
+        self.mergeable = False
+        self.refreshShadow(changes)
+        self.changed.emit()
+
+    def push(self, step):
+        self.undoSteps.append(step)
+        if len(self.undoSteps) > SETTINGS["undo_limit"]:
+            del self.undoSteps[0]
+        self.redoSteps.clear()
+
+    def refreshShadow(self, changes):
+        if any(key == self.key for key, _, _, _ in changes) and self.key in BUFFER_DATA:
+            self.shadow = BUFFER_DATA[self.key].toJson()
+
+    def absorb(self):
+        """Принимает текущее состояние кадра без шага: сцена сама дописала вычисленные значения."""
+        if self.key in BUFFER_DATA:
+            self.shadow = BUFFER_DATA[self.key].toJson()
+
+    def canUndo(self):
+        return bool(self.undoSteps)
+
+    def canRedo(self):
+        return bool(self.redoSteps)
+
+    def undo(self):
+        return self.step(self.undoSteps, self.redoSteps, True)
+
+    def redo(self):
+        return self.step(self.redoSteps, self.undoSteps, False)
+
+    def step(self, source, target, reverse):
+        """
+        Переносит шаг между стеками и применяет его. Возвращает (внесенные изменения, batch)
+        или None. Если кадр успел измениться мимо истории, история очищается.
+        """
+        self.checkpoint()
+        self.mergeable = False
+        if not source:
+            return None
+        step = source.pop()
+        changes = UndoStep.inverse(step.changes) if reverse else step.changes
+        if step.batch:
+            BatchEdit.apply(step.changes, reverse)
+        else:
+            frames = {}
+            if not ScenarioJournal.patchBatch(frames, changes):
+                self.reset()
+                return None
+            for key, data in frames.items():
+                BUFFER_DATA[key] = Frame.fromJson(data)
+        target.append(step)
+        self.refreshShadow(changes)
+        self.changed.emit()
+        return changes, step.batch
+
+
+UNDO_HISTORY = UndoHistory()
+
+
+class AssetRecord:
+    """Файл в индексе ассетов: размер, mtime, размеры изображения, хеш содержимого и ошибка PNG."""
+    __slots__ = ("size", "mtime", "width", "height", "digest", "error")
+
+    def __init__(self, size, mtime, width=0, height=0, digest="", error=""):
+        self.size = size
+        self.mtime = mtime
+        self.width = width
+        self.height = height
+        self.digest = digest
+        self.error = error
+
+    @classmethod
+    def fromJson(cls, data):
+        return cls(*data)
+
+    def toJson(self):
+        return [self.size, self.mtime, self.width, self.height, self.digest, self.error]
+
+
+class AssetScanTask(QRunnable):
+    def __init__(self, index, folders, known, generation):
+        super().__init__()
+        self.index = index
+        self.folders = folders
+        self.known = known
+        self.generation = generation
+
+    def run(self):
+        scanned = AssetIndex.scanFolders(self.folders, self.known)
+        if not sip.isdeleted(self.index):
+            self.index._scanned.emit(self.folders, scanned, self.generation)
+
+
+class AssetIndex(QObject):
+    """
+    Индекс файлов в папках ассетов: размер, mtime, размеры PNG и хеш содержимого.
+    Хранится в ASSET_INDEX_PATH; при запуске сверяется с диском в фоне, и заново читаются
+    только файлы с изменившимися размером или mtime. Дальше папки отслеживает
+    QFileSystemWatcher (появление, удаление, переименование файлов), а кнопка Refresh в окнах
+    выбора пересматривает папку и ловит правки файлов на месте.
+    Каждый пересмотр получает номер; результат фоновой сверки не записывается в папки,
+    которые после ее запуска уже пересмотрены заново (например, синхронно по Refresh).
+    Окна выбора, миниатюры и проверка ассетов берут данные отсюда, а не с диска.
+    """
+    ROOTS = ("backgrounds", "sprites", "packages")
+    VERSION = 1
+    HASH_READ_SIZE = 1 << 20
+    changed = pyqtSignal(list)  # пересмотренные папки
+    _scanned = pyqtSignal(list, object, int)
+
+    def __init__(self, path):
+        super().__init__()
+        self.path = path
+        self.folders = {}  # папка -> {имя файла: AssetRecord}
+        self.ready = False
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(1)
+        self.watcher = None
+        self._dirty = set()
+        self.generation = 0
+        self.generations = {}  # папка -> номер последнего запущенного по ней пересмотра
+        self._scanned.connect(self._onScanned)
+
+    def start(self):
+        """Загружает сохраненный индекс, запускает сверку с диском и наблюдение за папками."""
+        self.load()
+        self.ready = bool(self.folders)
+        self.watcher = QFileSystemWatcher(self)
+        self.watcher.directoryChanged.connect(self.onDirectoryChanged)
+        self.rescanTimer = QTimer(self)
+        self.rescanTimer.setSingleShot(True)
+        self.rescanTimer.setInterval(300)  # копирование пачки файлов дает серию уведомлений
+        self.rescanTimer.timeout.connect(self.rescanDirty)
+        self.rescan(list(self.ROOTS))
+
+    def load(self):
+        try:
+            with open(self.path, encoding="utf-8") as file:
+                data = json.load(file)
+        except (OSError, ValueError):
+            return
+        if not isinstance(data, dict) or data.get("version") != self.VERSION:
+            return
+        for path, record in data.get("files", {}).items():
+            folder, name = os.path.split(path)
+            self.folders.setdefault(folder, {})[name] = AssetRecord.fromJson(record)
+
+    def save(self):
+        data = {"version": self.VERSION, "files": {path: record.toJson() for path, record in self.snapshot().items()}}
+        temp_path = f"{self.path}.{os.getpid()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(temp_path, "w", encoding="utf-8") as file:
+                json.dump(data, file, ensure_ascii=False, separators=(",", ":"))
+            os.replace(temp_path, self.path)
+        except OSError as e:
+            print(f"Failed to write asset index: {e}")
+
+    @classmethod
+    def inspect(cls, path, stat):
+        """Хеширует файл и читает заголовок PNG за один проход."""
+        digest = hashlib.blake2b(digest_size=16)
+        header = tail = b""
+        try:
+            with open(path, "rb") as file:
+                while True:
+                    chunk = file.read(cls.HASH_READ_SIZE)
+                    if not chunk:
+                        break
+                    if not header:
+                        header = chunk[:24]
+                    digest.update(chunk)
+                    tail = (tail + chunk)[-len(AssetValidator.PNG_END):]
+        except OSError as e:
+            return AssetRecord(stat.st_size, stat.st_mtime_ns, error=str(e))
+        width, height, error = AssetValidator.readPngInfo(header, tail)
+        return AssetRecord(stat.st_size, stat.st_mtime_ns, width, height, digest.hexdigest(), error)
+
+    @classmethod
+    def scanFolders(cls, roots, known):
+        """
+        Рекурсивно обходит roots. Файлы с прежними размером и mtime берутся из known
+        ({папка: {имя: AssetRecord}}), остальные хешируются параллельно.
+        Возвращает {папка: {имя: AssetRecord}}.
+        """
+        scanned = {}
+        changed = []
+        for root in roots:
+            if not os.path.isdir(root):
+                continue
+            for folder, _, names in os.walk(root):
+                folder = os.path.normpath(folder)
+                previous = known.get(folder, {})
+                files = scanned[folder] = {}
+                for name in names:
+                    path = os.path.join(folder, name)
+                    try:
+                        stat = os.stat(path)
+                    except OSError:
+                        continue
+                    record = previous.get(name)
+                    if record is not None and record.size == stat.st_size and record.mtime == stat.st_mtime_ns:
+                        files[name] = record
+                    else:
+                        changed.append((files, name, path, stat))
+
+        if changed:
+            with ThreadPoolExecutor(max_workers=4) as executor:
+                records = executor.map(lambda entry: cls.inspect(entry[2], entry[3]), changed)
+                for (files, name, _, _), record in zip(changed, records):
+                    files[name] = record
+        return scanned
+
+    def merge(self, roots, scanned, generation=None):
+        """
+        Заменяет в индексе поддеревья roots результатом scanFolders. С номером generation
+        папки, пересмотренные позже него, остаются как есть.
+        """
+        fresh = (lambda folder: True) if generation is None else (lambda folder: not self.isStale(folder, generation))
+        for root in roots:
+            root = os.path.normpath(root)
+            for folder in [folder for folder in self.folders if folder == root or folder.startswith(root + os.sep)]:
+                if fresh(folder):
+                    del self.folders[folder]
+        self.folders.update((folder, files) for folder, files in scanned.items() if fresh(folder))
+
+    def startGeneration(self, roots):
+        self.generation += 1
+        for root in roots:
+            self.generations[os.path.normpath(root)] = self.generation
+        return self.generation
+
+    def isStale(self, folder, generation):
+        """Папку или ее родителя пересмотрели после запуска пересмотра generation."""
+        return any(started > generation and (folder == root or folder.startswith(root + os.sep))
+                   for root, started in self.generations.items())
+
+    def rescan(self, roots):
+        known = {folder: dict(files) for folder, files in self.folders.items()}
+        self.pool.start(AssetScanTask(self, roots, known, self.startGeneration(roots)))
+
+    def covers(self, folder):
+        return os.path.normpath(folder).split(os.sep, 1)[0] in self.ROOTS
+
+    def rescanNow(self, folder):
+        """Синхронно пересматривает одну папку (кнопка Refresh): читаются только измененные файлы."""
+        if not self.covers(folder):
+            return
+        folder = os.path.normpath(folder)
+        self.startGeneration([folder])
+        self.merge([folder], self.scanFolders([folder], self.folders))
+        self.save()
+
+    def _onScanned(self, roots, scanned, generation):
+        self.merge(roots, scanned, generation)
+        self.ready = True
+        if self.watcher is not None:
+            watched = set(self.watcher.directories())
+            new_folders = [folder for folder in self.folders if folder not in watched and os.path.isdir(folder)]
+            if new_folders:
+                self.watcher.addPaths(new_folders)
+        self.save()
+        self.changed.emit(roots)
+
+    def onDirectoryChanged(self, folder):
+        self._dirty.add(folder)
+        self.rescanTimer.start()
+
+    def rescanDirty(self):
+        dirty, self._dirty = sorted(self._dirty), set()
+        # Вложенные папки пересматриваются вместе с родительской
+        roots = [folder for folder in dirty if not any(folder.startswith(other + os.sep) for other in dirty)]
+        self.rescan(roots)
+
+    def images(self, folder):
+        """PNG-файлы папки в виде [(имя, путь)], как listImages, но без обращения к диску."""
+        files = self.folders.get(os.path.normpath(folder)) if self.ready else None
+        if files is None:
+            return listImages(folder)
+        return [(name, os.path.join(folder, name)) for name in sorted(files) if name.lower().endswith(".png")]
+
+    def hasFolder(self, folder):
+        if self.ready and self.covers(folder):
+            return os.path.normpath(folder) in self.folders
+        return os.path.isdir(folder)
+
+    def record(self, path):
+        folder, name = os.path.split(os.path.normpath(path))
+        files = self.folders.get(folder)
+        return files.get(name) if files is not None else None
+
+    def snapshot(self):
+        return {os.path.join(folder, name): record
+                for folder, files in self.folders.items() for name, record in files.items()}
+
+    def duplicates(self):
+        """Группы путей с одинаковым содержимым, самые тяжелые первыми."""
+        groups = {}
+        for path, record in self.snapshot().items():
+            if record.digest and not record.error:
+                groups.setdefault(record.digest, []).append(path)
+        duplicates = [sorted(paths) for paths in groups.values() if len(paths) > 1]
+        duplicates.sort(key=lambda paths: -self.record(paths[0]).size * (len(paths) - 1))
+        return duplicates
+
+    def shutdown(self):
+        self.pool.clear()
+        self.pool.waitForDone()
+
+
+ASSET_INDEX = AssetIndex(ASSET_INDEX_PATH)
+
+
+class AssetValidator:
+    """
+    Проверка изображений, на которые ссылаются кадры. Сначала собираются уникальные пути
+    со списком кадров, затем папки с ассетами один раз обходятся в индекс без учета регистра,
+    и каждый путь сверяется с ним без обращения к диску. Заголовки PNG (сигнатура, IHDR
+    и IEND в конце файла) читаются параллельно в пуле потоков.
+
+    Виды проблем: missing — файла нет; case — файл есть, но путь отличается регистром или
+    разделителями (на Linux он не откроется); corrupt — не PNG или файл обрезан;
+    oversized — сторона больше SETTINGS["asset_max_side"] или файл больше SETTINGS["asset_max_mb"].
+    """
+    PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+    PNG_END = b"\x00\x00\x00\x00IEND\xaeB`\x82"
+    ERRORS = ("missing", "case", "corrupt")
+
+    def __init__(self, root=".", records=None):
+        self.root = root
+        self.records = records  # снимок AssetIndex: путь -> AssetRecord; без него читается диск
+        self.exact = set()  # пути файлов относительно root, как на диске
+        self.folded = {}    # тот же путь в нижнем регистре с "/" -> путь на диске
+
+    @staticmethod
+    def foldPath(path):
+        return os.path.normpath(path.replace("\\", "/")).replace(os.sep, "/").lower()
+
+    @staticmethod
+    def frameAssets(frame):
+        """Пары (путь, поле) всех изображений кадра, включая плашку диалога."""
+        yield frame.background.name, "background"
+        for index, sprite in enumerate(frame.sprites):
+            yield sprite.name, f"sprite {index}"
+        yield FrameScene.dialogueTheme(frame.text.charaName), "dialogue theme"
+        if frame.ui.emotion:
+            yield frame.ui.charaEmotion, "emotion"
+            yield frame.ui.charaEmotionBackground, "emotion background"
+
+    @classmethod
+    def collect(cls, frames):
+        """frames — пары (ключ, Frame). Возвращает {путь: [(ключ, поле), ...]}."""
+        references = {}
+        for key, frame in frames:
+            for path, field in cls.frameAssets(frame):
+                if path:
+                    references.setdefault(path, []).append((key, field))
+        return references
+
+    def buildIndex(self, paths):
+        """
+        Обходит только верхние папки, которые встречаются в путях сценария. Папки, которые
+        уже есть в снимке AssetIndex, берутся из него без обращения к диску.
+        """
+        self.exact.clear()
+        self.folded.clear()
+        folders = {self.foldPath(path).split("/", 1)[0] for path in paths if not os.path.isabs(path)}
+        indexed = set()
+        if self.records is not None:
+            indexed = {root.lower() for root in AssetIndex.ROOTS}
+            for relative in self.records:
+                self.exact.add(relative)
+                self.folded.setdefault(self.foldPath(relative), relative)
+        with os.scandir(self.root) as entries:
+            tops = [entry.name for entry in entries
+                    if entry.is_dir() and entry.name.lower() in folders and entry.name.lower() not in indexed]
+        for top in tops:
+            for folder, _, files in os.walk(os.path.join(self.root, top)):
+                relative_folder = os.path.relpath(folder, self.root)
+                for name in files:
+                    relative = os.path.join(relative_folder, name)
+                    self.exact.add(relative)
+                    self.folded.setdefault(self.foldPath(relative), relative)
+
+    def resolve(self, path):
+        """Возвращает (путь на диске или None, вид проблемы или None)."""
+        if os.path.isabs(path):
+            return (path, None) if os.path.isfile(path) else (None, "missing")
+        if os.path.normpath(path) in self.exact:
+            return os.path.normpath(path), None
+        actual = self.folded.get(self.foldPath(path))
+        return (actual, "case") if actual is not None else (None, "missing")
+
+    @classmethod
+    def readPngInfo(cls, header, tail):
+        """Ширина, высота и ошибка ("" — файл цел) по первым 24 и последним 12 байтам файла."""
+        if header[:8] != cls.PNG_SIGNATURE or header[12:16] != b"IHDR":
+            return 0, 0, "not a PNG file"
+        width = int.from_bytes(header[16:20], "big")
+        height = int.from_bytes(header[20:24], "big")
+        if tail != cls.PNG_END:
+            return width, height, "truncated (no IEND chunk)"
+        if width == 0 or height == 0:
+            return width, height, f"invalid size {width}x{height}"
+        return width, height, ""
+
+    def checkFile(self, relative):
+        """Проверяет PNG по записи индекса или по заголовку и хвосту файла. Возвращает (вид, описание) или None."""
+        record = self.records.get(relative) if self.records is not None else None
+        if record is not None:
+            width, height, error, size = record.width, record.height, record.error, record.size
+        else:
+            path = os.path.join(self.root, relative)
+            try:
+                size = os.path.getsize(path)
+                with open(path, "rb") as file:
+                    header = file.read(24)
+                    file.seek(max(size - len(self.PNG_END), 0))
+                    tail = file.read()
+            except OSError as e:
+                return "missing", str(e)
+            width, height, error = self.readPngInfo(header, tail)
+
+        if error:
+            return "corrupt", error
+        if max(width, height) > SETTINGS["asset_max_side"]:
+            return "oversized", f"{width}x{height} px"
+        if size > SETTINGS["asset_max_mb"] * 1024 * 1024:
+            return "oversized", f"{size / 1024 / 1024:.1f} MB"
+        return None
+
+    def validate(self, references, jobs=8):
+        """
+        Проверяет пути из collect и возвращает список проблем: словари kind, path, detail и
+        references — пары (ключ кадра, поле), где встречается путь.
+        """
+        self.buildIndex(references)
+
+        issues = []
+        to_check = {}  # путь на диске -> пути из сценария
+        for path, where in references.items():
+            actual, kind = self.resolve(path)
+            if kind == "missing":
+                issues.append({"kind": kind, "path": path, "detail": "file not found", "references": where})
+                continue
+            if kind == "case":
+                issues.append({"kind": kind, "path": path, "detail": f"found as {actual}", "references": where})
+            to_check.setdefault(actual, []).append(path)
+
+        with ThreadPoolExecutor(max_workers=max(1, jobs)) as executor:
+            results = executor.map(self.checkFile, list(to_check))
+            for actual, result in zip(list(to_check), results):
+                if result is None:
+                    continue
+                kind, detail = result
+                for path in to_check[actual]:
+                    issues.append({"kind": kind, "path": path, "detail": detail, "references": references[path]})
+
+        issues.sort(key=lambda issue: (issue["kind"] not in self.ERRORS, issue["kind"], issue["path"]))
+        return issues
+
+    @staticmethod
+    def formatIssue(issue, limit=5):
+        frames = list(dict.fromkeys(key for key, _ in issue["references"]))
+        shown = ", ".join(frames[:limit]) + (f" and {len(frames) - limit} more" if len(frames) > limit else "")
+        return f"{issue['kind']:<9} {issue['path']}: {issue['detail']} (frames {shown})"
+
+
+class AssetValidationTask(QRunnable):
+    def __init__(self, runner, references, records):
+        super().__init__()
+        self.runner = runner
+        self.references = references
+        self.records = records
+
+    def run(self):
+        timer = QElapsedTimer()
+        timer.start()
+        try:
+            issues, error = AssetValidator(records=self.records).validate(self.references, os.cpu_count() or 4), ""
+        except OSError as e:
+            issues, error = [], str(e)
+        if not sip.isdeleted(self.runner):
+            self.runner.finished.emit(issues, error, timer.elapsed())
+
+
+class AssetValidationRunner(QObject):
+    """
+    Проверка ассетов из редактора. Пути собираются из BUFFER_DATA в GUI-потоке (это быстро
+    и не зависит от последующих правок), обход папок и чтение заголовков идут в фоне.
+    """
+    finished = pyqtSignal(object, str, int)  # проблемы, ошибка или "", мс
+
+    def __init__(self):
+        super().__init__()
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(1)
+
+    def isRunning(self):
+        return self.pool.activeThreadCount() > 0
+
+    def start(self, frames):
+        records = ASSET_INDEX.snapshot() if ASSET_INDEX.ready else None
+        self.pool.start(AssetValidationTask(self, AssetValidator.collect(frames), records))
+
+    def shutdown(self):
+        self.pool.waitForDone()
+
+
+ASSET_VALIDATION = AssetValidationRunner()
 
 
 class OutlinedTextItem(QGraphicsTextItem):
+    """
+    Текст с обводкой (имя, время, глава). Контур глифов строится только при смене текста,
+    шрифта или обводки. Текст рисуется от базовой линии y=0, поэтому глифы лежат выше начала
+    элемента — boundingRect считается по контуру с учетом толщины обводки, а готовую картинку
+    кэширует сам QGraphicsView (DeviceCoordinateCache), пока элемент не изменится.
+    """
+
     def __init__(self, text):
-        super().__init__(text)
+        super().__init__()
         self.outlinePen = QPen(Qt.GlobalColor.black, 8)  # Цвет и толщина обводки
         self.fillBrush = QBrush(Qt.GlobalColor.white)    # Цвет заполнения текста
+        self._path = QPainterPath()
+        self._rect = QRectF()
+        self.setCacheMode(QGraphicsItem.CacheMode.DeviceCoordinateCache)
+        self.setPlainText(text)
+
+    def setPlainText(self, text):
+        super().setPlainText(text)
+        self.updatePath()
+
+    def setFont(self, font):
+        super().setFont(font)
+        self.updatePath()
+
+    def updatePath(self):
+        self.prepareGeometryChange()
+        self._path = QPainterPath()
+        self._path.addText(0, 0, self.font(), self.toPlainText())
+        # Половина обводки наружу и пиксель на сглаживание
+        margin = self.outlinePen.widthF() / 2 + 1
+        self._rect = self._path.boundingRect().adjusted(-margin, -margin, margin, margin)
+        self.update()
+
+    def boundingRect(self):
+        return self._rect
+
+    def shape(self):
+        shape = QPainterPath()
+        shape.addRect(self._rect)
+        return shape
 
     def paint(self, painter, option, widget):
         painter.save()
-        path = QPainterPath()
-        path.addText(0, 0, self.font(), self.toPlainText())
-        
+
         # Рисуем обводку
         painter.setPen(self.outlinePen)
         painter.setBrush(Qt.BrushStyle.NoBrush)
-        painter.drawPath(path)
-        
+        painter.drawPath(self._path)
+
         # Рисуем заполнение текста
         painter.setPen(Qt.PenStyle.NoPen)
         painter.setBrush(self.fillBrush)
-        painter.drawPath(path)
-        
+        painter.drawPath(self._path)
+
         painter.restore()
 
 
+class FrameScene(QGraphicsScene):
+    """
+    Сцена кадра. Элементы (фон, спрайты, плашка диалога, тексты, эмоции) создаются один раз,
+    при правке в инспекторе обновляется только затронутый элемент.
+    Изображения берутся из PIXMAP_CACHE в уровне детализации под масштаб элемента и зум,
+    поэтому трансформация элемента — масштаб из кадра, умноженный на texelScale.
+    """
+    SCREEN_WIDTH = 1600
+    SCREEN_HEIGHT = 900
+
+    def __init__(self):
+        super().__init__()
+        self.key = None
+
+        # Задаем белый фон
+        white_background = self.addRect(QRectF(0, 0, self.SCREEN_WIDTH, self.SCREEN_HEIGHT),
+                                        QPen(Qt.GlobalColor.black), QBrush(QColor(255, 255, 255)))
+        white_background.setZValue(-10)
+
+        self.background_item = QGraphicsPixmapItem()
+        self.background_item.setZValue(-1)
+        self.addItem(self.background_item)
+
+        self.sprite_items = []
+
+        self.fixed_image = QGraphicsPixmapItem()
+        self.fixed_image.setPos(0, 0)
+        self.fixed_image.setZValue(99)
+        self.addItem(self.fixed_image)
+
+        self.chara_emotion_background_item = QGraphicsPixmapItem()
+        self.chara_emotion_background_item.setZValue(99)
+        self.chara_emotion_background_item.setShapeMode(QGraphicsPixmapItem.ShapeMode.MaskShape)
+        self.addItem(self.chara_emotion_background_item)
+
+        self.mhimage = QGraphicsPixmapItem()
+        self.mhimage.setPos(1125, 400)
+        self.mhimage.setZValue(99)
+        self.addItem(self.mhimage)
+
+        self.add_text_elements()
+        self.loadFrame(None)
+
+    def add_text_elements(self):
+        # Текстовые элементы
+        self.text_item = self.addText("")
+        self.text_item.setPos(20, 710)
+        self.text_item.setTextWidth(1100)
+        self.text_item.setZValue(100)
+        self.text_item.setFont(QFont("Arial", 24))
+
+        self.name_text = OutlinedTextItem("")
+        self.name_text.setPos(15, 670)
+        self.name_text.setZValue(100)
+        self.name_text.setFont(QFont("Arial", 55))
+        self.addItem(self.name_text)
+
+        self.time_text = OutlinedTextItem("")
+        self.time_text.setPos(1300, 60)
+        self.time_text.setZValue(100)
+        self.time_text.setFont(QFont("Arial", 40))
+        self.addItem(self.time_text)
+
+        self.chapter_text = OutlinedTextItem("")
+        self.chapter_text.setPos(1205, 108)
+        self.chapter_text.setZValue(100)
+        self.chapter_text.setFont(QFont("Arial", 30))
+        self.addItem(self.chapter_text)
+
+    MAIN_HERO_EMOTION_SCALE = 0.4
+
+    def setItemPixmap(self, item, path, scale=1.0):
+        """
+        Меняет pixmap элемента, только если изменился путь к файлу или нужный уровень детализации.
+        scale — наибольший масштаб элемента в кадре, зум холста учитывается здесь.
+        """
+        level = self.lodLevel(scale) if path else 0
+        if item.data(0) != path or item.data(1) != level:
+            pixmap = PIXMAP_CACHE.pixmap(path, level)
+            texel = 1.0
+            if level and not pixmap.isNull():
+                # Точное отношение по ширине: размер копии округлен до целых пикселей
+                texel = PIXMAP_CACHE.sourceSize(PIXMAP_CACHE.cacheKey(path)).width() / pixmap.width()
+            item.setPixmap(pixmap)
+            item.setData(0, path)
+            item.setData(1, level)
+            item.setData(2, texel)
+        return item.pixmap()
+
+    @staticmethod
+    def lodLevel(scale):
+        return PixmapCache.lodLevel(scale * SETTINGS["scale_factor"])
+
+    @staticmethod
+    def texelScale(item):
+        """Во сколько раз pixmap элемента меньше исходного изображения."""
+        return item.data(2) or 1.0
+
+    @staticmethod
+    def elementScale(element, scale=None):
+        """Наибольший масштаб фона или спрайта за кадр, включая цель анимации."""
+        if scale is None:
+            scale = max(element.scale.x, element.scale.y)
+        settings = element.animationSettings
+        if element.animation and settings is not None:
+            scale *= max(settings.scale.x, settings.scale.y, 1.0)
+        return scale
+
+    @classmethod
+    def backgroundScale(cls, background):
+        """Масштаб, вписывающий фон по высоте экрана, или None, если файла нет."""
+        key = PIXMAP_CACHE.cacheKey(background.name) if background.name else None
+        height = PIXMAP_CACHE.sourceSize(key).height() if key is not None else 0
+        return cls.SCREEN_HEIGHT / height if height > 0 else None
+
+    @staticmethod
+    def setItemText(item, text):
+        if item.toPlainText() != text:
+            item.setPlainText(text)
+
+    @staticmethod
+    def dialogueTheme(chara_name):
+        if chara_name == "Макиширо Ямагаки":
+            return HERO_DIALOGUE_THEME
+        return DIALOGUE_THEME
+
+    @classmethod
+    def frameImageKeys(cls, frame):
+        """Ключи PIXMAP_CACHE всех изображений, которые сцена загрузит для кадра."""
+        images = [(cls.dialogueTheme(frame.text.charaName), 1.0)]
+        background_scale = cls.backgroundScale(frame.background)
+        if background_scale is not None:
+            images.append((frame.background.name, cls.elementScale(frame.background, background_scale)))
+        images.extend((sprite.name, cls.elementScale(sprite)) for sprite in frame.sprites)
+        if frame.ui.emotion:
+            images.append((frame.ui.charaEmotionBackground, 1.0))
+            images.append((frame.ui.charaEmotion, cls.MAIN_HERO_EMOTION_SCALE))
+
+        keys = (PIXMAP_CACHE.cacheKey(path, cls.lodLevel(scale)) for path, scale in images if path)
+        return [key for key in keys if key is not None]
+
+    def loadFrame(self, key):
+        """Привязывает сцену к кадру и обновляет все элементы."""
+        self.key = key
+        if key is None:
+            for item in self.items():
+                if item.zValue() > -10:
+                    item.setVisible(False)
+            return
+
+        self.fixed_image.setVisible(True)
+        for item in (self.text_item, self.name_text, self.time_text, self.chapter_text):
+            item.setVisible(True)
+
+        self.updateBackground()
+        self.updateSprites()
+        self.updateTexts()
+        self.updateUi()
+        self.updateEmotion()
+
+    def renderFrame(self, key, width, height):
+        """Рисует кадр в QImage заданного размера без окна и QGraphicsView."""
+        self.loadFrame(key)
+        image = QImage(width, height, QImage.Format.Format_ARGB32_Premultiplied)
+        image.fill(Qt.GlobalColor.white)
+        painter = QPainter(image)
+        painter.setRenderHints(QPainter.RenderHint.Antialiasing | QPainter.RenderHint.SmoothPixmapTransform |
+                               QPainter.RenderHint.TextAntialiasing)
+        self.render(painter, QRectF(0, 0, width, height), QRectF(0, 0, self.SCREEN_WIDTH, self.SCREEN_HEIGHT),
+                    Qt.AspectRatioMode.IgnoreAspectRatio)
+        painter.end()
+        return image
+
+    def updateBackground(self):
+        background = BUFFER_DATA[self.key].background
+
+        # Вычисляем коэффициент масштабирования для подгонки по высоте экрана
+        scale_factor = self.backgroundScale(background)
+
+        # Проверяем, если текущий масштаб по высоте отличается от нужного значения
+        if scale_factor is not None and background.scale.y != scale_factor:
+            # Сохраняем новый масштаб в BUFFER_DATA
+            background.scale.y = scale_factor
+            background.scale.x = scale_factor
+
+        background_pixmap = self.setItemPixmap(self.background_item, background.name, self.elementScale(background))
+        if background_pixmap.isNull():
+            self.background_item.setVisible(False)
+            return
+
+        texel = self.texelScale(self.background_item)
+        self.background_item.setTransform(QTransform().scale(background.scale.x * texel, background.scale.y * texel))
+        self.background_item.setOpacity(1.0)  # прозрачность меняет только анимация
+        self.background_item.setPos(background.position.x, background.position.y)
+        self.background_item.setVisible(True)
+
+    def updateSprites(self):
+        """Синхронизирует количество элементов спрайтов с кадром и обновляет каждый."""
+        sprite_count = len(BUFFER_DATA[self.key].sprites)
+
+        while len(self.sprite_items) < sprite_count:
+            sprite_item = QGraphicsPixmapItem()
+            sprite_item.setZValue(len(self.sprite_items))
+            self.addItem(sprite_item)
+            self.sprite_items.append(sprite_item)
+
+        while len(self.sprite_items) > sprite_count:
+            self.removeItem(self.sprite_items.pop())
+
+        for i in range(sprite_count):
+            self.updateSprite(i)
+
+    def updateSprite(self, index):
+        if index >= len(self.sprite_items):
+            self.updateSprites()
+            return
+
+        sprites = BUFFER_DATA[self.key].sprites
+        sprite_item = self.sprite_items[index]
+        sprite = sprites[index] if index < len(sprites) else None
+        sprite_pixmap = self.setItemPixmap(sprite_item, sprite.name if sprite else "", self.elementScale(sprite) if sprite else 1.0)
+        if sprite_pixmap.isNull():
+            sprite_item.setVisible(False)
+            return
+
+        texel = self.texelScale(sprite_item)
+        # Проверка условий для центрирования спрайта
+        if len(sprites) == 1 and sprite.position.x == 0 and sprite.position.y == 0:
+            # Рассчитываем центральное положение по оси X и сохраняем его в BUFFER_DATA
+            sprite_width = PIXMAP_CACHE.sourceSize(PIXMAP_CACHE.cacheKey(sprite.name)).width() * sprite.scale.x
+            sprite.position.x = (self.SCREEN_WIDTH - sprite_width) / 2
+
+        sprite_item.setPos(sprite.position.x, sprite.position.y)
+        sprite_item.setTransform(QTransform().scale(sprite.scale.x * texel, sprite.scale.y * texel))
+        sprite_item.setOpacity(1.0)
+        sprite_item.setVisible(True)
+
+    def updateTexts(self):
+        """Текст реплики, имя персонажа и плашка диалога, которая зависит от имени."""
+        text_info = BUFFER_DATA[self.key].text
+        self.setItemPixmap(self.fixed_image, self.dialogueTheme(text_info.charaName))
+        texel = self.texelScale(self.fixed_image)
+        self.fixed_image.setTransform(QTransform().scale(texel, texel))
+
+        self.setItemText(self.text_item, text_info.text)
+        self.setItemText(self.name_text, text_info.charaName)
+
+    def updateUi(self):
+        ui_info = BUFFER_DATA[self.key].ui
+        self.setItemText(self.time_text, ui_info.time)
+        self.setItemText(self.chapter_text, ui_info.chapter)
+
+    # Полигон маски фона эмоций в координатах масштабированного изображения
+    EMOTION_MASK = ((1300, 300), (1600, 400), (1600, 900), (1100, 900))
+
+    @classmethod
+    def emotionComposite(cls, path, scale):
+        """
+        Фон эмоций, масштабированный и обрезанный по EMOTION_MASK. Готовый результат лежит
+        в PIXMAP_CACHE под ключом (путь, mtime, масштаб и маска) и пересчитывается только при
+        смене файла, масштаба или маски. Позиция на изображение не влияет и в ключ не входит.
+        Возвращает (ключ, QPixmap).
+        """
+        source_key = PIXMAP_CACHE.cacheKey(path)
+        if source_key is None:
+            return None, QPixmap()
+        key = (f"{source_key[0]}@emotion", source_key[1], (scale.x, scale.y, cls.EMOTION_MASK))
+        if PIXMAP_CACHE.contains(key):
+            return key, PIXMAP_CACHE.cached(key)
+
+        emotion_bg_pixmap = PIXMAP_CACHE.pixmap(path)
+        if emotion_bg_pixmap.isNull():
+            return key, emotion_bg_pixmap
+
+        # Масштабируем изображение
+        scaled_pixmap = emotion_bg_pixmap.scaled(
+            int(emotion_bg_pixmap.width() * scale.x),
+            int(emotion_bg_pixmap.height() * scale.y)
+        )
+
+        # Создаем полигон для маски
+        mask_polygon = QPolygonF([QPointF(x, y) for x, y in cls.EMOTION_MASK])
+
+        # Создаем QPainterPath для маски
+        mask_path = QPainterPath()
+        mask_path.addPolygon(mask_polygon)
+
+        # Применяем маску через QRegion
+        mask_region = QRegion(mask_path.toFillPolygon().toPolygon())
+
+        # Маскируем все, что за пределами полигона
+        mask_image = QPixmap(scaled_pixmap.size())
+        mask_image.fill(Qt.GlobalColor.transparent)
+        painter = QPainter(mask_image)
+        painter.setClipRegion(mask_region)
+        painter.drawPixmap(0, 0, scaled_pixmap)
+        painter.end()
+
+        PIXMAP_CACHE.insert(key, mask_image)
+        return key, mask_image
+
+    def updateEmotion(self):
+        """Фон для эмоций с полигональной маской и эмоция главного героя."""
+        ui_info = BUFFER_DATA[self.key].ui
+        visible = False
+
+        if ui_info.emotion and ui_info.charaEmotionBackground:
+            emotion_bg_pos = ui_info.charaEmotionBackgroundPosition or Vec2(0, 0)
+            emotion_bg_scale = ui_info.charaEmotionBackgroundScale or Vec2(1, 1)
+            key, mask_image = self.emotionComposite(ui_info.charaEmotionBackground, emotion_bg_scale)
+            if not mask_image.isNull():
+                # Тот же результат из кэша — pixmap элемента не трогаем, чтобы не перерисовывать его
+                if self.chara_emotion_background_item.data(0) != key:
+                    self.chara_emotion_background_item.setPixmap(mask_image)
+                    self.chara_emotion_background_item.setData(0, key)
+                self.chara_emotion_background_item.setPos(emotion_bg_pos.x, emotion_bg_pos.y)
+                self.setItemPixmap(self.mhimage, ui_info.charaEmotion, self.MAIN_HERO_EMOTION_SCALE)
+                mhimage_scale = self.MAIN_HERO_EMOTION_SCALE * self.texelScale(self.mhimage)
+                self.mhimage.setTransform(QTransform().scale(mhimage_scale, mhimage_scale))
+                visible = True
+
+        self.chara_emotion_background_item.setVisible(visible)
+        self.mhimage.setVisible(visible)
+
+
+class CanvasRefreshScheduler(QObject):
+    """
+    Собирает запросы на обновление холста и выполняет их одним проходом —
+    не чаще одного раза за интервал кадра. Повторные запросы одного и того же
+    элемента и запросы, перекрытые перезагрузкой кадра, схлопываются.
+    """
+    ELEMENT_ORDER = ("background", "sprites", "sprite", "texts", "ui", "emotion")
+    flushed = pyqtSignal()  # сцена обновлена; она может дописать в кадр вычисленные масштаб и позицию
+
+    def __init__(self, scene, interval, parent=None):
+        super().__init__(parent)
+        self.scene = scene
+        self.requests = 0
+        self.coalesced = 0
+        self.flushes = 0
+        self.updates = 0
+
+        self._dirty = set()
+        self._frame_pending = False
+        self._frame_key = None
+
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.setInterval(interval)
+        self._timer.timeout.connect(self.flush)
+
+    def requestFrame(self, key):
+        """Полная перепривязка сцены к кадру; перекрывает все ожидающие запросы элементов."""
+        self.requests += 1
+        if self._frame_pending:
+            self.coalesced += 1
+        self.coalesced += len(self._dirty)
+        self._dirty.clear()
+        self._frame_pending = True
+        self._frame_key = key
+        self._schedule()
+
+    def request(self, element, index=None):
+        self.requests += 1
+        if self._frame_pending or (element, index) in self._dirty or \
+                (element == "sprite" and ("sprites", None) in self._dirty):
+            self.coalesced += 1
+            return
+        self._dirty.add((element, index))
+        self._schedule()
+
+    def _schedule(self):
+        # Таймер не перезапускается, поэтому задержка не больше одного интервала
+        if not self._timer.isActive():
+            self._timer.start()
+
+    def isPending(self):
+        return self._frame_pending or bool(self._dirty)
+
+    def flush(self):
+        self._timer.stop()
+        if not self.isPending():
+            return
+        self.flushes += 1
+
+        if self._frame_pending:
+            self._frame_pending = False
+            self.scene.loadFrame(self._frame_key)
+            self.updates += 1
+            self.flushed.emit()
+            return
+
+        dirty, self._dirty = self._dirty, set()
+        if self.scene.key is None:
+            return
+        if ("sprites", None) in dirty:
+            self.coalesced += sum(1 for element, _ in dirty if element == "sprite")
+            dirty = {entry for entry in dirty if entry[0] != "sprite"}
+
+        for element, index in sorted(dirty, key=lambda entry: (self.ELEMENT_ORDER.index(entry[0]), entry[1] or 0)):
+            if element == "background":
+                self.scene.updateBackground()
+            elif element == "sprites":
+                self.scene.updateSprites()
+            elif element == "sprite":
+                self.scene.updateSprite(index)
+            elif element == "texts":
+                self.scene.updateTexts()
+            elif element == "ui":
+                self.scene.updateUi()
+            elif element == "emotion":
+                self.scene.updateEmotion()
+            self.updates += 1
+        self.flushed.emit()
+
+    def stats(self):
+        return {
+            "requests": self.requests,
+            "coalesced": self.coalesced,
+            "flushes": self.flushes,
+            "updates": self.updates
+        }
+
+
+# Кривые плавности. Функции написаны только на арифметике и сравнениях, поэтому принимают
+# и число, и массив NumPy. Новую кривую достаточно добавить в EASING_CURVES.
+
+def easeLinear(t):
+    return t
+
+
+def easeInQuad(t):
+    return t * t
+
+
+def easeOutQuad(t):
+    return t * (2 - t)
+
+
+def easeInOutQuad(t):
+    ease_in = 2 * t * t
+    ease_out = -1 + (4 - 2 * t) * t
+    return ease_out + (t < 0.5) * (ease_in - ease_out)
+
+
+def easeInCubic(t):
+    return t * t * t
+
+
+def easeOutCubic(t):
+    u = 1 - t
+    return 1 - u * u * u
+
+
+def easeInOutCubic(t):
+    u = 2 - 2 * t
+    ease_in = 4 * t * t * t
+    ease_out = 1 - u * u * u / 2
+    return ease_out + (t < 0.5) * (ease_in - ease_out)
+
+
+def easeOutBack(t):
+    overshoot = 1.70158
+    u = t - 1
+    return 1 + (overshoot + 1) * u * u * u + overshoot * u * u
+
+
+EASING_CURVES = {
+    "linear": easeLinear,
+    "inQuad": easeInQuad,
+    "outQuad": easeOutQuad,
+    "inOutQuad": easeInOutQuad,
+    "inCubic": easeInCubic,
+    "outCubic": easeOutCubic,
+    "inOutCubic": easeInOutCubic,
+    "outBack": easeOutBack,
+}
+DEFAULT_EASING = "inOutQuad"
+
+
+class AnimationTimeline:
+    """
+    Анимации кадра, собранные один раз при старте воспроизведения в плоские массивы.
+    Дорожка — фон или спрайт; ее каналы: x, y, масштаб x/y и прозрачность (начало и разница
+    до цели), плюс длительность и кривая плавности. На каждом тике все дорожки считаются
+    одним проходом NumPy, а в сцену уходят только позиция, трансформация и прозрачность
+    элементов — пиксмапы не пересоздаются. Без NumPy используется тот же расчет на списках.
+    """
+    X, Y, SCALE_X, SCALE_Y, OPACITY = range(5)
+
+    def __init__(self, frame, scene):
+        self.items = []
+        self.easings = []
+        starts, ends, durations, has_scale, has_opacity = [], [], [], [], []
+
+        tracks = [(frame.background, scene.background_item)]
+        tracks.extend(zip(frame.sprites, scene.sprite_items))
+        for element, item in tracks:
+            settings = element.animationSettings
+            if not element.animation or settings is None or settings.time <= 0:
+                continue
+            opacity = settings.opacity
+            easing = settings.easing if settings.easing in EASING_CURVES else DEFAULT_EASING
+            # Масштаб анимации — множитель к масштабу элемента в покое; texel переводит
+            # масштаб исходного изображения в масштаб уменьшенной копии в элементе
+            texel = scene.texelScale(item)
+            start_x = element.scale.x * texel
+            start_y = element.scale.y * texel
+            scale_x = start_x * settings.scale.x
+            scale_y = start_y * settings.scale.y
+
+            self.items.append(item)
+            self.easings.append(easing)
+            starts.append((element.position.x, element.position.y, start_x, start_y, 1.0))
+            ends.append((settings.position.x, settings.position.y, scale_x, scale_y,
+                         1.0 if opacity is None else opacity))
+            durations.append(settings.time)
+            has_scale.append(settings.scale.x != 1 or settings.scale.y != 1)
+            has_opacity.append(opacity is not None)
+
+        self.has_scale = has_scale
+        self.has_opacity = has_opacity
+        self.duration = max(durations, default=0)
+        # Состояние элементов в покое, чтобы после просмотра вернуть его без перезагрузки кадра
+        self.key = scene.key
+        self.resting = [(item.pos(), item.transform(), item.opacity()) for item in self.items]
+        if np is not None:
+            self.starts = np.array(starts, dtype=np.float64).reshape(-1, 5)
+            self.deltas = np.array(ends, dtype=np.float64).reshape(-1, 5) - self.starts
+            self.durations = np.array(durations, dtype=np.float64)
+            self.finished = np.zeros(len(durations), dtype=bool)
+            names = np.array(self.easings, dtype=object)
+            self.easing_groups = [(EASING_CURVES[name], np.flatnonzero(names == name))
+                                  for name in dict.fromkeys(self.easings)]
+        else:
+            self.starts = starts
+            self.deltas = [tuple(e - s for s, e in zip(start, end)) for start, end in zip(starts, ends)]
+            self.durations = durations
+            self.finished = [False] * len(durations)
+
+    def __len__(self):
+        return len(self.items)
+
+    def restore(self):
+        for item, (pos, transform, opacity) in zip(self.items, self.resting):
+            item.setPos(pos)
+            item.setTransform(transform)
+            item.setOpacity(opacity)
+
+    def push(self, index, values):
+        item = self.items[index]
+        item.setPos(values[self.X], values[self.Y])
+        if self.has_scale[index]:
+            item.setTransform(QTransform.fromScale(values[self.SCALE_X], values[self.SCALE_Y]))
+        if self.has_opacity[index]:
+            item.setOpacity(min(max(values[self.OPACITY], 0.0), 1.0))
+
+    def apply(self, elapsed):
+        """Выставляет элементы на момент elapsed (мс). Возвращает True, когда все дорожки завершены."""
+        if np is not None:
+            return self._applyVectorized(elapsed)
+
+        done = True
+        for i in range(len(self.items)):
+            if self.finished[i]:
+                continue
+            progress = elapsed / self.durations[i]
+            if progress >= 1.0:
+                progress = 1.0
+                self.finished[i] = True
+            else:
+                done = False
+            eased = EASING_CURVES[self.easings[i]](progress)
+            self.push(i, [start + eased * delta for start, delta in zip(self.starts[i], self.deltas[i])])
+        return done
+
+    def _applyVectorized(self, elapsed):
+        # Дорожки, завершенные на прошлых тиках, уже стоят в конечном состоянии
+        active = ~self.finished
+        if not active.any():
+            return True
+
+        t = np.minimum(elapsed / self.durations, 1.0)
+        eased = np.empty_like(t)
+        for curve, indices in self.easing_groups:
+            eased[indices] = curve(t[indices])
+        values = self.starts + eased[:, None] * self.deltas
+
+        indices = np.flatnonzero(active)
+        self.finished[indices] = t[indices] >= 1.0
+        for index, row in zip(indices.tolist(), values[indices].tolist()):
+            self.push(index, row)
+        return bool(self.finished.all())
+
+
+class PlaybackStats:
+    """Статистика просмотра анимации: интервалы между кадрами, реальный FPS и пропущенные кадры."""
+
+    def __init__(self, fps):
+        self.fps = fps
+        self.frame_ms = 1000.0 / fps
+        self.intervals = []
+        self.dropped = 0
+        self.last = None
+        self.next_frame_ms = 0.0
+
+    def tick(self, now_ms):
+        if self.last is not None:
+            interval = now_ms - self.last
+            self.intervals.append(interval)
+            # Интервал длиной в несколько целевых кадров означает пропуск всех, кроме одного
+            missed = int(interval / self.frame_ms + 0.5) - 1
+            if missed > 0:
+                self.dropped += missed
+        self.last = now_ms
+
+    def nextFrameDelay(self, now_ms):
+        """Задержка до следующей точки сетки целевого FPS. Опоздавший кадр пропускает
+        прошедшие точки, а не догоняет их пачкой."""
+        self.next_frame_ms += self.frame_ms
+        if self.next_frame_ms <= now_ms:
+            self.next_frame_ms = (int(now_ms / self.frame_ms) + 1) * self.frame_ms
+        return max(0, int(self.next_frame_ms - now_ms))
+
+    def percentile(self, values, fraction):
+        return values[min(len(values) - 1, int(fraction * len(values)))]
+
+    def summary(self):
+        if not self.intervals:
+            return f"target {self.fps} FPS"
+        intervals = sorted(self.intervals)
+        # Тики в одну и ту же миллисекунду дают нулевые интервалы
+        total = sum(intervals)
+        fps = len(intervals) * 1000.0 / total if total else 0.0
+        return (f"{fps:.1f} / {self.fps} FPS\n"
+                f"frame p50 {self.percentile(intervals, 0.5):.1f} ms, "
+                f"p95 {self.percentile(intervals, 0.95):.1f} ms, "
+                f"p99 {self.percentile(intervals, 0.99):.1f} ms, "
+                f"max {intervals[-1]:.1f} ms\n"
+                f"dropped {self.dropped} of {len(intervals) + self.dropped}")
+
+
+class ScenarioPlayer(QObject):
+    """
+    Воспроизведение сценария кадр за кадром. Кадры меняются прямо в сцене через loadFrame,
+    без инспектора и createCanvas. Кадр держится, пока не закончатся его анимации и печать
+    текста (SETTINGS["typing_ms_per_char"]) плюс SETTINGS["frame_hold_ms"]. Изображения
+    следующих SETTINGS["preload_frames"] кадров декодируются заранее в IMAGE_PRELOADER.
+    """
+    frameChanged = pyqtSignal(str)
+    finished = pyqtSignal(str)  # ключ последнего показанного кадра
+
+    def __init__(self, scene, parent=None):
+        super().__init__(parent)
+        self.scene = scene
+        self.keys = []
+        self.position = -1
+        self.stats = None
+        self.timeline = None
+        self.clock = QElapsedTimer()
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.setTimerType(Qt.TimerType.PreciseTimer)
+        self.timer.timeout.connect(self.tick)
+
+    def isActive(self):
+        return self.position >= 0
+
+    def currentKey(self):
+        return self.keys[self.position] if self.isActive() else None
+
+    def start(self, keys, fps):
+        self.keys = [key for key in keys if key in BUFFER_DATA]
+        if not self.keys:
+            return
+        self.stats = PlaybackStats(fps)
+        self.clock.start()
+        self.showFrame(0, 0.0)
+        self.timer.start(0)
+
+    def stop(self, notify=True):
+        if not self.isActive():
+            return
+        key = self.currentKey()
+        self.timer.stop()
+        self.position = -1
+        self.timeline = None
+        if notify:
+            self.finished.emit(key)
+
+    def showFrame(self, position, now):
+        self.position = position
+        key = self.keys[position]
+        frame = BUFFER_DATA[key]
+        self.scene.loadFrame(key)
+        self.timeline = AnimationTimeline(frame, self.scene)
+        self.text = frame.text.text
+        self.typed = -1
+        typing_ms = len(self.text) * SETTINGS["typing_ms_per_char"]
+        self.frame_start = now
+        self.frame_duration = max(self.timeline.duration, typing_ms + SETTINGS["frame_hold_ms"])
+
+        upcoming = self.keys[position + 1:position + 1 + SETTINGS["preload_frames"]]
+        IMAGE_PRELOADER.preloadKeys(key for next_key in upcoming for key in FrameScene.frameImageKeys(BUFFER_DATA[next_key]))
+        self.frameChanged.emit(key)
+
+    def tick(self):
+        now = self.clock.nsecsElapsed() / 1e6
+        self.stats.tick(now)
+        local = now - self.frame_start
+
+        if local >= self.frame_duration:
+            if self.position + 1 >= len(self.keys):
+                self.stop()
+                return
+            self.showFrame(self.position + 1, now)
+            local = 0.0
+
+        self.timeline.apply(local)
+        typed = min(len(self.text), int(local / max(1, SETTINGS["typing_ms_per_char"])))
+        if typed != self.typed:
+            self.typed = typed
+            self.scene.setItemText(self.scene.text_item, self.text[:typed])
+
+        self.timer.start(self.stats.nextFrameDelay(now))
+
+
+class FrameListModel(QAbstractListModel):
+    """
+    Список кадров для дока "Scene Elements". Хранит только ключи кадров;
+    подпись (говорящий и начало реплики) собирается при первом показе строки и кэшируется.
+    """
+    KeyRole = Qt.ItemDataRole.UserRole
+    SUMMARY_WORDS = 6
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.keys = []
+        self.rows = {}       # key -> row
+        self.summaries = {}  # key -> подпись строки
+
+    def clear(self):
+        self.beginResetModel()
+        self.keys = []
+        self.rows = {}
+        self.summaries = {}
+        self.endResetModel()
+
+    def appendKeys(self, keys):
+        keys = [key for key in keys if key not in self.rows]
+        if not keys:
+            return
+        first = len(self.keys)
+        self.beginInsertRows(QModelIndex(), first, first + len(keys) - 1)
+        for row, key in enumerate(keys, first):
+            self.rows[key] = row
+        self.keys.extend(keys)
+        self.endInsertRows()
+
+    def framesChanged(self, keys):
+        """Сбрасывает подписи многих кадров одним сигналом (пакетная правка, откат)."""
+        for key in keys:
+            self.summaries.pop(key, None)
+        if self.keys:
+            self.dataChanged.emit(self.index(0), self.index(len(self.keys) - 1),
+                                  [Qt.ItemDataRole.DisplayRole, Qt.ItemDataRole.ToolTipRole])
+
+    def frameChanged(self, key):
+        """Сбрасывает подпись кадра после правки текста или имени."""
+        self.summaries.pop(key, None)
+        row = self.rows.get(key)
+        if row is not None:
+            index = self.index(row)
+            self.dataChanged.emit(index, index, [Qt.ItemDataRole.DisplayRole, Qt.ItemDataRole.ToolTipRole])
+
+    def summary(self, key):
+        text = self.summaries.get(key)
+        if text is None:
+            frame = BUFFER_DATA.get(key)
+            text = key
+            if frame is not None:
+                words = frame.text.text.split()
+                line = " ".join(words[:self.SUMMARY_WORDS])
+                if len(words) > self.SUMMARY_WORDS:
+                    line += "…"
+                if frame.text.charaName:
+                    line = f"{frame.text.charaName}: {line}"
+                if line:
+                    text = f"{key}  {line}"
+            self.summaries[key] = text
+        return text
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self.keys)
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        key = self.keys[index.row()]
+        if role == Qt.ItemDataRole.DisplayRole:
+            return self.summary(key)
+        if role == Qt.ItemDataRole.ToolTipRole:
+            frame = BUFFER_DATA.get(key)
+            return frame.text.text if frame is not None else None
+        if role == self.KeyRole:
+            return key
+        return None
+
+
+class AssetListModel(QAbstractListModel):
+    """
+    Модель списка изображений для окон выбора. Хранит только имена и пути,
+    миниатюры запрашиваются у THUMBNAIL_LOADER только для видимых ячеек.
+    """
+    PathRole = Qt.ItemDataRole.UserRole
+
+    def __init__(self, thumbnail_size=200, parent=None):
+        super().__init__(parent)
+        self.thumbnail_size = thumbnail_size
+        self.assets = []  # [(file_name, file_path)]
+        self.rows = {}    # file_path -> row
+        self.placeholder = QPixmap(thumbnail_size, thumbnail_size)
+        self.placeholder.fill(Qt.GlobalColor.transparent)
+        THUMBNAIL_LOADER.thumbnailReady.connect(self.onThumbnailReady)
+
+    def setAssets(self, assets):
+        self.beginResetModel()
+        self.assets = list(assets)
+        self.rows = {file_path: row for row, (_, file_path) in enumerate(self.assets)}
+        self.endResetModel()
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self.assets)
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        file_name, file_path = self.assets[index.row()]
+        if role == Qt.ItemDataRole.DisplayRole:
+            return file_name
+        if role == Qt.ItemDataRole.DecorationRole:
+            pixmap = THUMBNAIL_LOADER.thumbnail(file_path, self.thumbnail_size)
+            return self.placeholder if pixmap is None or pixmap.isNull() else pixmap
+        if role == Qt.ItemDataRole.ToolTipRole or role == self.PathRole:
+            return file_path
+        return None
+
+    def onThumbnailReady(self, file_path, pixmap):
+        if pixmap.isNull():
+            return  # ячейка уже показывает заглушку
+        row = self.rows.get(file_path)
+        if row is not None:
+            index = self.index(row)
+            self.dataChanged.emit(index, index, [Qt.ItemDataRole.DecorationRole])
+
+
+class AssetGridView(QListView):
+    """Сетка миниатюр: виджеты для ячеек не создаются, рисуются только видимые элементы."""
+
+    def __init__(self, model, parent=None):
+        super().__init__(parent)
+        size = model.thumbnail_size
+        self.proxyModel = QSortFilterProxyModel(self)
+        self.proxyModel.setSourceModel(model)
+        self.proxyModel.setFilterCaseSensitivity(Qt.CaseSensitivity.CaseInsensitive)
+        self.setModel(self.proxyModel)
+
+        self.setViewMode(QListView.ViewMode.IconMode)
+        self.setIconSize(QSize(size, size))
+        self.setGridSize(QSize(size + 30, size + 50))
+        self.setUniformItemSizes(True)
+        self.setResizeMode(QListView.ResizeMode.Adjust)
+        self.setMovement(QListView.Movement.Static)
+        self.setLayoutMode(QListView.LayoutMode.Batched)
+        self.setBatchSize(200)
+        self.setWordWrap(True)
+
+    def setFilterText(self, text):
+        self.proxyModel.setFilterFixedString(text)
+
+
+def listImages(folder):
+    """PNG-файлы папки в виде [(имя, путь)]."""
+    photos = []
+    with os.scandir(folder) as entries:
+        for entry in entries:
+            if entry.is_file() and entry.name.lower().endswith(".png"):
+                photos.append((entry.name, os.path.join(folder, entry.name)))
+    return photos
+
+
+def createAssetGrid(dialog, mainLayout):
+    """Поле фильтра и сетка миниатюр для окна выбора; клики уходят в dialog.onImageClicked."""
+    filterLineEdit = QLineEdit(dialog)
+    filterLineEdit.setPlaceholderText("Filter")
+    mainLayout.addWidget(filterLineEdit)
+
+    dialog.imageModel = AssetListModel(200, dialog)
+    dialog.imageView = AssetGridView(dialog.imageModel, dialog)
+    mainLayout.addWidget(dialog.imageView)
+
+    filterLineEdit.textChanged.connect(dialog.imageView.setFilterText)
+    dialog.imageView.clicked.connect(lambda index: dialog.onImageClicked(index.data(AssetListModel.PathRole)))
 
 
 class SelectMainHeroEmotion(QDialog):
@@ -71,19 +3091,11 @@ class SelectMainHeroEmotion(QDialog):
         self.resize(800, 800)
 
         mainLayout = QVBoxLayout(self)
-        self.imageLayout = QGridLayout()
-
-        scrollArea = QScrollArea(self)
-        scrollAreaWidget = QWidget()
-        scrollAreaWidget.setLayout(self.imageLayout)
-        scrollArea.setWidget(scrollAreaWidget)
-        scrollArea.setWidgetResizable(True)
-
-        mainLayout.addWidget(scrollArea)
+        createAssetGrid(self, mainLayout)
         self.setLayout(mainLayout)
 
         photos = self.images()
-        self.populateGrid(self.imageLayout, photos)
+        self.populateGrid(photos)
 
         buttonLayout = QHBoxLayout()
         buttonContainer = QWidget()
@@ -93,6 +3105,7 @@ class SelectMainHeroEmotion(QDialog):
         backButton = QPushButton("Back", self)
         openBackgroundFolder = QPushButton("Open folder", self)
         refreshButton = QPushButton("Refresh", self)
+        refreshButton.setToolTip(ASSET_REFRESH_TOOLTIP)
 
         buttonLayout.addWidget(backButton)
         buttonLayout.addWidget(openBackgroundFolder)
@@ -125,57 +3138,19 @@ class SelectMainHeroEmotion(QDialog):
             print(f"Folder does not exist: {folder_path}")
 
     def onRefreshButton(self):
+        ASSET_INDEX.rescanNow(MAIN_HERO_EMOTION_FOLDER)
         self.photos = self.images()
-        self.populateGrid(self.imageLayout, self.photos)
+        self.populateGrid(self.photos)
 
     def images(self):
-        photos = []
-        for file_name in os.listdir(MAIN_HERO_EMOTION_FOLDER):
-            file_path = os.path.join(MAIN_HERO_EMOTION_FOLDER, file_name)
-            if os.path.isfile(file_path) and file_name.lower().endswith(".png"):
-                photos.append((file_name, file_path))
-        return photos
-
-    def clearLayout(self, layout):
-        while layout.count():
-            item = layout.takeAt(0)
-            widget = item.widget()
-            if widget is not None:
-                widget.deleteLater()
-            else:
-                self.clearLayout(item.layout())
-
-    def populateGrid(self, layout, photos):
-        self.clearLayout(layout)
-        row, col, max_cols = 0, 0, 3 
-        for file_name, file_path in photos:
-            containerWidget = QWidget()
-            formLayout = QFormLayout(containerWidget)
-            formLayout.setVerticalSpacing(5)
-
-            pixmap = QPixmap(file_path)
-            imageLabel = QLabel()
-            imageLabel.setPixmap(pixmap.scaled(200, 200, Qt.AspectRatioMode.KeepAspectRatio, Qt.TransformationMode.SmoothTransformation))
-            imageLabel.setAlignment(Qt.AlignmentFlag.AlignCenter)
-            imageLabel.mousePressEvent = self.onImageClicked(file_path)
-
-            textLabel = QLabel(file_name)
-            textLabel.setAlignment(Qt.AlignmentFlag.AlignCenter)
-
-            formLayout.addRow(imageLabel)
-            formLayout.addRow(textLabel)
-            layout.addWidget(containerWidget, row, col)
-
-            col += 1
-            if col >= max_cols:
-                col = 0
-                row += 1
+        return ASSET_INDEX.images(MAIN_HERO_EMOTION_FOLDER)
+
+    def populateGrid(self, photos):
+        self.imageModel.setAssets(photos)
 
     def onImageClicked(self, photo):
-        def handler(event):
-            self.emotionSelected.emit(photo)
-            self.accept()
-        return handler
+        self.emotionSelected.emit(photo)
+        self.accept()
 
 class SpriteWindow(QDialog):
     spriteSelected = pyqtSignal(str)  # Сигнал для передачи выбранного спрайта
@@ -191,19 +3166,11 @@ class SpriteWindow(QDialog):
         self.resize(800, 800)
 
         mainLayout = QVBoxLayout(self)
-        self.imageLayout = QGridLayout()
-
-        scrollArea = QScrollArea(self)
-        scrollAreaWidget = QWidget()
-        scrollAreaWidget.setLayout(self.imageLayout)
-        scrollArea.setWidget(scrollAreaWidget)
-        scrollArea.setWidgetResizable(True)
-        
-        mainLayout.addWidget(scrollArea)
+        createAssetGrid(self, mainLayout)
         self.setLayout(mainLayout)
 
         photos = self.images()
-        self.populateGrid(self.imageLayout, photos)
+        self.populateGrid(photos)
 
         buttonLayout = QHBoxLayout()
         buttonContainer = QWidget()
@@ -213,6 +3180,7 @@ class SpriteWindow(QDialog):
         backButton = QPushButton("Back", self)
         openSpritesFolder = QPushButton("Open sprites folder", self)
         refreshButton = QPushButton("Refresh", self)
+        refreshButton.setToolTip(ASSET_REFRESH_TOOLTIP)
 
         buttonLayout.addWidget(backButton)
         buttonLayout.addWidget(openSpritesFolder)
@@ -229,7 +3197,7 @@ class SpriteWindow(QDialog):
         else:
             SPRITES_FOLDER = "sprites/basic"
             self.photos = self.images()
-            self.populateGrid(self.imageLayout, self.photos)
+            self.populateGrid(self.photos)
 
     def onOpenSpritesFolder(self):
         folder_path = os.path.abspath(SPRITES_FOLDER)
@@ -251,99 +3219,273 @@ class SpriteWindow(QDialog):
             print(f"Folder does not exist: {folder_path}")
 
     def onRefreshButton(self):
+        ASSET_INDEX.rescanNow(SPRITES_FOLDER)
         self.photos = self.images()
-        self.populateGrid(self.imageLayout, self.photos)
+        self.populateGrid(self.photos)
 
     def images(self):
-        photos = []
-        for file_name in os.listdir(SPRITES_FOLDER):
-            file_path = os.path.join(SPRITES_FOLDER, file_name)
-            if os.path.isfile(file_path) and file_name.lower().endswith(".png"):
-                photos.append((file_name, file_path))
-        return photos
-    
-    def clearLayout(self, layout):
-        while layout.count():
-            item = layout.takeAt(0)
-            widget = item.widget()
-            if widget is not None:
-                widget.deleteLater()
-            else:
-                self.clearLayout(item.layout())
-
-    def populateGrid(self, layout, photos):
-        self.clearLayout(layout)
-        row, col, max_cols = 0, 0, 3  
-        for file_name, file_path in photos:
-            containerWidget = QWidget()
-            formLayout = QFormLayout(containerWidget)
-            formLayout.setVerticalSpacing(5)
-
-            pixmap = QPixmap(file_path)
-            imageLabel = QLabel()
-            imageLabel.setPixmap(pixmap.scaled(200, 200, Qt.AspectRatioMode.KeepAspectRatio, Qt.TransformationMode.SmoothTransformation))
-            imageLabel.setAlignment(Qt.AlignmentFlag.AlignCenter)
-            imageLabel.mousePressEvent = self.onImageClicked(file_path)
-
-            textLabel = QLabel(file_name)
-            textLabel.setAlignment(Qt.AlignmentFlag.AlignCenter)
-
-            formLayout.addRow(imageLabel)
-            formLayout.addRow(textLabel)
-            layout.addWidget(containerWidget, row, col)
-
-            col += 1
-            if col >= max_cols:
-                col = 0
-                row += 1
+        return ASSET_INDEX.images(SPRITES_FOLDER)
+
+    def populateGrid(self, photos):
+        self.imageModel.setAssets(photos)
 
     def onImageClicked(self, file_path):
-        def handler(event):
-            global SPRITES_FOLDER
-            BUFFER_SPRITES_FOLDER = SPRITES_FOLDER
-            new_folder = os.path.join(SPRITES_FOLDER[:-5], os.path.basename(file_path)[:-4])
+        global SPRITES_FOLDER
+        BUFFER_SPRITES_FOLDER = SPRITES_FOLDER
+        new_folder = os.path.join(SPRITES_FOLDER[:-5], os.path.basename(file_path)[:-4])
+        
+        if ASSET_INDEX.hasFolder(new_folder):
+            SPRITES_FOLDER = new_folder
+            self.photos = self.images()
+            self.populateGrid(self.photos)
+        else:
+            # Check if the sprite structure exists
+            if self.key not in BUFFER_DATA:
+                print(f"Error: Key '{self.key}' not found in BUFFER_DATA")
+                return
             
-            if os.path.exists(new_folder):
-                SPRITES_FOLDER = new_folder
-                self.photos = self.images()
-                self.populateGrid(self.imageLayout, self.photos)
-            else:
-                # Check if the sprite structure exists
-                if self.key not in BUFFER_DATA:
-                    print(f"Error: Key '{self.key}' not found in BUFFER_DATA")
-                    return
+            sprites = BUFFER_DATA[self.key].sprites
+            if self.spriteId is None:
+                sprites.append(Sprite(name=file_path))
                 
-                if "sprite" not in BUFFER_DATA[self.key]:
-                    print(f"Error: 'sprite' key not found in BUFFER_DATA[{self.key}]")
+            else:
+                # Ensure spriteId exists
+                if not 0 <= int(self.spriteId) < len(sprites):
+                    print(f"Error: spriteId '{self.spriteId}' not found in BUFFER_DATA[{self.key}].sprites")
                     return
                 
-                if self.spriteId is None:
-                    count = BUFFER_DATA[self.key]["sprite"]["count"]
-                    BUFFER_DATA[self.key]["sprite"]["count"] = count + 1
-                    BUFFER_DATA[self.key]["sprite"][str(count)] = {"spriteId": "",
-                                                                   "name": file_path,
-                                                                   "position": {
-                                                                       "x": 0,
-                                                                       "y": 0
-                                                                   },
-                                                                   "scale": {
-                                                                       "x": 0.6,
-                                                                       "y": 0.6
-                                                                   },
-                                                                   "animation": False}
-                    
-                else:
-                    # Ensure spriteId exists
-                    if str(self.spriteId) not in BUFFER_DATA[self.key]["sprite"]:
-                        print(f"Error: spriteId '{self.spriteId}' not found in BUFFER_DATA[{self.key}]['sprite']")
-                        return
-                    
-                    BUFFER_DATA[self.key]["sprite"][str(self.spriteId)]["name"] = file_path
-                
-                SPRITES_FOLDER = BUFFER_SPRITES_FOLDER
-                self.spriteSelected.emit(file_path)  # Эмиссия сигнала
-                self.accept()
-        return handler
+                sprites[int(self.spriteId)].name = file_path
+            
+            SPRITES_FOLDER = BUFFER_SPRITES_FOLDER
+            self.spriteSelected.emit(file_path)  # Эмиссия сигнала
+            self.accept()
+
+class AssetReportDialog(QDialog):
+    """Результат проверки ассетов; двойной щелчок по строке открывает первый кадр с проблемой."""
+    frameRequested = pyqtSignal(str)
+
+    def __init__(self, issues, frames, elapsed_ms, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Asset Validation")
+        self.resize(900, 500)
+        self.issues = issues
+
+        errors = sum(issue["kind"] in AssetValidator.ERRORS for issue in issues)
+        layout = QVBoxLayout(self)
+        layout.addWidget(QLabel(f"{frames} frames checked in {elapsed_ms / 1000:.2f} s: "
+                                f"{len(issues)} issues, {errors} errors"))
+
+        self.issueList = QListWidget(self)
+        for issue in issues:
+            item = QListWidgetItem(AssetValidator.formatIssue(issue))
+            if issue["kind"] in AssetValidator.ERRORS:
+                item.setForeground(QColor(200, 40, 40))
+            self.issueList.addItem(item)
+        self.issueList.itemDoubleClicked.connect(self.onIssueDoubleClicked)
+        layout.addWidget(self.issueList)
+
+        closeButton = QPushButton("Close", self)
+        closeButton.clicked.connect(self.accept)
+        layout.addWidget(closeButton)
+
+    def onIssueDoubleClicked(self, item):
+        references = self.issues[self.issueList.row(item)]["references"]
+        if references:
+            self.frameRequested.emit(references[0][0])
+
+
+class FrameSearchPanel(QWidget):
+    """Панель поиска по кадрам: строка запроса и найденные кадры; выбор строки открывает кадр."""
+    frameRequested = pyqtSignal(str)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.queryEdit = QLineEdit(self)
+        self.queryEdit.setPlaceholderText('chara:"Name" sprite:file word* -bg:name')
+        self.queryEdit.setClearButtonEnabled(True)
+        self.queryEdit.setToolTip("Fields: text, chara, chapter, comment, bg, sprite.\n"
+                                  "All terms must match; \"quotes\" match a phrase, word* a prefix, -term excludes.")
+        self.statusLabel = QLabel(self)
+        self.resultModel = FrameListModel(self)
+        self.resultView = QListView(self)
+        self.resultView.setModel(self.resultModel)
+        self.resultView.setUniformItemSizes(True)
+
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(4, 4, 4, 4)
+        layout.addWidget(self.queryEdit)
+        layout.addWidget(self.statusLabel)
+        layout.addWidget(self.resultView)
+
+        # Поиск по мере набора, но не на каждую букву
+        self.searchTimer = QTimer(self)
+        self.searchTimer.setSingleShot(True)
+        self.searchTimer.setInterval(150)
+        self.searchTimer.timeout.connect(self.search)
+        self.queryEdit.textChanged.connect(lambda: self.searchTimer.start())
+        self.queryEdit.returnPressed.connect(self.search)
+        self.resultView.clicked.connect(self.onResultSelected)
+        self.resultView.selectionModel().currentChanged.connect(self.onResultSelected)
+
+    def focusQuery(self):
+        self.queryEdit.setFocus()
+        self.queryEdit.selectAll()
+
+    def search(self):
+        self.searchTimer.stop()
+        self.resultModel.clear()
+        query = self.queryEdit.text().strip()
+        if not query:
+            self.statusLabel.clear()
+            return
+        if not SEARCH_INDEX.built:
+            # Первый запрос строит индекс целиком — на больших сценариях это заметная пауза
+            self.statusLabel.setText(f"Indexing {len(BUFFER_DATA)} frames...")
+            self.statusLabel.repaint()
+            QApplication.setOverrideCursor(Qt.CursorShape.WaitCursor)
+            try:
+                SEARCH_INDEX.rebuild()
+            finally:
+                QApplication.restoreOverrideCursor()
+        timer = QElapsedTimer()
+        timer.start()
+        keys, error = SEARCH_INDEX.search(query)
+        if error:
+            self.statusLabel.setText(error)
+            return
+        elapsed_ms = timer.elapsed()
+        self.resultModel.appendKeys(keys)
+        self.statusLabel.setText(f"{len(keys)} frames ({elapsed_ms} ms)")
+
+    def onResultSelected(self, index, previous=None):
+        if index.isValid():
+            self.frameRequested.emit(index.data(FrameListModel.KeyRole))
+
+
+class BatchEditDialog(QDialog):
+    """Пакетная правка: операция с параметрами и кадры, к которым она применяется."""
+    applyRequested = pyqtSignal(list)
+    SCOPES = ("All frames", "Row range", "Search results")
+    OPERATIONS = ("Replace text", "Shift sprites", "Set chapter")
+
+    def __init__(self, frameModel, resultModel, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Batch Edit")
+        self.frameModel = frameModel
+        self.resultModel = resultModel
+
+        layout = QVBoxLayout(self)
+        form = QFormLayout()
+        self.scopeCombo = QComboBox(self)
+        self.scopeCombo.addItems(self.SCOPES)
+        form.addRow("Frames:", self.scopeCombo)
+        self.rangeFrom = QSpinBox(self)
+        self.rangeTo = QSpinBox(self)
+        for spinbox in (self.rangeFrom, self.rangeTo):
+            spinbox.setRange(0, max(len(frameModel.keys) - 1, 0))
+        self.rangeTo.setValue(self.rangeTo.maximum())
+        rangeLayout = QHBoxLayout()
+        rangeLayout.addWidget(self.rangeFrom)
+        rangeLayout.addWidget(QLabel("to"))
+        rangeLayout.addWidget(self.rangeTo)
+        self.rangeWidget = QWidget(self)
+        self.rangeWidget.setLayout(rangeLayout)
+        rangeLayout.setContentsMargins(0, 0, 0, 0)
+        form.addRow("Rows:", self.rangeWidget)
+        self.operationCombo = QComboBox(self)
+        self.operationCombo.addItems(self.OPERATIONS)
+        form.addRow("Operation:", self.operationCombo)
+        layout.addLayout(form)
+
+        self.pages = QStackedWidget(self)
+        replacePage = QWidget()
+        replaceForm = QFormLayout(replacePage)
+        self.fieldCombo = QComboBox()
+        for field, label in BatchEdit.TEXT_FIELDS.items():
+            self.fieldCombo.addItem(label, field)
+        self.findEdit = QLineEdit()
+        self.replaceEdit = QLineEdit()
+        self.wholeCheckbox = QCheckBox("Match the whole value")
+        replaceForm.addRow("Field:", self.fieldCombo)
+        replaceForm.addRow("Find:", self.findEdit)
+        replaceForm.addRow("Replace with:", self.replaceEdit)
+        replaceForm.addRow("", self.wholeCheckbox)
+        self.pages.addWidget(replacePage)
+
+        shiftPage = QWidget()
+        shiftForm = QFormLayout(shiftPage)
+        self.shiftX = QDoubleSpinBox()
+        self.shiftY = QDoubleSpinBox()
+        for spinbox in (self.shiftX, self.shiftY):
+            spinbox.setRange(-10000, 10000)
+            spinbox.setDecimals(1)
+        self.spriteFilterEdit = QLineEdit()
+        self.spriteFilterEdit.setPlaceholderText("all sprites")
+        shiftForm.addRow("X:", self.shiftX)
+        shiftForm.addRow("Y:", self.shiftY)
+        shiftForm.addRow("Sprite name contains:", self.spriteFilterEdit)
+        self.pages.addWidget(shiftPage)
+
+        chapterPage = QWidget()
+        chapterForm = QFormLayout(chapterPage)
+        self.chapterEdit = QLineEdit()
+        chapterForm.addRow("Chapter:", self.chapterEdit)
+        self.pages.addWidget(chapterPage)
+        layout.addWidget(self.pages)
+
+        self.statusLabel = QLabel(self)
+        layout.addWidget(self.statusLabel)
+        buttons = QHBoxLayout()
+        applyButton = QPushButton("Apply", self)
+        closeButton = QPushButton("Close", self)
+        buttons.addStretch()
+        buttons.addWidget(applyButton)
+        buttons.addWidget(closeButton)
+        layout.addLayout(buttons)
+
+        self.operationCombo.currentIndexChanged.connect(self.pages.setCurrentIndex)
+        self.scopeCombo.currentIndexChanged.connect(self.updateScope)
+        applyButton.clicked.connect(self.onApply)
+        closeButton.clicked.connect(self.accept)
+        self.updateScope()
+
+    def updateScope(self):
+        self.rangeWidget.setEnabled(self.scopeCombo.currentIndex() == 1)
+        self.scopeCombo.setItemText(2, f"Search results ({len(self.resultModel.keys)})")
+
+    def selectedKeys(self):
+        scope = self.scopeCombo.currentIndex()
+        if scope == 1:
+            return self.frameModel.keys[self.rangeFrom.value():self.rangeTo.value() + 1]
+        if scope == 2:
+            return [key for key in self.resultModel.keys if key in BUFFER_DATA]
+        return list(self.frameModel.keys)
+
+    def buildChanges(self, keys):
+        operation = self.operationCombo.currentIndex()
+        if operation == 0:
+            if not self.findEdit.text() and not self.wholeCheckbox.isChecked():
+                return None
+            return BatchEdit.replaceText(keys, self.fieldCombo.currentData(), self.findEdit.text(),
+                                         self.replaceEdit.text(), self.wholeCheckbox.isChecked())
+        if operation == 1:
+            return BatchEdit.shiftSprites(keys, self.shiftX.value(), self.shiftY.value(), self.spriteFilterEdit.text())
+        return BatchEdit.setChapter(keys, self.chapterEdit.text())
+
+    def onApply(self):
+        self.updateScope()
+        timer = QElapsedTimer()
+        timer.start()
+        # Пакет создает сотни тысяч мелких объектов — без паузы сборщик раз за разом обходит все кадры
+        with gcPaused():
+            changes = self.buildChanges(self.selectedKeys())
+            if changes is None:
+                self.statusLabel.setText("Enter the text to find")
+                return
+            self.applyRequested.emit(changes)
+        frames = len({key for key, _, _, _ in changes})
+        self.statusLabel.setText(f"Changed {len(changes)} values in {frames} frames ({timer.elapsed()} ms)")
+
 
 class BackgroundWindow(QDialog):
     def __init__(self, key, subject):
@@ -357,19 +3499,11 @@ class BackgroundWindow(QDialog):
         self.resize(800, 800)
 
         mainLayout = QVBoxLayout(self)
-        self.imageLayout = QGridLayout()
-
-        scrollArea = QScrollArea(self)
-        scrollAreaWidget = QWidget()
-        scrollAreaWidget.setLayout(self.imageLayout)
-        scrollArea.setWidget(scrollAreaWidget)
-        scrollArea.setWidgetResizable(True)
-
-        mainLayout.addWidget(scrollArea)
+        createAssetGrid(self, mainLayout)
         self.setLayout(mainLayout)
 
         photos = self.images()
-        self.populateGrid(self.imageLayout, photos)
+        self.populateGrid(photos)
 
         buttonLayout = QHBoxLayout()
         buttonContainer = QWidget()
@@ -379,6 +3513,7 @@ class BackgroundWindow(QDialog):
         backButton = QPushButton("Back", self)
         openBackgroundFolder = QPushButton("Open background folder", self)
         refreshButton = QPushButton("Refresh", self)
+        refreshButton.setToolTip(ASSET_REFRESH_TOOLTIP)
 
         buttonLayout.addWidget(backButton)
         buttonLayout.addWidget(openBackgroundFolder)
@@ -411,61 +3546,23 @@ class BackgroundWindow(QDialog):
             print(f"Folder does not exist: {folder_path}")
 
     def onRefreshButton(self):
+        ASSET_INDEX.rescanNow(BACKGROUND_FOLDER)
         self.photos = self.images()
-        self.populateGrid(self.imageLayout, self.photos)
+        self.populateGrid(self.photos)
 
     def images(self):
-        photos = []
-        for file_name in os.listdir(BACKGROUND_FOLDER):
-            file_path = os.path.join(BACKGROUND_FOLDER, file_name)
-            if os.path.isfile(file_path) and file_name.lower().endswith(".png"):
-                photos.append((file_name, file_path))
-        return photos
-
-    def clearLayout(self, layout):
-        while layout.count():
-            item = layout.takeAt(0)
-            widget = item.widget()
-            if widget is not None:
-                widget.deleteLater()
-            else:
-                self.clearLayout(item.layout())
-
-    def populateGrid(self, layout, photos):
-        self.clearLayout(layout)
-        row, col, max_cols = 0, 0, 2  # Устанавливаем количество столбцов
-        for file_name, file_path in photos:
-            containerWidget = QWidget()
-            formLayout = QFormLayout(containerWidget)
-            formLayout.setVerticalSpacing(5)
-
-            pixmap = QPixmap(file_path)
-            imageLabel = QLabel()
-            imageLabel.setPixmap(pixmap.scaled(200, 200, Qt.AspectRatioMode.KeepAspectRatio, Qt.TransformationMode.SmoothTransformation))
-            imageLabel.setAlignment(Qt.AlignmentFlag.AlignCenter)
-            imageLabel.mousePressEvent = self.onImageClicked(file_path)
-
-            textLabel = QLabel(file_name)
-            textLabel.setAlignment(Qt.AlignmentFlag.AlignCenter)
-
-            formLayout.addRow(imageLabel)
-            formLayout.addRow(textLabel)
-            layout.addWidget(containerWidget, row, col)
-
-            col += 1
-            if col >= max_cols:
-                col = 0
-                row += 1
+        return ASSET_INDEX.images(BACKGROUND_FOLDER)
+
+    def populateGrid(self, photos):
+        self.imageModel.setAssets(photos)
 
     def onImageClicked(self, photo):
-        def handler(event):
-            global BUFFER_DATA
-            if self.subject == "background":
-                BUFFER_DATA[self.key]['background']['name'] = photo
-            else:
-                BUFFER_DATA[self.key]['ui']['charaEmotionBackground'] = photo
-            self.accept()
-        return handler
+        global BUFFER_DATA
+        if self.subject == "background":
+            BUFFER_DATA[self.key].background.name = photo
+        else:
+            BUFFER_DATA[self.key].ui.charaEmotionBackground = photo
+        self.accept()
 
 class MainWindow(QMainWindow):
     def __init__(self):
@@ -476,16 +3573,40 @@ class MainWindow(QMainWindow):
 
         self.key = None  # Initialize self.key to None
         self.currentFileName = None  # Переменная для хранения текущего имени файла
+        self.pendingRecovery = None  # записи журнала, которые применяются после загрузки файла
+        self.saveQueued = False  # Ctrl+S во время записи — сохранить еще раз после нее
+        # Правка попадает в историю после всех обработчиков события, которое ее вызвало
+        self.historyTimer = QTimer(self)
+        self.historyTimer.setSingleShot(True)
+        self.historyTimer.setInterval(0)
+        self.historyTimer.timeout.connect(self.commitHistory)
+        self.historyPending = False
+
+        # Индикатор фоновой загрузки сценария
+        self.loadProgressBar = QProgressBar()
+        self.loadProgressBar.setMaximumWidth(200)
+        self.loadProgressBar.setVisible(False)
+        self.statusBar().addPermanentWidget(self.loadProgressBar)
+        self.loadTimer = QElapsedTimer()
+        SCENARIO_LOADER.framesLoaded.connect(self.onFramesLoaded)
+        SCENARIO_LOADER.progress.connect(self.onLoadProgress)
+        SCENARIO_LOADER.finished.connect(self.onLoadFinished)
+        SCENARIO_SAVER.finished.connect(self.onSaveFinished)
+        ASSET_VALIDATION.finished.connect(self.onAssetsValidated)
 
 
         self.createCanvas()
         self.barMenu()
         self.toolbar()
-        self.treeWidget = QTreeWidget()
-        self.treeWidget.setHeaderHidden(True)
+        self.frameListModel = FrameListModel(self)
+        self.frameListView = QListView()
+        self.frameListView.setModel(self.frameListModel)
+        self.frameListView.setUniformItemSizes(True)
         self.setupDockWidget()
         self.connectSignals()
         self.inspectorDockWidget()
+        # Предложение восстановить правки — после показа окна
+        QTimer.singleShot(0, self.recoverSession)
 
     
     def barMenu(self):
@@ -521,13 +3642,45 @@ class MainWindow(QMainWindow):
         fileMenu.addAction(saveAction)
         saveAsAction = QAction("&Save As...", self)
         fileMenu.addAction(saveAsAction)
+        compactAction = QAction("Compact JSON", self)
+        compactAction.setCheckable(True)
+        compactAction.setChecked(SETTINGS["compact_json"])
+        fileMenu.addAction(compactAction)
         fileMenu.addSeparator()
         exitAction = QAction("&Exit", self)
         fileMenu.addAction(exitAction)
 
+        editMenu = menu.addMenu("&Edit")
+        self.undoAction = QAction("&Undo", self)
+        self.undoAction.setShortcut("Ctrl+Z")
+        editMenu.addAction(self.undoAction)
+        self.undoAction.triggered.connect(self.undoEdit)
+        self.redoAction = QAction("&Redo", self)
+        self.redoAction.setShortcuts(["Ctrl+Shift+Z", "Ctrl+Y"])
+        editMenu.addAction(self.redoAction)
+        self.redoAction.triggered.connect(self.redoEdit)
+        UNDO_HISTORY.changed.connect(self.updateHistoryActions)
+        self.updateHistoryActions()
+
+        toolsMenu = menu.addMenu("&Tools")
+        validateAction = QAction("&Validate Assets...", self)
+        toolsMenu.addAction(validateAction)
+        validateAction.triggered.connect(self.validateAssets)
+        duplicatesAction = QAction("Find &Duplicate Assets...", self)
+        toolsMenu.addAction(duplicatesAction)
+        duplicatesAction.triggered.connect(self.showDuplicateAssets)
+        findAction = QAction("&Find Frames...", self)
+        findAction.setShortcut("Ctrl+F")
+        toolsMenu.addAction(findAction)
+        findAction.triggered.connect(self.showSearch)
+        batchAction = QAction("&Batch Edit...", self)
+        toolsMenu.addAction(batchAction)
+        batchAction.triggered.connect(self.showBatchEdit)
+
         openAction.triggered.connect(self.openFile)
         saveAction.triggered.connect(self.saveFile)
         saveAsAction.triggered.connect(self.saveFileAs)
+        compactAction.toggled.connect(self.toggleCompactJson)
         exitAction.triggered.connect(self.close)
 
         openAction.setShortcut("Ctrl+O")
@@ -536,29 +3689,142 @@ class MainWindow(QMainWindow):
         exitAction.setShortcut("Ctrl+Q")
 
     def openFile(self):
-        global BUFFER_DATA
         fileName, _ = QFileDialog.getOpenFileName(self, "Open file", "", "JSON files (*.json)")
         if fileName:
-            try:
-                with open(fileName, "r", encoding="utf-8") as file:
-                    BUFFER_DATA = json.load(file)
-                    self.currentFileName = fileName  # Сохраняем имя файла
-                    self.dockTreeWidget(BUFFER_DATA)
-            except Exception as e:
-                QMessageBox.critical(self, "Load Error", f"Failed to load file: {e}")
+            self.loadScenario(fileName)
+
+    def loadScenario(self, fileName, recovery=None):
+        """Загружает сценарий; recovery — записи журнала, которые применяются после загрузки."""
+        global BUFFER_DATA
+        # Кадры приходят из потока пачками, первые доступны до окончания загрузки
+        JOURNAL.watch(None)
+        SEARCH_INDEX.watch(None)
+        SEARCH_INDEX.clear()
+        UNDO_HISTORY.watch(None)
+        UNDO_HISTORY.reset()
+        BUFFER_DATA = Scenario()
+        self.currentFileName = None
+        self.key = None
+        self.scene.loadFrame(None)
+        self.inspectorScrollArea.setVisible(False)
+        self.frameListModel.clear()
+        self.loadProgressBar.setValue(0)
+        self.loadProgressBar.setVisible(True)
+        self.loadTimer.start()
+        self.pendingRecovery = recovery
+        if recovery is None:
+            JOURNAL.reset(fileName)
+        SCENARIO_LOADER.load(fileName)
+
+    def onFramesLoaded(self, path, chunk):
+        BUFFER_DATA.update(chunk)
+        keys = [key for key, _ in chunk]
+        self.frameListModel.appendKeys(keys)
+        SEARCH_INDEX.updateKeys(keys)
+
+    def onLoadProgress(self, done, total):
+        self.loadProgressBar.setValue(int(done * 100 / total) if total else 100)
+
+    def onLoadFinished(self, path, error):
+        self.loadProgressBar.setVisible(False)
+        recovery, self.pendingRecovery = self.pendingRecovery, None
+        if error:
+            # В буфере теперь пустой несохраненный сценарий — журнал ведется для него,
+            # иначе при восстановлении он остался бы выключенным до следующей загрузки
+            JOURNAL.reset(None)
+            QMessageBox.critical(self, "Load Error", f"Failed to load file: {error}")
+            return
+        self.currentFileName = path  # Сохраняем имя файла
+        self.statusBar().showMessage(f"Loaded {len(BUFFER_DATA)} frames in {self.loadTimer.elapsed() / 1000:.2f} s", 5000)
+        if recovery is not None:
+            self.applyRecovery(path, recovery)
+
+    def validateAssets(self):
+        if SCENARIO_LOADER.isLoading():
+            self.statusBar().showMessage("The file is still loading", 3000)
+            return
+        if ASSET_VALIDATION.isRunning():
+            return
+        self.validatedFrames = len(BUFFER_DATA)
+        ASSET_VALIDATION.start(BUFFER_DATA.items())
+        self.statusBar().showMessage("Validating assets...")
+
+    def showDuplicateAssets(self):
+        if not ASSET_INDEX.ready:
+            self.statusBar().showMessage("The asset index is still being built", 3000)
+            return
+        groups = ASSET_INDEX.duplicates()
+        if not groups:
+            QMessageBox.information(self, "Duplicate Assets", "No duplicate assets found.")
+            return
+        wasted = sum(ASSET_INDEX.record(paths[0]).size * (len(paths) - 1) for paths in groups)
+        box = QMessageBox(QMessageBox.Icon.Information, "Duplicate Assets",
+                          f"{len(groups)} groups of identical files, {wasted / 2 ** 20:.1f} MB in extra copies.", parent=self)
+        box.setDetailedText("\n\n".join("\n".join(paths) for paths in groups))
+        box.exec()
+
+    def onAssetsValidated(self, issues, error, elapsed_ms):
+        self.statusBar().clearMessage()
+        if error:
+            QMessageBox.critical(self, "Asset Validation", f"Validation failed: {error}")
+            return
+        self.assetReport = AssetReportDialog(issues, self.validatedFrames, elapsed_ms, self)
+        self.assetReport.frameRequested.connect(lambda key: self.inspectorLoad([key]) if key in BUFFER_DATA else None)
+        self.assetReport.show()
+
+    def recoverSession(self):
+        """Предлагает восстановить правки из журнала, оставшегося от прошлого запуска."""
+        base, records = ScenarioJournal.read(JOURNAL.path)
+        # Одни записи "auto" — кадры только просматривали
+        edits = ScenarioJournal.userEdits(records)
+        if edits:
+            answer = QMessageBox.question(self, "Recover Session",
+                                          f"Found {edits} unsaved changes to {base or 'an unsaved scenario'}.\n"
+                                          "Recover them?")
+            if answer == QMessageBox.StandardButton.Yes:
+                if base is None:
+                    self.applyRecovery(None, records)
+                    return
+                if os.path.exists(base):
+                    self.loadScenario(base, records)
+                    return
+                QMessageBox.warning(self, "Recover Session", f"File not found: {base}")
+        JOURNAL.reset(None)
+
+    def applyRecovery(self, base, records):
+        applied, added, changed = ScenarioJournal.replay(records)
+        self.frameListModel.appendKeys(added)
+        for key in changed:
+            self.frameListModel.frameChanged(key)
+        SEARCH_INDEX.updateKeys(added + changed)
+        # Кадры заменены целиком — шаги истории до восстановления к ним уже не подходят
+        UNDO_HISTORY.reset()
+        # Восстановленные правки по-прежнему не сохранены — они остаются в журнале
+        JOURNAL.reset(base, records[:applied])
+        recovered, edits = ScenarioJournal.userEdits(records[:applied]), ScenarioJournal.userEdits(records)
+        if applied < len(records):
+            QMessageBox.warning(self, "Recover Session",
+                                f"Recovered {recovered} of {edits} changes: the scenario file was modified since.")
+        else:
+            self.statusBar().showMessage(f"Recovered {recovered} unsaved changes", 5000)
 
     def saveFile(self):
         """
         Сохраняет данные в файл, если он был ранее открыт или сохранён.
         Если файл не задан, вызывается диалог сохранения (Save As).
         """
+        if SCENARIO_LOADER.isLoading():
+            QMessageBox.warning(self, "Save Error", "The file is still loading.")
+            return
         if self.currentFileName:
-            try:
-                with open(self.currentFileName, 'w', encoding='utf-8') as file:
-                    json.dump(BUFFER_DATA, file, ensure_ascii=False, indent=4)
-                QMessageBox.information(self, "Success", "File saved successfully!")
-            except Exception as e:
-                QMessageBox.critical(self, "Save Error", f"Failed to save file: {e}")
+            if SCENARIO_SAVER.isSaving():
+                # Повторные Ctrl+S во время записи схлопываются в одно сохранение после нее
+                self.saveQueued = True
+                self.statusBar().showMessage("Save queued until the current one finishes")
+                return
+            JOURNAL.saveStarted()
+            SCENARIO_SAVER.save(self.currentFileName, SETTINGS["compact_json"])
+            self.statusBar().showMessage(f"Saving {os.path.basename(self.currentFileName)}...")
         else:
             self.saveFileAs()  # Если файл не выбран, вызываем "Save As"
 
@@ -566,19 +3832,32 @@ class MainWindow(QMainWindow):
         """
         Сохраняет данные в новый файл, который выбирается через диалог.
         """
+        if SCENARIO_LOADER.isLoading():
+            QMessageBox.warning(self, "Save Error", "The file is still loading.")
+            return
         fileName, _ = QFileDialog.getSaveFileName(self, "Save file", "", "JSON files (*.json)")
         if fileName:
-            try:
-                if not fileName.endswith(".json"):
-                    fileName += ".json"  # Добавляем расширение, если его нет
-                with open(fileName, 'w', encoding='utf-8') as file:
-                    json.dump(BUFFER_DATA, file, ensure_ascii=False, indent=4)
-                self.currentFileName = fileName  # Сохраняем имя файла
-                QMessageBox.information(self, "Success", "File saved successfully!")
-            except Exception as e:
-                QMessageBox.critical(self, "Save Error", f"Failed to save file: {e}")
-
+            if not fileName.endswith(".json"):
+                fileName += ".json"  # Добавляем расширение, если его нет
+            JOURNAL.saveStarted()
+            SCENARIO_SAVER.save(fileName, SETTINGS["compact_json"])
+            self.statusBar().showMessage(f"Saving {os.path.basename(fileName)}...")
+
+    def onSaveFinished(self, path, error, snapshot_ms, write_ms, size):
+        JOURNAL.saveFinished(path, error)
+        queued, self.saveQueued = self.saveQueued, False
+        if error:
+            self.statusBar().clearMessage()
+            QMessageBox.critical(self, "Save Error", f"Failed to save file: {error}")
+            return
+        self.currentFileName = path  # Сохраняем имя файла
+        self.statusBar().showMessage(
+            f"Saved {os.path.basename(path)} ({size / 1024:.0f} KB): snapshot {snapshot_ms} ms, write {write_ms} ms", 5000)
+        if queued and not SCENARIO_SAVER.isSaving():
+            self.saveFile()
 
+    def toggleCompactJson(self, checked):
+        SETTINGS["compact_json"] = checked
 
     def toolbar(self):
         toolbar = QToolBar("Tool bar")
@@ -613,282 +3892,121 @@ class MainWindow(QMainWindow):
         toolbar.addAction(playAnimation)
         self.button_start_animation = playAnimation
 
-        selectBackground.triggered.connect(lambda: self.selectBackground("background"))
-
-        # Use a lambda to defer the method call
-        addSprite.triggered.connect(lambda: self.openSpriteWindow(self.key, None))  
-
-        newFrame.triggered.connect(lambda: self.addFrame())
-
-        playAnimation.triggered.connect(lambda: self.toggle_animation(playAnimation))
-
-        self.toolbar = toolbar
-
-    def addFrame(self):
-        length = len(BUFFER_DATA)  # Более эффективный способ получения длины словаря
-        new_frame = {
-            "background": {
-                "name": "",
-                "position": {
-                    "x": 0,
-                    "y": 0
-                },
-                "scale": {
-                    "x": 1,
-                    "y": 1
-                },
-                "animation": False
-            },
-            "text": {
-                "charaName": "",
-                "text": ""
-            },
-            "ui": {
-                "time": "",
-                "chapter": "",
-                "emotion": False,
-                "charaEmotion": "",
-                "charaEmotionBackground": "",
-                "charaEmotionBackgroundPosition": {
-                    "x": 0,
-                    "y": 0
-                },
-                "charaEmotionBackgroundScale": {
-                    "x": 1,
-                    "y": 1
-                }
-            },
-            "sprite": {
-                "count": 0
-            },
-            "comment": ""
-        }
-        
-        # Добавление нового кадра в BUFFER_DATA
-        BUFFER_DATA[str(length)] = new_frame
-        self.dockTreeWidget(BUFFER_DATA)
-
-
-
-
-
-
-
-    def openSpriteWindow(self, key, spriteId):
-        global SPRITES_FOLDER
-        SPRITES_FOLDER = "sprites/basic"
-        if key:
-            self.spriteWindow = SpriteWindow(key, spriteId)
-            self.spriteWindow.spriteSelected.connect(self.onSpriteSelected)  # Подключение сигнала к слоту
-            self.spriteWindow.exec()
-
-    def onSpriteSelected(self, sprite_path):
-        # Логика обновления QListWidget
-        key = self.path[0] if hasattr(self, 'path') and self.path else None
-        if key:
-            self.inspectorLoad(self.path)  # Перезагрузка инспектора
-
-
-    def createCanvas(self):
-        
-
-        self.animation_active = False
-        self.scene = QGraphicsScene()
-        view = QGraphicsView(self.scene)
-        view.setSceneRect(0, 0, 1600, 900)
-        view.setTransform(QTransform().scale(SETTINGS["scale_factor"], SETTINGS["scale_factor"]))
-        view.setSceneRect(SETTINGS["position"]["x"], SETTINGS["position"]["y"], 1600, 900)
-        view.setRenderHint(QPainter.RenderHint.Antialiasing)
-        view.setVerticalScrollBarPolicy(Qt.ScrollBarPolicy.ScrollBarAlwaysOn)
-        view.setHorizontalScrollBarPolicy(Qt.ScrollBarPolicy.ScrollBarAlwaysOn)
-        view.setDragMode(QGraphicsView.DragMode.ScrollHandDrag)
-        view.wheelEvent = self.zoom
-        rect_item = self.scene.addRect(0, 0, 1600, 900)
-        pen = QPen(Qt.GlobalColor.black)
-        rect_item.setPen(pen)
-        view.setStyleSheet("background-color: rgb(50, 70, 90)")
-        insideRect = QGraphicsRectItem(view.sceneRect())
-        insideRect.setBrush(QBrush(Qt.GlobalColor.white))
-        self.scene.addItem(insideRect)
-        self.setCentralWidget(view)
-
-        self.image_items = []
-        if self.key == None:
-            return
-        else:
-            self.load_images()
-
-    def load_images(self):
-        self.scene.clear()
-
-        # Задаем белый фон
-        white_background = self.scene.addRect(QRectF(0, 0, 1600, 900), brush=QBrush(QColor(255, 255, 255)))
-        white_background.setZValue(-10)
-
-        # Загружаем фон
-        background_info = BUFFER_DATA[self.key]["background"]
-        if background_info:
-            background_pixmap = QPixmap(background_info['name'])
-            if not background_pixmap.isNull():
-                self.background_item = QGraphicsPixmapItem(background_pixmap)
-
-                # Вычисляем коэффициент масштабирования для подгонки по высоте экрана
-                screen_height = 900  # высота экрана в пикселях
-                image_height = background_pixmap.height()
-                scale_factor = screen_height / image_height
-
-                # Проверяем, если текущий масштаб по высоте отличается от нужного значения
-                if background_info["scale"]["y"] != scale_factor:
-                    # Сохраняем новый масштаб в BUFFER_DATA
-                    BUFFER_DATA[self.key]["background"]["scale"]["y"] = scale_factor
-                    BUFFER_DATA[self.key]["background"]["scale"]["x"] = scale_factor
-
-                # Применяем масштабирование, даже если оно не изменилось
-                self.background_item.setTransform(QTransform().scale(
-                    BUFFER_DATA[self.key]["background"]["scale"]["x"],
-                    BUFFER_DATA[self.key]["background"]["scale"]["y"]
-                ))
-
-                # Устанавливаем позицию и z-значение
-                self.background_item.setPos(background_info["position"]["x"], background_info["position"]["y"])
-                self.background_item.setZValue(-1)
-                self.scene.addItem(self.background_item)
-
-        
-
-        sprite_data = BUFFER_DATA[self.key]["sprite"]
-        sprite_count = BUFFER_DATA[self.key]["sprite"]["count"]
-        self.image_items = []
-
-        for i in range(sprite_count):
-            sprite_info = sprite_data.get(str(i), {})
-            sprite_pixmap = QPixmap(sprite_info['name'])
-            if not sprite_pixmap.isNull():
-                sprite_item = QGraphicsPixmapItem(sprite_pixmap)
-
-                # Проверка условий для центрирования спрайта
-                if sprite_count == 1 and sprite_info["position"]["x"] == 0 and sprite_info["position"]["y"] == 0:
-                    # Рассчитываем центральное положение по оси X
-                    screen_width = 1600  # ширина экрана в пикселях
-                    sprite_width = sprite_pixmap.width() * sprite_info["scale"]["x"]
-                    centered_x = (screen_width - sprite_width) / 2
-                    sprite_info["position"]["x"] = centered_x  # Сохраняем новую позицию в BUFFER_DATA
-
-                    # Также сохраняем обновлённое значение позиции в BUFFER_DATA для сохранения
-                    BUFFER_DATA[self.key]["sprite"][str(i)]["position"]["x"] = centered_x
-
-                # Устанавливаем позицию, масштаб и добавляем спрайт на сцену
-                sprite_item.setPos(sprite_info["position"]["x"], sprite_info["position"]["y"])
-                sprite_item.setTransform(QTransform().scale(sprite_info["scale"]["x"], sprite_info["scale"]["y"]))
-                sprite_item.setZValue(i)
-                self.scene.addItem(sprite_item)
-                self.image_items.append((sprite_item, sprite_info))
-
-        # Создаем фиксированное изображение
-        mhimage = "packages/HeroMainDialogueTheme.PNG"
-        nmhimage = "packages/notNeroMainDialogueTheme.PNG"
-
-        if BUFFER_DATA[self.key]["text"]["charaName"] == "Макиширо Ямагаки":
-            fixed_image_path = mhimage
-        else:
-            fixed_image_path = nmhimage
-
-        self.fixed_image = QGraphicsPixmapItem(QPixmap(fixed_image_path))
-        self.fixed_image.setPos(0, 0)
-        self.fixed_image.setZValue(99)
-        self.scene.addItem(self.fixed_image)
-
-        # Добавляем текстовые элементы
-        self.add_text_elements()
-
-        # Если emotion включен, добавляем charaEmotionBackground
-        if BUFFER_DATA[self.key]["ui"]["emotion"]:
-            self.emotionWindow()
-
-
-    def emotionWindow(self):
-        """Создаем фон для эмоций с полигональной маской."""
-        chara_emotion_background = BUFFER_DATA[self.key]["ui"]["charaEmotionBackground"]
-        if chara_emotion_background:
-            emotion_bg_pixmap = QPixmap(chara_emotion_background)
-            if not emotion_bg_pixmap.isNull():
-                emotion_bg_pos = BUFFER_DATA[self.key]["ui"]["charaEmotionBackgroundPosition"]
-                emotion_bg_scale = BUFFER_DATA[self.key]["ui"]["charaEmotionBackgroundScale"]
-
-                # Масштабируем изображение
-                scaled_pixmap = emotion_bg_pixmap.scaled(
-                    int(emotion_bg_pixmap.width() * emotion_bg_scale["x"]),
-                    int(emotion_bg_pixmap.height() * emotion_bg_scale["y"])
-                )
-
-                self.chara_emotion_background_item = QGraphicsPixmapItem(scaled_pixmap)
-                self.chara_emotion_background_item.setPos(emotion_bg_pos["x"], emotion_bg_pos["y"])
-                self.chara_emotion_background_item.setZValue(99)
-
-                # Создаем полигон для маски
-                mask_polygon = QPolygonF([QPointF(1300, 300), QPointF(1600, 400), QPointF(1600, 900), QPointF(1100, 900)])
+        playScenario = QAction("Play Scenario", self)
+        toolbar.addAction(playScenario)
+        self.button_play_scenario = playScenario
 
-                # Создаем QPainterPath для маски
-                mask_path = QPainterPath()
-                mask_path.addPolygon(mask_polygon)
+        selectBackground.triggered.connect(lambda: self.selectBackground("background"))
 
-                # Применяем маску через QRegion
-                mask_region = QRegion(mask_path.toFillPolygon().toPolygon())
-                self.chara_emotion_background_item.setPixmap(scaled_pixmap)
-                self.chara_emotion_background_item.setShapeMode(QGraphicsPixmapItem.ShapeMode.MaskShape)
+        # Use a lambda to defer the method call
+        addSprite.triggered.connect(lambda: self.openSpriteWindow(self.key, None))  
 
-                # Маскируем все, что за пределами полигона
-                mask_image = QPixmap(scaled_pixmap.size())
-                mask_image.fill(Qt.GlobalColor.transparent)
-                painter = QPainter(mask_image)
-                painter.setClipRegion(mask_region)
-                painter.drawPixmap(0, 0, scaled_pixmap)
-                painter.end()
+        newFrame.triggered.connect(lambda: self.addFrame())
 
-                self.chara_emotion_background_item.setPixmap(mask_image)
-                self.scene.addItem(self.chara_emotion_background_item)
+        playAnimation.triggered.connect(lambda: self.toggle_animation(playAnimation))
+        playScenario.triggered.connect(self.toggleScenarioPlayback)
 
-                mhimagePath = BUFFER_DATA[self.key]["ui"]["charaEmotion"]
-                self.mhimage = QGraphicsPixmapItem(QPixmap(mhimagePath))
-                self.mhimage.setPos(1125, 400)
-                self.mhimage.setZValue(99)
+        previewFps = QComboBox()
+        previewFps.addItems(["30 FPS", "60 FPS", "120 FPS"])
+        previewFps.setCurrentText(f"{SETTINGS['preview_fps']} FPS")
+        previewFps.setToolTip("Animation preview frame rate")
+        previewFps.currentTextChanged.connect(self.setPreviewFps)
+        toolbar.addWidget(previewFps)
 
-                self.mhimage.setTransform(QTransform().scale(0.4, 0.4))
+        self.toolbar = toolbar
 
-                self.scene.addItem(self.mhimage)
+    def addFrame(self):
+        if SCENARIO_LOADER.isLoading():
+            self.statusBar().showMessage("The file is still loading", 3000)
+            return
+        key = str(len(BUFFER_DATA))
+        # Добавление нового кадра в BUFFER_DATA; в списке добавляется одна строка
+        BUFFER_DATA[key] = Frame()
+        JOURNAL.frameAdded(key)
+        self.frameListModel.appendKeys([key])
+        SEARCH_INDEX.update(key)
 
-    def add_text_elements(self):
-        # Текстовые элементы
-        text = BUFFER_DATA[self.key]["text"]["text"]
-        self.text_item = self.scene.addText(text)
-        self.text_item.setPos(20, 710)
-        self.text_item.setTextWidth(1100)
-        self.text_item.setZValue(100)
-        self.text_item.setFont(QFont("Arial", 24))
+    def openSpriteWindow(self, key, spriteId):
+        global SPRITES_FOLDER
+        SPRITES_FOLDER = "sprites/basic"
+        if key:
+            self.spriteWindow = SpriteWindow(key, spriteId)
+            self.spriteWindow.spriteSelected.connect(self.onSpriteSelected)  # Подключение сигнала к слоту
+            self.spriteWindow.exec()
 
-        name = BUFFER_DATA[self.key]["text"]["charaName"]
-        self.name_text = OutlinedTextItem(name)
-        self.name_text.setPos(15, 670)
-        self.name_text.setZValue(100)
-        self.name_text.setFont(QFont("Arial", 55))
-        self.scene.addItem(self.name_text)
+    def onSpriteSelected(self, sprite_path):
+        # Логика обновления QListWidget
+        key = self.path[0] if hasattr(self, 'path') and self.path else None
+        if key:
+            self.inspectorLoad(self.path)  # Перезагрузка инспектора
 
-        daytimeText = BUFFER_DATA[self.key]["ui"]["time"]
-        self.time_text = OutlinedTextItem(daytimeText)
-        self.time_text.setPos(1300, 60)
-        self.time_text.setZValue(100)
-        self.time_text.setFont(QFont("Arial", 40))
-        self.scene.addItem(self.time_text)
 
-        chapterText = BUFFER_DATA[self.key]["ui"]["chapter"]
-        self.chapter_text = OutlinedTextItem(chapterText)
-        self.chapter_text.setPos(1205, 108)
-        self.chapter_text.setZValue(100)
-        self.chapter_text.setFont(QFont("Arial", 30))
-        self.scene.addItem(self.chapter_text)
+    def createCanvas(self):
+        if not hasattr(self, 'view'):
+            self.animation_active = False
+            self.scene = FrameScene()
+            view = QGraphicsView(self.scene)
+            view.setSceneRect(0, 0, 1600, 900)
+            view.setTransform(QTransform().scale(SETTINGS["scale_factor"], SETTINGS["scale_factor"]))
+            view.setSceneRect(SETTINGS["position"]["x"], SETTINGS["position"]["y"], 1600, 900)
+            view.setRenderHint(QPainter.RenderHint.Antialiasing)
+            view.setVerticalScrollBarPolicy(Qt.ScrollBarPolicy.ScrollBarAlwaysOn)
+            view.setHorizontalScrollBarPolicy(Qt.ScrollBarPolicy.ScrollBarAlwaysOn)
+            view.setDragMode(QGraphicsView.DragMode.ScrollHandDrag)
+            view.wheelEvent = self.zoom
+            view.setStyleSheet("background-color: rgb(50, 70, 90)")
+            self.setCentralWidget(view)
+            self.view = view
+            self.canvasRefresh = CanvasRefreshScheduler(self.scene, SETTINGS["canvas_refresh_ms"], self)
+            self.canvasRefresh.flushed.connect(self.onCanvasFlushed)
+
+            # Статистика просмотра анимации поверх холста
+            self.playbackOverlay = QLabel(view.viewport())
+            self.playbackOverlay.setStyleSheet("background-color: rgba(0, 0, 0, 160); color: white; padding: 6px; font-size: 12px;")
+            self.playbackOverlay.move(10, 10)
+            self.playbackOverlay.setVisible(False)
+
+            self.scenarioPlayer = ScenarioPlayer(self.scene, self)
+            self.scenarioPlayer.frameChanged.connect(self.onScenarioFrameChanged)
+            self.scenarioPlayer.finished.connect(self.onScenarioFinished)
+            self.syncingFrameList = False
+
+        # Вложенные вызовы из инспектора схлопываются в одну перепривязку кадра
+        self.canvasRefresh.requestFrame(self.key)
+
+    def requestCanvasRefresh(self, element, index=None, key=None):
+        """Запрос на обновление одного элемента холста; выполняется планировщиком."""
+        if key is None or key == self.scene.key:
+            self.canvasRefresh.request(element, index)
+        self.scheduleHistoryCheckpoint()
+
+    def scheduleHistoryCheckpoint(self, *args):
+        self.historyPending = True
+        self.historyTimer.start()
+
+    def commitHistory(self):
+        # Сцена может дописать в кадр подогнанный масштаб — он входит в тот же шаг, что и правка
+        if self.canvasRefresh.isPending():
+            return
+        self.historyPending = False
+        UNDO_HISTORY.checkpoint()
+        # Журнал тоже догоняет правку, чтобы дописанное сценой позже не смешалось с ней
+        JOURNAL.checkpoint()
+
+    def onCanvasFlushed(self):
+        if self.historyPending:
+            self.commitHistory()
+        else:
+            UNDO_HISTORY.absorb()
+            JOURNAL.absorb()
 
+    def load_images(self):
+        # Сцена и её элементы переиспользуются, меняются только данные кадра
+        self.scene.loadFrame(self.key)
 
     def toggle_animation(self, button):
+        if self.scenarioPlayer.isActive():
+            self.scenarioPlayer.stop()
         if not self.animation_active:
             self.start_animation()
             button.setText("Stop Animation")
@@ -898,75 +4016,101 @@ class MainWindow(QMainWindow):
         self.animation_active = not self.animation_active
 
     def start_animation(self):
+        # Сцена должна соответствовать кадру до старта анимации
+        self.canvasRefresh.flush()
+        self.timeline = AnimationTimeline(BUFFER_DATA[self.key], self.scene)
+        self.playbackStats = PlaybackStats(SETTINGS["preview_fps"])
         self.elapsed_timer = QElapsedTimer()
         self.elapsed_timer.start()
-        self.global_timer = QTimer(self)
-        self.global_timer.timeout.connect(self.update_animation)
-        self.global_timer.start(33)  # 33 ms для 30 FPS
+        self.overlay_update_ms = 0.0
+        if not hasattr(self, 'global_timer'):
+            # Одноразовый точный таймер перезапускается до следующего кадра по сетке целевого FPS
+            self.global_timer = QTimer(self)
+            self.global_timer.setSingleShot(True)
+            self.global_timer.setTimerType(Qt.TimerType.PreciseTimer)
+            self.global_timer.timeout.connect(self.update_animation)
+        self.global_timer.start(0)
+        self.showPlaybackStats()
 
     def update_animation(self):
-        elapsed_time = self.elapsed_timer.elapsed()
-
-        # Флаг для остановки анимации, когда она завершится
-        all_animations_done = True
-
-        # Анимация фона
-        background_info = BUFFER_DATA[self.key]["background"]
-        if background_info["animation"]:
-            duration = background_info["animationSettings"]["time"]
-            if elapsed_time < duration:
-                all_animations_done = False
-
-                start_pos = QPointF(background_info["position"]["x"], background_info["position"]["y"])
-                target_pos = QPointF(background_info["animationSettings"]["position"]["x"], background_info["animationSettings"]["position"]["y"])
-                progress = elapsed_time / duration
-
-                # Здесь можно добавить функцию плавности (easing function)
-                eased_progress = self.ease_in_out_quad(progress)
-
-                new_x = start_pos.x() + eased_progress * (target_pos.x() - start_pos.x())
-                new_y = start_pos.y() + eased_progress * (target_pos.y() - start_pos.y())
-
-                self.background_item.setPos(QPointF(new_x, new_y))
-
-        # Анимация спрайтов
-        for item, image_info in self.image_items:
-            if image_info.get("animation"):
-                duration = image_info["animationSettings"]["time"]
-                if elapsed_time < duration:
-                    all_animations_done = False
-
-                    start_pos = QPointF(image_info["position"]["x"], image_info["position"]["y"])
-                    target_pos = QPointF(image_info["animationSettings"]["position"]["x"], image_info["animationSettings"]["position"]["y"])
-                    progress = elapsed_time / duration
-
-                    # Функция плавности
-                    eased_progress = self.ease_in_out_quad(progress)
-
-                    new_x = start_pos.x() + eased_progress * (target_pos.x() - start_pos.x())
-                    new_y = start_pos.y() + eased_progress * (target_pos.y() - start_pos.y())
-
-                    item.setPos(QPointF(new_x, new_y))
+        now = self.elapsed_timer.nsecsElapsed() / 1e6
+        self.playbackStats.tick(now)
 
         # Останавливаем анимацию, если все движения завершены
-        if all_animations_done:
+        if self.timeline.apply(now):
             self.stop_animation()
             self.button_start_animation.setText("Start Animation")
             self.animation_active = False
+            return
 
+        self.global_timer.start(self.playbackStats.nextFrameDelay(now))
+
+        if now - self.overlay_update_ms >= 250:
+            self.overlay_update_ms = now
+            self.showPlaybackStats()
 
     def stop_animation(self):
         if hasattr(self, 'global_timer'):
             self.global_timer.stop()
 
-        self.load_images()
-
-    def ease_in_out_quad(self, t):
-        """Функция плавности для более гладкой анимации."""
-        if t < 0.5:
-            return 2 * t * t
+        # Возвращаем элементы в покой без перерисовки кадра; если кадр сменился — перестраиваем сцену
+        if hasattr(self, 'timeline') and self.timeline.key == self.scene.key:
+            self.timeline.restore()
         else:
-            return -1 + (4 - 2 * t) * t
+            self.load_images()
+        if hasattr(self, 'playbackStats'):
+            self.showPlaybackStats()
+
+    def showPlaybackStats(self):
+        self.playbackOverlay.setText(self.playbackStats.summary())
+        self.playbackOverlay.adjustSize()
+        self.playbackOverlay.setVisible(True)
+
+    def toggleScenarioPlayback(self):
+        """Воспроизводит кадры подряд начиная с выбранного (или с первого)."""
+        if self.scenarioPlayer.isActive():
+            self.scenarioPlayer.stop()
+            return
+        if self.animation_active:
+            self.toggle_animation(self.button_start_animation)
+
+        keys = self.frameListModel.keys
+        start = self.frameListModel.rows.get(self.key, 0)
+        if start >= len(keys):
+            return
+        self.canvasRefresh.flush()
+        self.button_play_scenario.setText("Stop Scenario")
+        self.scenarioPlayer.start(keys[start:], SETTINGS["preview_fps"])
+
+    def onScenarioFrameChanged(self, key):
+        self.selectFrameRow(key)
+        self.showScenarioStats(key)
+
+    def onScenarioFinished(self, key):
+        self.button_play_scenario.setText("Play Scenario")
+        # Инспектор привязывается к кадру, на котором остановилось воспроизведение
+        self.path = [key]
+        self.inspectorLoad(self.path)
+        self.showScenarioStats(key)
+
+    def showScenarioStats(self, key):
+        self.playbackOverlay.setText(f"Frame {key}\n{self.scenarioPlayer.stats.summary()}")
+        self.playbackOverlay.adjustSize()
+        self.playbackOverlay.setVisible(True)
+
+    def selectFrameRow(self, key):
+        """Выделяет кадр в списке, не вызывая загрузку инспектора."""
+        row = self.frameListModel.rows.get(key)
+        if row is None:
+            return
+        self.syncingFrameList = True
+        try:
+            self.frameListView.setCurrentIndex(self.frameListModel.index(row))
+        finally:
+            self.syncingFrameList = False
+
+    def setPreviewFps(self, text):
+        SETTINGS["preview_fps"] = int(text.split()[0])
 
     def zoom(self, event: QWheelEvent):
         zoom_in_factor = 1.1
@@ -987,71 +4131,120 @@ class MainWindow(QMainWindow):
             self.centralWidget().scale(factor, factor)
             self.scale_factor = new_scale
             SETTINGS["scale_factor"] = self.scale_factor
+            # При приближении элементам может понадобиться более детальная копия изображения
+            if self.scene.key is not None and not self.animation_active and not self.scenarioPlayer.isActive():
+                self.canvasRefresh.requestFrame(self.scene.key)
 
 
     def setupDockWidget(self):
         dockWidget = QDockWidget("Scene Elements", self)
-        dockWidget.setWidget(self.treeWidget)
+        dockWidget.setWidget(self.frameListView)
         self.addDockWidget(Qt.DockWidgetArea.LeftDockWidgetArea, dockWidget)
 
         
-        dockWidget.setMaximumWidth(100)
+        dockWidget.setMaximumWidth(260)
 
 
 
-        self.treeWidget.header().setStyleSheet("""
-            QHeaderView::section {
-                background-color: rgb(50, 70, 90); 
-                color: white; 
-                font-size: 14px;
-            }
-        """)
         dockWidget.setStyleSheet("""
             background-color: rgb(50, 70, 90);
             color: white;
         """)
 
+        # Поиск — вкладкой рядом со списком кадров
+        self.searchPanel = FrameSearchPanel()
+        self.searchPanel.frameRequested.connect(self.openFrame)
+        self.searchDock = QDockWidget("Search", self)
+        self.searchDock.setWidget(self.searchPanel)
+        self.searchDock.setMaximumWidth(260)
+        self.searchDock.setStyleSheet(dockWidget.styleSheet())
+        self.addDockWidget(Qt.DockWidgetArea.LeftDockWidgetArea, self.searchDock)
+        self.tabifyDockWidget(dockWidget, self.searchDock)
+        dockWidget.raise_()
+
     def connectSignals(self):
-        self.treeWidget.itemClicked.connect(self.onItemClicked)
-        self.treeWidget.currentItemChanged.connect(self.onItemClicked)  # Добавляем связь с клавишами
+        self.frameListView.clicked.connect(self.onFrameSelected)
+        self.frameListView.selectionModel().currentChanged.connect(self.onFrameSelected)  # Добавляем связь с клавишами
 
 
-    def onItemClicked(self, item):
-        self.path = []
-        while item is not None:
-            self.path.append(item.text(0))
-            item = item.parent()
-        self.path.reverse()
-        
-        print(f"Item clicked: {self.path}")  # Отладочное сообщение для проверки пути
+    def showSearch(self):
+        self.searchDock.show()
+        self.searchDock.raise_()
+        self.searchPanel.focusQuery()
 
-        if not self.path:
-            return  # Если путь пустой, не продолжаем выполнение
+    def showBatchEdit(self):
+        if SCENARIO_LOADER.isLoading():
+            self.statusBar().showMessage("The file is still loading", 3000)
+            return
+        self.batchDialog = BatchEditDialog(self.frameListModel, self.searchPanel.resultModel, self)
+        self.batchDialog.applyRequested.connect(self.applyBatchEdit)
+        self.batchDialog.show()
 
-        # Здесь должна происходить загрузка инспектора, а не вызов окна фона
-        self.inspectorLoad(self.path)
-        self.createCanvas()
+    def applyBatchEdit(self, changes):
+        """Вносит пакет изменений: одна запись в журнале и одно обновление интерфейса."""
+        if not changes:
+            return
+        JOURNAL.checkpoint()
+        UNDO_HISTORY.checkpoint()
+        BatchEdit.apply(changes)
+        JOURNAL.recordBatch(changes)
+        UNDO_HISTORY.pushBatch(changes)
+        self.refreshFrames({key for key, _, _, _ in changes})
 
+    def undoEdit(self):
+        self.stepHistory(UNDO_HISTORY.undo, "Nothing to undo")
 
-    def loadTreeItems(self, data):
-        try:
-            for key, value in data.items():
-                print(f"Processing key: {key}")  # Логирование обрабатываемого ключа
-                root = QTreeWidgetItem(self.treeWidget, [str(key)])
-                self.treeWidget.addTopLevelItem(root)
-        except KeyError as e:
-            print(f"KeyError: {e}")
-        except TypeError as e:
-            print(f"TypeError: {e}")
-        except Exception as e:
-            print(f"Unexpected error: {e}")
+    def redoEdit(self):
+        self.stepHistory(UNDO_HISTORY.redo, "Nothing to redo")
 
-    def dockTreeWidget(self, data):
-        try:
-            self.treeWidget.clear()
-            self.loadTreeItems(data)
-        except Exception as e:
-            print(f"Error in dockTreeWidget: {e}")
+    def stepHistory(self, action, emptyMessage):
+        if SCENARIO_LOADER.isLoading():
+            return
+        JOURNAL.checkpoint()
+        result = action()
+        if result is None:
+            self.statusBar().showMessage(emptyMessage, 2000)
+            return
+        changes, batch = result
+        if batch:
+            JOURNAL.recordBatch(changes)
+        else:
+            JOURNAL.recordChanges(changes)
+        keys = {key for key, _, _, _ in changes}
+        # Инспектор перепривязывается к кадру заново — выбранный спрайт восстанавливается после
+        key, sprite = self.key, self.id
+        self.refreshFrames(keys)
+        # Отмена правки другого кадра показывает этот кадр
+        if len(keys) == 1 and self.key not in keys:
+            self.openFrame(next(iter(keys)))
+        elif sprite is not None and self.key == key and self.id is None:
+            self.selectSprite(sprite)
+
+    def updateHistoryActions(self):
+        self.undoAction.setEnabled(UNDO_HISTORY.canUndo())
+        self.redoAction.setEnabled(UNDO_HISTORY.canRedo())
+
+    def refreshFrames(self, keys):
+        """Обновляет списки, поиск и — если задет открытый кадр — инспектор и холст."""
+        self.frameListModel.framesChanged(keys)
+        self.searchPanel.resultModel.framesChanged(keys)
+        SEARCH_INDEX.updateKeys(keys)
+        if self.key in keys:
+            self.openFrame(self.key)
+
+    def openFrame(self, key):
+        if key in BUFFER_DATA:
+            self.path = [key]
+            self.inspectorLoad(self.path)
+
+    def onFrameSelected(self, index, previous=None):
+        if self.syncingFrameList or not index.isValid():
+            return  # Если ничего не выбрано, не продолжаем выполнение
+
+        self.path = [index.data(FrameListModel.KeyRole)]
+
+        # Здесь должна происходить загрузка инспектора, а не вызов окна фона
+        self.inspectorLoad(self.path)
 
     def inspectorDockWidget(self):
         self.inspectorDock = QDockWidget("Element inspector", self)
@@ -1071,19 +4264,14 @@ class MainWindow(QMainWindow):
             background-color: rgb(50, 70, 90);
             color: white;
         """)
+        self.buildInspector()
 
-    def inspectorLoad(self, path):
-        global BUFFER_DATA
+    def buildInspector(self):
+        """
+        Создает форму инспектора один раз. При выборе кадра она не пересоздается,
+        а перепривязывается к новому ключу через bindInspector.
+        """
         layout = self.inspectorGroup.layout()
-        self.createCanvas()
-        # Очистка предыдущих виджетов
-        for i in reversed(range(layout.count())):
-            widget = layout.itemAt(i).widget()
-            if widget is not None:
-                widget.deleteLater()
-        
-        key = path[0]
-        self.key = key
 
         formLayout = QFormLayout()
         scrollArea = QScrollArea()
@@ -1091,155 +4279,152 @@ class MainWindow(QMainWindow):
         scrollAreaWidget.setLayout(formLayout)
         scrollArea.setWidget(scrollAreaWidget)
         scrollArea.setWidgetResizable(True)
+        scrollArea.setVisible(False)  # Пока кадр не выбран, инспектор пустой
 
         layout.addWidget(scrollArea)
+        self.inspectorScrollArea = scrollArea
 
         formLayout.addRow(QLabel("Background"))
 
         backgroundSelectLayout = QHBoxLayout()
         backgroundSelectLabel = QLabel("Select background")
         backgroundSelectLabel.setStyleSheet("padding-left: 20px;")
-        backgroundSelectButton = QPushButton()
+        self.backgroundSelectButton = QPushButton()
         
         backgroundSelectLayout.addWidget(backgroundSelectLabel)
-        backgroundSelectLayout.addWidget(backgroundSelectButton)
+        backgroundSelectLayout.addWidget(self.backgroundSelectButton)
 
         formLayout.addRow(backgroundSelectLayout)
 
-        if BUFFER_DATA[key]["background"]["name"] != "":
-            backgroundSelectButtonText = BUFFER_DATA[key]["background"]["name"]
-            backgroundSelectButtonText = backgroundSelectButtonText.replace("backgrounds/", "")
-            backgroundSelectButtonText = backgroundSelectButtonText.replace(".png", "")
-            backgroundSelectButton.setText(backgroundSelectButtonText)
-        else:
-            backgroundSelectButton.setText("Select")
-
-        backgroundSelectButton.clicked.connect(lambda: self.selectBackground("background"))
+        self.backgroundSelectButton.clicked.connect(lambda: self.selectBackground("background"))
 
         backgroundPositionLayout = QHBoxLayout()
         backgroundPositionLabel = QLabel("Position")
         backgroundPositionLabel.setStyleSheet("padding-left: 20px;")
-        backgroundPositionX = QSpinBox()
-        backgroundPositionY = QSpinBox()
+        self.backgroundPositionX = QSpinBox()
+        self.backgroundPositionY = QSpinBox()
 
         backgroundPositionLayout.addWidget(backgroundPositionLabel)
         backgroundPositionLayout.addWidget(QLabel("X"))
-        backgroundPositionLayout.addWidget(backgroundPositionX)
+        backgroundPositionLayout.addWidget(self.backgroundPositionX)
         backgroundPositionLayout.addWidget(QLabel("Y"))
-        backgroundPositionLayout.addWidget(backgroundPositionY)
+        backgroundPositionLayout.addWidget(self.backgroundPositionY)
 
         formLayout.addRow(backgroundPositionLayout)
 
-        backgroundPositionX.setRange(-10000, 10000)
-        backgroundPositionY.setRange(-10000, 10000)
+        self.backgroundPositionX.setRange(-10000, 10000)
+        self.backgroundPositionY.setRange(-10000, 10000)
 
-        backgroundPositionX.setValue(BUFFER_DATA[key]['background']['position']['x'])
-        backgroundPositionY.setValue(BUFFER_DATA[key]['background']['position']['y'])
-
-        backgroundPositionX.valueChanged.connect(lambda: self.saveSpinValue(backgroundPositionX, key, False, "position", "x", "background", None))
-        backgroundPositionY.valueChanged.connect(lambda: self.saveSpinValue(backgroundPositionY, key, False, "position", "y", "background", None))
+        self.backgroundPositionX.valueChanged.connect(lambda: self.saveSpinValue(self.backgroundPositionX, self.key, False, "position", "x", "background", None))
+        self.backgroundPositionY.valueChanged.connect(lambda: self.saveSpinValue(self.backgroundPositionY, self.key, False, "position", "y", "background", None))
 
         backgroundScaleLayout = QHBoxLayout()
         backgroundScaleLabel = QLabel("Scale")
         backgroundScaleLabel.setStyleSheet("padding-left: 20px;")
-        backgroundScaleX = QDoubleSpinBox()
-        backgroundScaleY = QDoubleSpinBox()
+        self.backgroundScaleX = QDoubleSpinBox()
+        self.backgroundScaleY = QDoubleSpinBox()
 
         backgroundScaleLayout.addWidget(backgroundScaleLabel)
         backgroundScaleLayout.addWidget(QLabel("X"))
-        backgroundScaleLayout.addWidget(backgroundScaleX)
+        backgroundScaleLayout.addWidget(self.backgroundScaleX)
         backgroundScaleLayout.addWidget(QLabel("Y"))
-        backgroundScaleLayout.addWidget(backgroundScaleY)
+        backgroundScaleLayout.addWidget(self.backgroundScaleY)
 
         formLayout.addRow(backgroundScaleLayout)
 
-        backgroundScaleX.setRange(-10000, 10000)
-        backgroundScaleY.setRange(-10000, 10000)
-
-        backgroundScaleX.setValue(BUFFER_DATA[key]['background']['scale']['x'])
-        backgroundScaleY.setValue(BUFFER_DATA[key]['background']['scale']['y'])
+        self.backgroundScaleX.setRange(-10000, 10000)
+        self.backgroundScaleY.setRange(-10000, 10000)
 
-        backgroundScaleX.valueChanged.connect(lambda: self.saveSpinValue(backgroundScaleX, key, False, "scale", "x", "background", None))
-        backgroundScaleY.valueChanged.connect(lambda: self.saveSpinValue(backgroundScaleY, key, False, "scale", "y", "background", None))
+        self.backgroundScaleX.valueChanged.connect(lambda: self.saveSpinValue(self.backgroundScaleX, self.key, False, "scale", "x", "background", None))
+        self.backgroundScaleY.valueChanged.connect(lambda: self.saveSpinValue(self.backgroundScaleY, self.key, False, "scale", "y", "background", None))
 
         backgroundAnimationLayout = QHBoxLayout()
         backgroundAnimationLabel = QLabel("Animation")
         backgroundAnimationLabel.setStyleSheet("padding-left: 20px;")
-        backgroundAnimationCheckbox = QCheckBox()
+        self.backgroundAnimationCheckbox = QCheckBox()
 
         backgroundAnimationLayout.addWidget(backgroundAnimationLabel)
-        backgroundAnimationLayout.addWidget(backgroundAnimationCheckbox)
+        backgroundAnimationLayout.addWidget(self.backgroundAnimationCheckbox)
 
         formLayout.addRow(backgroundAnimationLayout)
 
-        if BUFFER_DATA[key]["background"]["animation"] == True:
-            backgroundAnimationCheckbox.setChecked(True)
-
         backgroundAnimationTimeLayout = QHBoxLayout()
         backgroundAnimationTimeLabel = QLabel("Animation time")
         backgroundAnimationTimeLabel.setStyleSheet("padding-left: 20px;")
-        backgroundAnimationTime = QSpinBox()
+        self.backgroundAnimationTime = QSpinBox()
 
         backgroundAnimationTimeLayout.addWidget(backgroundAnimationTimeLabel)
-        backgroundAnimationTimeLayout.addWidget(backgroundAnimationTime)
+        backgroundAnimationTimeLayout.addWidget(self.backgroundAnimationTime)
 
         formLayout.addRow(backgroundAnimationTimeLayout)
 
-        backgroundAnimationTime.setRange(0, 100000)
-        backgroundAnimationTime.setToolTip("in 1 sec 60 units")
+        self.backgroundAnimationTime.setRange(0, 100000)
+        self.backgroundAnimationTime.setToolTip("in 1 sec 60 units")
 
-        backgroundAnimationTime.valueChanged.connect(lambda: self.saveSpinValue(backgroundAnimationTime, key, True, "time", None, "background", None))
+        self.backgroundAnimationTime.valueChanged.connect(lambda: self.saveSpinValue(self.backgroundAnimationTime, self.key, True, "time", None, "background", None))
 
         backgroundAnimationPositionLayout = QHBoxLayout()
         backgroundAnimationPositionLabel = QLabel("Position")
         backgroundAnimationPositionLabel.setStyleSheet("padding-left: 20px;")
-        backgroundAnimationPositionX = QSpinBox()
-        backgroundAnimationPositionY = QSpinBox()
+        self.backgroundAnimationPositionX = QSpinBox()
+        self.backgroundAnimationPositionY = QSpinBox()
 
         backgroundAnimationPositionLayout.addWidget(backgroundAnimationPositionLabel)
         backgroundAnimationPositionLayout.addWidget(QLabel("X"))
-        backgroundAnimationPositionLayout.addWidget(backgroundAnimationPositionX)
+        backgroundAnimationPositionLayout.addWidget(self.backgroundAnimationPositionX)
         backgroundAnimationPositionLayout.addWidget(QLabel("Y"))
-        backgroundAnimationPositionLayout.addWidget(backgroundAnimationPositionY)
+        backgroundAnimationPositionLayout.addWidget(self.backgroundAnimationPositionY)
 
         formLayout.addRow(backgroundAnimationPositionLayout)
 
-        backgroundAnimationPositionX.setRange(-10000, 10000)
-        backgroundAnimationPositionY.setRange(-10000, 10000)
+        self.backgroundAnimationPositionX.setRange(-10000, 10000)
+        self.backgroundAnimationPositionY.setRange(-10000, 10000)
 
-        backgroundAnimationPositionX.valueChanged.connect(lambda: self.saveSpinValue(backgroundAnimationPositionX, key, True, "position", "x", "background", None))
-        backgroundAnimationPositionY.valueChanged.connect(lambda: self.saveSpinValue(backgroundAnimationPositionY, key, True, "position", "y", "background", None))
+        self.backgroundAnimationPositionX.valueChanged.connect(lambda: self.saveSpinValue(self.backgroundAnimationPositionX, self.key, True, "position", "x", "background", None))
+        self.backgroundAnimationPositionY.valueChanged.connect(lambda: self.saveSpinValue(self.backgroundAnimationPositionY, self.key, True, "position", "y", "background", None))
 
         backgroundAnimationScaleLayout = QHBoxLayout()
         backgroundAnimationScaleLabel = QLabel("Scale")
         backgroundAnimationScaleLabel.setStyleSheet("padding-left: 20px;")
-        backgroundAnimationScaleX = QDoubleSpinBox()
-        backgroundAnimationScaleY = QDoubleSpinBox()
+        self.backgroundAnimationScaleX = QDoubleSpinBox()
+        self.backgroundAnimationScaleY = QDoubleSpinBox()
 
         backgroundAnimationScaleLayout.addWidget(backgroundAnimationScaleLabel)
         backgroundAnimationScaleLayout.addWidget(QLabel("X"))
-        backgroundAnimationScaleLayout.addWidget(backgroundAnimationScaleX)
+        backgroundAnimationScaleLayout.addWidget(self.backgroundAnimationScaleX)
         backgroundAnimationScaleLayout.addWidget(QLabel("Y"))
-        backgroundAnimationScaleLayout.addWidget(backgroundAnimationScaleY)
+        backgroundAnimationScaleLayout.addWidget(self.backgroundAnimationScaleY)
 
         formLayout.addRow(backgroundAnimationScaleLayout)
 
-        backgroundAnimationScaleX.setRange(0, 10000)
-        backgroundAnimationScaleY.setRange(0, 10000)
+        self.backgroundAnimationScaleX.setRange(0, 10000)
+        self.backgroundAnimationScaleY.setRange(0, 10000)
 
-        backgroundAnimationScaleX.valueChanged.connect(lambda: self.saveSpinValue(backgroundAnimationScaleX, key, True, "scale", "x", "background", None))
-        backgroundAnimationScaleY.valueChanged.connect(lambda: self.saveSpinValue(backgroundAnimationScaleY, key, True, "scale", "y", "background", None))
-        
-        if 'animationSettings' in BUFFER_DATA[key]["background"]:
-            backgroundAnimationTime.setValue(BUFFER_DATA[key]["background"]["animationSettings"]["time"])
-            backgroundAnimationPositionX.setValue(BUFFER_DATA[key]["background"]["animationSettings"]["position"]["x"])
-            backgroundAnimationPositionY.setValue(BUFFER_DATA[key]["background"]["animationSettings"]["position"]["y"])
-            backgroundAnimationScaleX.setValue(BUFFER_DATA[key]["background"]["animationSettings"]["scale"]["x"])
-            backgroundAnimationScaleY.setValue(BUFFER_DATA[key]["background"]["animationSettings"]["scale"]["y"])
+        self.backgroundAnimationScaleX.valueChanged.connect(lambda: self.saveSpinValue(self.backgroundAnimationScaleX, self.key, True, "scale", "x", "background", None))
+        self.backgroundAnimationScaleY.valueChanged.connect(lambda: self.saveSpinValue(self.backgroundAnimationScaleY, self.key, True, "scale", "y", "background", None))
+        self.backgroundAnimationScaleX.setToolTip("multiplier of the background scale")
+        self.backgroundAnimationScaleY.setToolTip("multiplier of the background scale")
 
-        self.animationSwitch(backgroundAnimationCheckbox, backgroundAnimationTime, backgroundAnimationPositionX, backgroundAnimationPositionY, backgroundAnimationScaleX, backgroundAnimationScaleY, "background", key, None)
+        backgroundAnimationOpacityLayout = QHBoxLayout()
+        backgroundAnimationOpacityLabel = QLabel("Opacity")
+        backgroundAnimationOpacityLabel.setStyleSheet("padding-left: 20px;")
+        self.backgroundAnimationOpacity = QDoubleSpinBox()
+        self.backgroundAnimationOpacity.setRange(0, 1)
+        self.backgroundAnimationOpacity.setSingleStep(0.05)
+        self.backgroundAnimationEasing = QComboBox()
+        self.backgroundAnimationEasing.addItems(EASING_CURVES.keys())
 
-        backgroundAnimationCheckbox.clicked.connect(lambda: self.animationSwitch(backgroundAnimationCheckbox, backgroundAnimationTime, backgroundAnimationPositionX, backgroundAnimationPositionY, backgroundAnimationScaleX, backgroundAnimationScaleY, "background", key, None))
+        backgroundAnimationOpacityLayout.addWidget(backgroundAnimationOpacityLabel)
+        backgroundAnimationOpacityLayout.addWidget(self.backgroundAnimationOpacity)
+        backgroundAnimationOpacityLayout.addWidget(QLabel("Easing"))
+        backgroundAnimationOpacityLayout.addWidget(self.backgroundAnimationEasing)
+
+        formLayout.addRow(backgroundAnimationOpacityLayout)
+
+        self.backgroundAnimationOpacity.valueChanged.connect(lambda: self.saveSpinValue(self.backgroundAnimationOpacity, self.key, True, "opacity", None, "background", None))
+        self.backgroundAnimationEasing.currentTextChanged.connect(lambda: self.saveEasing(self.backgroundAnimationEasing, self.key, "background", None))
+
+        self.backgroundAnimationCheckbox.clicked.connect(self.backgroundAnimationSwitch)
 
         formLayout.addRow(self.createLine())
 
@@ -1248,21 +4433,21 @@ class MainWindow(QMainWindow):
         textCharaNameLayout = QHBoxLayout()
         textCharaNameLabel = QLabel("Character")
         textCharaNameLabel.setStyleSheet("padding-left: 20px;")
-        textCharaNameCombobox = QComboBox()
+        self.textCharaNameCombobox = QComboBox()
 
-        charaList = ['select chara', 'Макиширо Ямагаки', 'Рина Микура', 'Саймон Мацуда', 'Рэйчел Асамая', 'Мишель Мурамаки',
-                     'Сэмми Коуда', 'Мичио Хаякава', 'Сегикадзе Харада', 'Дайчиро Катаяма', 'Цукико Аска',
-                     'Амайя Накагава', "Румико Сакаи", 'Крис Лайтер', 'Янн Ёсимура', 'Тору Ёкояма', 'Катсураги Танабэ',
-                     'Монораку', 'advanced']
+        self.charaList = ['select chara', 'Макиширо Ямагаки', 'Рина Микура', 'Саймон Мацуда', 'Рэйчел Асамая', 'Мишель Мурамаки',
+                          'Сэмми Коуда', 'Мичио Хаякава', 'Сегикадзе Харада', 'Дайчиро Катаяма', 'Цукико Аска',
+                          'Амайя Накагава', "Румико Сакаи", 'Крис Лайтер', 'Янн Ёсимура', 'Тору Ёкояма', 'Катсураги Танабэ',
+                          'Монораку', 'advanced']
         
-        textCharaNameCombobox.addItems(charaList)
+        self.textCharaNameCombobox.addItems(self.charaList)
 
         textCharaNameLayout.addWidget(textCharaNameLabel)
-        textCharaNameLayout.addWidget(textCharaNameCombobox)
+        textCharaNameLayout.addWidget(self.textCharaNameCombobox)
 
         formLayout.addRow(textCharaNameLayout)
 
-        textCharaNameCombobox.setStyleSheet("""
+        self.textCharaNameCombobox.setStyleSheet("""
             QComboBox QAbstractItemView {
                 color: rgb(85, 170, 255);	
                 background-color: #373e4e;
@@ -1270,40 +4455,38 @@ class MainWindow(QMainWindow):
                 selection-background-color: white;
             }
             """)
-        
-        if BUFFER_DATA[key]['text']['charaName'] != '':
-            try:
-                index = charaList.index(BUFFER_DATA[key]['text']['charaName'])
-                if index == 18:
-                    textCharaNameCombobox.setCurrentIndex(index)
-                    self.lineEdit('',formLayout, key) 
-                else:
-                    textCharaNameCombobox.setCurrentIndex(index)
-            except:
-                index = 18
-                textCharaNameCombobox.setCurrentIndex(index)
-                self.lineEdit(BUFFER_DATA[key]['text']['charaName'],formLayout, key)    
-        elif BUFFER_DATA[key]['text']['charaName'] == '':
-            index = 0
-            textCharaNameCombobox.setCurrentIndex(index)
-        
-        textCharaNameCombobox.currentIndexChanged.connect(lambda: self.charaTextName(textCharaNameCombobox,key,path))
+
+        self.textCharaNameCombobox.currentIndexChanged.connect(lambda: self.charaTextName(self.textCharaNameCombobox, self.key))
+
+        # Поле для произвольного имени, показывается только для пункта 'advanced'
+        self.textAdvancedNameWidget = QWidget()
+        textLayout = QHBoxLayout(self.textAdvancedNameWidget)
+        textLayout.setContentsMargins(0, 0, 0, 0)
+        textName = QLabel("advanced name")
+        self.textAdvancedNameLineEdit = QLineEdit()
+
+        textName.setStyleSheet("padding-left: 20px;")
+
+        textLayout.addWidget(textName)
+        textLayout.addWidget(self.textAdvancedNameLineEdit)
+
+        formLayout.addRow(self.textAdvancedNameWidget)
+        self.textAdvancedNameWidget.setVisible(False)
+        self.textAdvancedNameLineEdit.textChanged.connect(lambda: self.lineEditSave(self.textAdvancedNameLineEdit.text(), self.key))
 
         textTextLayout = QHBoxLayout()
         textTextLabel = QLabel("Text")
         textTextLabel.setStyleSheet("padding-left: 20px;")
-        textTextTextEdit = QTextEdit()
+        self.textTextTextEdit = QTextEdit()
 
         textTextLayout.addWidget(textTextLabel)
-        textTextLayout.addWidget(textTextTextEdit)
+        textTextLayout.addWidget(self.textTextTextEdit)
 
         formLayout.addRow(textTextLayout)
 
-        textTextTextEdit.setMaximumSize(500, 100)
-        if BUFFER_DATA[key]['text']['text'] != '':
-            textTextTextEdit.setText(BUFFER_DATA[key]['text']['text'])
+        self.textTextTextEdit.setMaximumSize(500, 100)
 
-        textTextTextEdit.textChanged.connect(lambda: self.saveText(textTextTextEdit.toPlainText(), key))
+        self.textTextTextEdit.textChanged.connect(lambda: self.saveText(self.textTextTextEdit.toPlainText(), self.key))
 
         formLayout.addRow(self.createLine())
 
@@ -1312,201 +4495,117 @@ class MainWindow(QMainWindow):
         uiTimeOfDayLayout = QHBoxLayout()
         uiTimeOfDayLabel = QLabel("Time of day")
         uiTimeOfDayLabel.setStyleSheet("padding-left: 20px;")
-        uiTimeOfDayCombobox = QComboBox()
+        self.uiTimeOfDayCombobox = QComboBox()
 
         uiTimeOfDayLayout.addWidget(uiTimeOfDayLabel)
-        uiTimeOfDayLayout.addWidget(uiTimeOfDayCombobox)
+        uiTimeOfDayLayout.addWidget(self.uiTimeOfDayCombobox)
 
         formLayout.addRow(uiTimeOfDayLayout)
 
-        timeList = ["select", "Morning", "Afternoon", "Evening", "Night"]
+        self.timeList = ["select", "Morning", "Afternoon", "Evening", "Night"]
 
-        uiTimeOfDayCombobox.addItems(timeList)
+        self.uiTimeOfDayCombobox.addItems(self.timeList)
 
-        if BUFFER_DATA[key]['ui']['time'] != '':
-            try:
-                index = timeList.index(BUFFER_DATA[key]['ui']['time'])
-                uiTimeOfDayCombobox.setCurrentIndex(index)
-            except:
-                BUFFER_DATA[key]['ui']['time'] = ''
-                uiTimeOfDayCombobox.setCurrentIndex(0)
-        else:
-            uiTimeOfDayCombobox.setCurrentIndex(0)
-
-        uiTimeOfDayCombobox.currentIndexChanged.connect(lambda: self.timeOfDaySave(uiTimeOfDayCombobox, key))
+        self.uiTimeOfDayCombobox.currentIndexChanged.connect(lambda: self.timeOfDaySave(self.uiTimeOfDayCombobox, self.key))
 
         uiChapterLayout = QHBoxLayout()
         uiChapterLabel = QLabel("Chapter")
         uiChapterLabel.setStyleSheet("padding-left: 20px;")
-        uiChapterLineEdit = QLineEdit()
+        self.uiChapterLineEdit = QLineEdit()
 
         uiChapterLayout.addWidget(uiChapterLabel)
-        uiChapterLayout.addWidget(uiChapterLineEdit)
+        uiChapterLayout.addWidget(self.uiChapterLineEdit)
 
         formLayout.addRow(uiChapterLayout)
 
-        if BUFFER_DATA[key]['ui']['chapter'] == '':
-            try:
-                previous_chapter = BUFFER_DATA[str(int(key) - 1)]['ui']['chapter']
-                BUFFER_DATA[key]['ui']['chapter'] = previous_chapter
-                uiChapterLineEdit.setText(previous_chapter)
-            except KeyError as e:
-                print(f"Error accessing previous chapter data: {e}")
-                BUFFER_DATA[key]['ui']['chapter'] = ''
-                uiChapterLineEdit.setText('')
-        else:
-            uiChapterLineEdit.setText(BUFFER_DATA[key]['ui']['chapter'])
-
-        # Исправляем подключение сигнала, чтобы правильно вызывать метод text()
-        uiChapterLineEdit.textChanged.connect(lambda: self.saveChapter(uiChapterLineEdit.text(), key))
+        self.uiChapterLineEdit.textChanged.connect(lambda: self.saveChapter(self.uiChapterLineEdit.text(), self.key))
 
         emotionLayout = QHBoxLayout()
         emotionLabel = QLabel("Emotions")
         emotionLabel.setStyleSheet("padding-left: 20px;")
-        emotionCheckbox = QCheckBox()
+        self.emotionCheckbox = QCheckBox()
         emotionLayout.addWidget(emotionLabel)
-        emotionLayout.addWidget(emotionCheckbox)
+        emotionLayout.addWidget(self.emotionCheckbox)
 
         formLayout.addRow(emotionLayout)
 
-        emotionCheckbox.setChecked(BUFFER_DATA[key]['ui'].get('emotion', False))
-
-        def toggleEmotionFields():
-            emotionEnabled = emotionCheckbox.isChecked()
-
-            # Включаем или отключаем поля, связанные с эмоциями
-            uiCharaEmotionButton.setEnabled(emotionEnabled)
-            uiCharaBackgroundPushbutton.setEnabled(emotionEnabled)
-            uiCharaBackgroundPositionX.setEnabled(emotionEnabled)
-            uiCharaBackgroundPositionY.setEnabled(emotionEnabled)
-            uiCharaBackgroundScaleX.setEnabled(emotionEnabled)
-            uiCharaBackgroundScaleY.setEnabled(emotionEnabled)
-
-            # Если отключаем, очищаем данные в BUFFER_DATA
-            if not emotionEnabled:
-                BUFFER_DATA[key]['ui']['charaEmotion'] = ""
-                BUFFER_DATA[key]['ui']['charaEmotionBackground'] = ""
-                BUFFER_DATA[key]['ui']['charaEmotionBackgroundPosition'] = {"x": 0, "y": 0}
-                BUFFER_DATA[key]['ui']['charaEmotionBackgroundScale'] = {"x": 1.0, "y": 1.0}
-            
-            # Сохраняем состояние эмоций в BUFFER_DATA
-            BUFFER_DATA[key]['ui']['emotion'] = emotionEnabled
-            self.createCanvas()
-
         # Соединяем чекбокс с функцией переключения полей
-        emotionCheckbox.stateChanged.connect(toggleEmotionFields)
-
-
+        self.emotionCheckbox.stateChanged.connect(self.toggleEmotionFields)
 
         uiCharaEmotionLayout = QHBoxLayout()
         uiCharaEmotionLabel = QLabel('Chara emotion')
         uiCharaEmotionLabel.setStyleSheet("padding-left: 20px;")
-        uiCharaEmotionButton = QPushButton("select")
+        self.uiCharaEmotionButton = QPushButton("select")
 
         uiCharaEmotionLayout.addWidget(uiCharaEmotionLabel)
-        uiCharaEmotionLayout.addWidget(uiCharaEmotionButton)
+        uiCharaEmotionLayout.addWidget(self.uiCharaEmotionButton)
 
         formLayout.addRow(uiCharaEmotionLayout)
 
-        uiCharaEmotionButton.clicked.connect(self.openHeroEmotionWindow)
- 
-        if BUFFER_DATA[key]['ui']['charaEmotion'] == '':
-            uiCharaEmotionButton.setText('Select')
-        else:
-            uiCharaEmotionText = BUFFER_DATA[key]['ui']['charaEmotion']
-            uiCharaEmotionText = uiCharaEmotionText.replace("sprites/makishiro/", "")
-            uiCharaEmotionText = uiCharaEmotionText.replace(".png", "")
-            uiCharaEmotionButton.setText(uiCharaEmotionText)
-
+        self.uiCharaEmotionButton.clicked.connect(self.openHeroEmotionWindow)
 
         uiCharaBackgroundLayout = QHBoxLayout()
         uiCharaBackgroundLabel = QLabel("Emotion background")
         uiCharaBackgroundLabel.setStyleSheet("padding-left: 20px;")
-        uiCharaBackgroundPushbutton = QPushButton("Select")
+        self.uiCharaBackgroundPushbutton = QPushButton("Select")
 
         uiCharaBackgroundLayout.addWidget(uiCharaBackgroundLabel)
-        uiCharaBackgroundLayout.addWidget(uiCharaBackgroundPushbutton)
+        uiCharaBackgroundLayout.addWidget(self.uiCharaBackgroundPushbutton)
 
         formLayout.addRow(uiCharaBackgroundLayout)
 
-        uiCharaBackgroundPushbutton.clicked.connect(lambda: self.selectBackground("uibackground"))
+        self.uiCharaBackgroundPushbutton.clicked.connect(lambda: self.selectBackground("uibackground"))
 
-        if BUFFER_DATA[key]['ui']['charaEmotionBackground'] == '':
-            uiCharaBackgroundPushbutton.setText("Select")
-        else:
-            uiCharaBackgroundText = BUFFER_DATA[key]['ui']['charaEmotionBackground']
-            uiCharaBackgroundText = uiCharaBackgroundText.replace("backgrounds/", "")
-            uiCharaBackgroundText = uiCharaBackgroundText.replace(".png", "")
-            uiCharaBackgroundPushbutton.setText(uiCharaBackgroundText)
-
-                # Позиция фона эмоции персонажа
+        # Позиция фона эмоции персонажа
         uiCharaBackgroundPositionLayout = QHBoxLayout()
         uiCharaBackgroundPositionLabel = QLabel("Position")
         uiCharaBackgroundPositionLabel.setStyleSheet("padding-left: 20px;")
-        uiCharaBackgroundPositionX = QSpinBox()
-        uiCharaBackgroundPositionY = QSpinBox()
+        self.uiCharaBackgroundPositionX = QSpinBox()
+        self.uiCharaBackgroundPositionY = QSpinBox()
 
         uiCharaBackgroundPositionLayout.addWidget(uiCharaBackgroundPositionLabel)
         uiCharaBackgroundPositionLayout.addWidget(QLabel("X"))
-        uiCharaBackgroundPositionLayout.addWidget(uiCharaBackgroundPositionX)
+        uiCharaBackgroundPositionLayout.addWidget(self.uiCharaBackgroundPositionX)
         uiCharaBackgroundPositionLayout.addWidget(QLabel("Y"))
-        uiCharaBackgroundPositionLayout.addWidget(uiCharaBackgroundPositionY)
+        uiCharaBackgroundPositionLayout.addWidget(self.uiCharaBackgroundPositionY)
 
         formLayout.addRow(uiCharaBackgroundPositionLayout)
 
-        uiCharaBackgroundPositionX.setRange(-10000, 10000)
-        uiCharaBackgroundPositionY.setRange(-10000, 10000)
+        self.uiCharaBackgroundPositionX.setRange(-10000, 10000)
+        self.uiCharaBackgroundPositionY.setRange(-10000, 10000)
 
-        if 'charaEmotionBackgroundPosition' not in BUFFER_DATA[key]['ui']:
-            BUFFER_DATA[key]['ui']['charaEmotionBackgroundPosition'] = {"x": 0, "y": 0}
-
-        uiCharaBackgroundPositionX.setValue(BUFFER_DATA[key]['ui']['charaEmotionBackgroundPosition']['x'])
-        uiCharaBackgroundPositionY.setValue(BUFFER_DATA[key]['ui']['charaEmotionBackgroundPosition']['y'])
-
-        uiCharaBackgroundPositionX.valueChanged.connect(
-            lambda: self.saveSpinValue(uiCharaBackgroundPositionX, key, False, "charaEmotionBackgroundPosition", "x", "ui", None)
+        self.uiCharaBackgroundPositionX.valueChanged.connect(
+            lambda: self.saveSpinValue(self.uiCharaBackgroundPositionX, self.key, False, "charaEmotionBackgroundPosition", "x", "ui", None)
         )
-        uiCharaBackgroundPositionY.valueChanged.connect(
-            lambda: self.saveSpinValue(uiCharaBackgroundPositionY, key, False, "charaEmotionBackgroundPosition", "y", "ui", None)
+        self.uiCharaBackgroundPositionY.valueChanged.connect(
+            lambda: self.saveSpinValue(self.uiCharaBackgroundPositionY, self.key, False, "charaEmotionBackgroundPosition", "y", "ui", None)
         )
 
-
-
         # Масштаб фона эмоции персонажа
         uiCharaBackgroundScaleLayout = QHBoxLayout()
         uiCharaBackgroundScaleLabel = QLabel("Scale")
         uiCharaBackgroundScaleLabel.setStyleSheet("padding-left: 20px;")
-        uiCharaBackgroundScaleX = QDoubleSpinBox()
-        uiCharaBackgroundScaleY = QDoubleSpinBox()
+        self.uiCharaBackgroundScaleX = QDoubleSpinBox()
+        self.uiCharaBackgroundScaleY = QDoubleSpinBox()
 
         uiCharaBackgroundScaleLayout.addWidget(uiCharaBackgroundScaleLabel)
         uiCharaBackgroundScaleLayout.addWidget(QLabel("X"))
-        uiCharaBackgroundScaleLayout.addWidget(uiCharaBackgroundScaleX)
+        uiCharaBackgroundScaleLayout.addWidget(self.uiCharaBackgroundScaleX)
         uiCharaBackgroundScaleLayout.addWidget(QLabel("Y"))
-        uiCharaBackgroundScaleLayout.addWidget(uiCharaBackgroundScaleY)
+        uiCharaBackgroundScaleLayout.addWidget(self.uiCharaBackgroundScaleY)
 
         formLayout.addRow(uiCharaBackgroundScaleLayout)
 
-        uiCharaBackgroundScaleX.setRange(0, 10000)
-        uiCharaBackgroundScaleY.setRange(0, 10000)
-
-        if 'charaEmotionBackgroundScale' not in BUFFER_DATA[key]['ui']:
-            BUFFER_DATA[key]['ui']['charaEmotionBackgroundScale'] = {"x": 1, "y": 1}
-
-        uiCharaBackgroundScaleX.setValue(BUFFER_DATA[key]['ui']['charaEmotionBackgroundScale']['x'])
-        uiCharaBackgroundScaleY.setValue(BUFFER_DATA[key]['ui']['charaEmotionBackgroundScale']['y'])
+        self.uiCharaBackgroundScaleX.setRange(0, 10000)
+        self.uiCharaBackgroundScaleY.setRange(0, 10000)
         
-        uiCharaBackgroundScaleX.valueChanged.connect(
-            lambda: self.saveSpinValue(uiCharaBackgroundScaleX, key, False, "charaEmotionBackgroundScale", "x", "ui", None)
+        self.uiCharaBackgroundScaleX.valueChanged.connect(
+            lambda: self.saveSpinValue(self.uiCharaBackgroundScaleX, self.key, False, "charaEmotionBackgroundScale", "x", "ui", None)
         )
-        uiCharaBackgroundScaleY.valueChanged.connect(
-            lambda: self.saveSpinValue(uiCharaBackgroundScaleY, key, False, "charaEmotionBackgroundScale", "y", "ui", None)
+        self.uiCharaBackgroundScaleY.valueChanged.connect(
+            lambda: self.saveSpinValue(self.uiCharaBackgroundScaleY, self.key, False, "charaEmotionBackgroundScale", "y", "ui", None)
         )
 
-
-        toggleEmotionFields()
-
-
         formLayout.addRow(self.createLine())
 
         formLayout.addRow(QLabel("Sprites"))
@@ -1523,34 +4622,20 @@ class MainWindow(QMainWindow):
 
         self.spritesListWidget.setDragDropMode(QListWidget.DragDropMode.InternalMove)
         self.spriteList = []
-        spriteListCount = int(BUFFER_DATA[key]['sprite']['count'])
-
-        if spriteListCount > 0:
-            for i in range(0, spriteListCount):
-                if BUFFER_DATA[key]['sprite'][str(i)]['spriteId'] != '':
-                    item = QListWidgetItem(BUFFER_DATA[key]['sprite'][str(i)]['spriteId'])
-                else:
-                    item = QListWidgetItem(f'Sprite: {i}')
-                    BUFFER_DATA[key]['sprite'][str(i)]['spriteId'] = f'Sprite: {i}'
-
-                self.spriteList.append(i)
-                self.spritesListWidget.addItem(item)
 
-        self.spritesListWidget.model().rowsMoved.connect(lambda: self.changeSpriteList(key))
+        self.spritesListWidget.model().rowsMoved.connect(lambda: self.changeSpriteList(self.key))
 
         spritesSelectLayout = QHBoxLayout()
         spritesSelectLabel = QLabel("Select sprite")
         spritesSelectLabel.setStyleSheet("padding-left: 20px;")
-        spritesSelectButton = QPushButton("select")
+        self.spritesSelectButton = QPushButton("select")
 
         spritesSelectLayout.addWidget(spritesSelectLabel)
-        spritesSelectLayout.addWidget(spritesSelectButton)
+        spritesSelectLayout.addWidget(self.spritesSelectButton)
 
         formLayout.addRow(spritesSelectLayout)
 
-        spritesSelectButton.setEnabled(False)
-
-        spritesSelectButton.clicked.connect(lambda: self.openSpriteWindow(key, self.id))
+        self.spritesSelectButton.clicked.connect(lambda: self.openSpriteWindow(self.key, self.id))
 
         self.spritesListWidget.setContextMenuPolicy(Qt.ContextMenuPolicy.CustomContextMenu)
         self.spritesListWidget.customContextMenuRequested.connect(self.showContextMenu)
@@ -1559,156 +4644,368 @@ class MainWindow(QMainWindow):
         spritesPositionLayout = QHBoxLayout()
         spritesPositionLabel = QLabel('Position')
         spritesPositionLabel.setStyleSheet("padding-left: 20px;")
-        spritesPositionXSpinbox = QSpinBox()
-        spritesPositionYSpinbox = QSpinBox()
+        self.spritesPositionXSpinbox = QSpinBox()
+        self.spritesPositionYSpinbox = QSpinBox()
         spritesPositionLayout.addWidget(spritesPositionLabel)
         spritesPositionLayout.addWidget(QLabel("X"))
-        spritesPositionLayout.addWidget(spritesPositionXSpinbox)
+        spritesPositionLayout.addWidget(self.spritesPositionXSpinbox)
         spritesPositionLayout.addWidget(QLabel("Y")) 
-        spritesPositionLayout.addWidget(spritesPositionYSpinbox)
+        spritesPositionLayout.addWidget(self.spritesPositionYSpinbox)
 
         formLayout.addRow(spritesPositionLayout)
 
-        spritesPositionXSpinbox.setRange(-10000,10000)
-        spritesPositionYSpinbox.setRange(-10000,10000)
-        spritesPositionXSpinbox.setEnabled(False)
-        spritesPositionYSpinbox.setEnabled(False)
+        self.spritesPositionXSpinbox.setRange(-10000,10000)
+        self.spritesPositionYSpinbox.setRange(-10000,10000)
 
         
         spritesScaleLayout = QHBoxLayout()
         spritesScaleLabel = QLabel("Scale")
         spritesScaleLabel.setStyleSheet("padding-left: 20px;")
-        spritesScaleXSpinbox = QDoubleSpinBox()
-        spritesScaleYSpinbox = QDoubleSpinBox()
+        self.spritesScaleXSpinbox = QDoubleSpinBox()
+        self.spritesScaleYSpinbox = QDoubleSpinBox()
         spritesScaleLayout.addWidget(spritesScaleLabel)
         spritesScaleLayout.addWidget(QLabel("X"))
-        spritesScaleLayout.addWidget(spritesScaleXSpinbox)
+        spritesScaleLayout.addWidget(self.spritesScaleXSpinbox)
         spritesScaleLayout.addWidget(QLabel("Y"))
-        spritesScaleLayout.addWidget(spritesScaleYSpinbox)
+        spritesScaleLayout.addWidget(self.spritesScaleYSpinbox)
 
         formLayout.addRow(spritesScaleLayout)
 
-        spritesScaleXSpinbox.setRange(-10000, 10000)
-        spritesScaleYSpinbox.setRange(-10000, 10000)
-        spritesScaleXSpinbox.setEnabled(False)
-        spritesScaleYSpinbox.setEnabled(False)
+        self.spritesScaleXSpinbox.setRange(-10000, 10000)
+        self.spritesScaleYSpinbox.setRange(-10000, 10000)
 
 
         spritesAnimationLayout = QHBoxLayout()
         spritesAnimationLaybel = QLabel("Animation")
         spritesAnimationLaybel.setStyleSheet("padding-left: 20px;")
-        spritesAnimationCheckbox = QCheckBox()
+        self.spritesAnimationCheckbox = QCheckBox()
         spritesAnimationLayout.addWidget(spritesAnimationLaybel)
-        spritesAnimationLayout.addWidget(spritesAnimationCheckbox)
+        spritesAnimationLayout.addWidget(self.spritesAnimationCheckbox)
 
         formLayout.addRow(spritesAnimationLayout)
 
-        spritesAnimationCheckbox.setEnabled(False)
-
 
         spritesAnimationTimeLayout = QHBoxLayout()
         spritesAnimationTimeLabel = QLabel("Animation time")
         spritesAnimationTimeLabel.setStyleSheet("padding-left: 20px;")
-        spritesAnimationTimeSpinbox = QSpinBox()
-        spritesAnimationTimeSpinbox.setRange(0, 100000)
+        self.spritesAnimationTimeSpinbox = QSpinBox()
+        self.spritesAnimationTimeSpinbox.setRange(0, 100000)
         spritesAnimationTimeLayout.addWidget(spritesAnimationTimeLabel)
-        spritesAnimationTimeLayout.addWidget(spritesAnimationTimeSpinbox)
+        spritesAnimationTimeLayout.addWidget(self.spritesAnimationTimeSpinbox)
        
 
         formLayout.addRow(spritesAnimationTimeLayout)
 
-        spritesAnimationTimeSpinbox.setToolTip("in 1 sec 60 units")
-        spritesAnimationTimeSpinbox.setEnabled(False)
+        self.spritesAnimationTimeSpinbox.setToolTip("in 1 sec 60 units")
 
 
         spritesAnimationPositionLayout = QHBoxLayout()
         spritesAnimationPositionLabel = QLabel("Position")
         spritesAnimationPositionLabel.setStyleSheet("padding-left: 20px;")
-        spritesAnimationPositionXSpinbox = QSpinBox()
-        spritesAnimationPositionYSpinbox = QSpinBox()
+        self.spritesAnimationPositionXSpinbox = QSpinBox()
+        self.spritesAnimationPositionYSpinbox = QSpinBox()
         spritesAnimationPositionLayout.addWidget(spritesAnimationPositionLabel)
         spritesAnimationPositionLayout.addWidget(QLabel("X"))
-        spritesAnimationPositionLayout.addWidget(spritesAnimationPositionXSpinbox)
+        spritesAnimationPositionLayout.addWidget(self.spritesAnimationPositionXSpinbox)
         spritesAnimationPositionLayout.addWidget(QLabel("Y"))
-        spritesAnimationPositionLayout.addWidget(spritesAnimationPositionYSpinbox)
+        spritesAnimationPositionLayout.addWidget(self.spritesAnimationPositionYSpinbox)
 
         formLayout.addRow(spritesAnimationPositionLayout)
 
-        spritesAnimationPositionXSpinbox.setRange(-10000, 10000)
-        spritesAnimationPositionYSpinbox.setRange(-10000, 10000)
-        spritesAnimationPositionXSpinbox.setEnabled(False)
-        spritesAnimationPositionYSpinbox.setEnabled(False)
+        self.spritesAnimationPositionXSpinbox.setRange(-10000, 10000)
+        self.spritesAnimationPositionYSpinbox.setRange(-10000, 10000)
 
 
         spritesAnimationScaleLayout = QHBoxLayout()
         spritesAnimationScaleLabel = QLabel("Scale")
         spritesAnimationScaleLabel.setStyleSheet("padding-left: 20px;")
-        spritesAnimationScaleXSpinbox = QDoubleSpinBox()
-        spritesAnimationScaleYSpinbox = QDoubleSpinBox()
+        self.spritesAnimationScaleXSpinbox = QDoubleSpinBox()
+        self.spritesAnimationScaleYSpinbox = QDoubleSpinBox()
         spritesAnimationScaleLayout.addWidget(spritesAnimationScaleLabel)
         spritesAnimationScaleLayout.addWidget(QLabel("X"))
-        spritesAnimationScaleLayout.addWidget(spritesAnimationScaleXSpinbox)
+        spritesAnimationScaleLayout.addWidget(self.spritesAnimationScaleXSpinbox)
         spritesAnimationScaleLayout.addWidget(QLabel("Y"))
-        spritesAnimationScaleLayout.addWidget(spritesAnimationScaleYSpinbox)
+        spritesAnimationScaleLayout.addWidget(self.spritesAnimationScaleYSpinbox)
 
         formLayout.addRow(spritesAnimationScaleLayout)
 
-        spritesAnimationScaleXSpinbox.setRange(-10000, 10000)
-        spritesAnimationScaleYSpinbox.setRange(-10000, 10000)
-        spritesAnimationScaleXSpinbox.setEnabled(False)
-        spritesAnimationScaleYSpinbox.setEnabled(False)
-
-
+        self.spritesAnimationScaleXSpinbox.setRange(-10000, 10000)
+        self.spritesAnimationScaleYSpinbox.setRange(-10000, 10000)
+        self.spritesAnimationScaleXSpinbox.setToolTip("multiplier of the sprite scale")
+        self.spritesAnimationScaleYSpinbox.setToolTip("multiplier of the sprite scale")
 
+        spritesAnimationOpacityLayout = QHBoxLayout()
+        spritesAnimationOpacityLabel = QLabel("Opacity")
+        spritesAnimationOpacityLabel.setStyleSheet("padding-left: 20px;")
+        self.spritesAnimationOpacitySpinbox = QDoubleSpinBox()
+        self.spritesAnimationOpacitySpinbox.setRange(0, 1)
+        self.spritesAnimationOpacitySpinbox.setSingleStep(0.05)
+        self.spritesAnimationEasingCombobox = QComboBox()
+        self.spritesAnimationEasingCombobox.addItems(EASING_CURVES.keys())
+        spritesAnimationOpacityLayout.addWidget(spritesAnimationOpacityLabel)
+        spritesAnimationOpacityLayout.addWidget(self.spritesAnimationOpacitySpinbox)
+        spritesAnimationOpacityLayout.addWidget(QLabel("Easing"))
+        spritesAnimationOpacityLayout.addWidget(self.spritesAnimationEasingCombobox)
 
+        formLayout.addRow(spritesAnimationOpacityLayout)
 
-        spritesAnimationTimeSpinbox.valueChanged.connect(lambda: self.saveSpinValue(spritesAnimationTimeSpinbox, key, True, "time", None, "sprite", str(self.id)))
 
-        spritesPositionXSpinbox.valueChanged.connect(lambda: self.saveSpinValue(spritesPositionXSpinbox, key, False, "position", "x", "sprite", str(self.id)))
-        spritesPositionYSpinbox.valueChanged.connect(lambda: self.saveSpinValue(spritesPositionYSpinbox, key, False, "position", "y", "sprite", str(self.id)))
+        self.spritesAnimationTimeSpinbox.valueChanged.connect(lambda: self.saveSpinValue(self.spritesAnimationTimeSpinbox, self.key, True, "time", None, "sprite", str(self.id)))
 
-        spritesScaleXSpinbox.valueChanged.connect(lambda: self.saveSpinValue(spritesScaleXSpinbox, key, False, "scale", "x", "sprite", str(self.id)))
-        spritesScaleYSpinbox.valueChanged.connect(lambda: self.saveSpinValue(spritesScaleYSpinbox, key, False, "scale", "y", "sprite", str(self.id)))
-
-        spritesAnimationCheckbox.toggled.connect(lambda: self.spritesAnimationCheckboxClicked(spritesAnimationCheckbox, spritesAnimationTimeSpinbox, spritesAnimationPositionXSpinbox, spritesAnimationPositionYSpinbox, spritesAnimationScaleXSpinbox, spritesAnimationScaleYSpinbox))
-
-
-        self.spritesListWidget.itemClicked.connect(lambda item: self.spriteSettings(item, key, spritesSelectButton, spritesPositionXSpinbox, 
-                                                                                    spritesPositionYSpinbox, spritesScaleXSpinbox, spritesScaleYSpinbox,
-                                                                                    spritesAnimationCheckbox, spritesAnimationTimeSpinbox, spritesAnimationPositionXSpinbox,
-                                                                                    spritesAnimationPositionYSpinbox, spritesAnimationScaleXSpinbox, spritesAnimationScaleYSpinbox))
-        
+        self.spritesPositionXSpinbox.valueChanged.connect(lambda: self.saveSpinValue(self.spritesPositionXSpinbox, self.key, False, "position", "x", "sprite", str(self.id)))
+        self.spritesPositionYSpinbox.valueChanged.connect(lambda: self.saveSpinValue(self.spritesPositionYSpinbox, self.key, False, "position", "y", "sprite", str(self.id)))
 
-        spritesAnimationPositionXSpinbox.valueChanged.connect(lambda: self.saveSpinValue(spritesAnimationPositionXSpinbox, key, True, "position", "x", "sprite",str(self.id)))
-        spritesAnimationPositionYSpinbox.valueChanged.connect(lambda: self.saveSpinValue(spritesAnimationPositionYSpinbox, key, True, "position", "y", "sprite",str(self.id)))
-        spritesAnimationScaleXSpinbox.valueChanged.connect(lambda: self.saveSpinValue(spritesAnimationScaleXSpinbox, key, True, "scale", "x", "sprite",str(self.id)))
-        spritesAnimationScaleYSpinbox.valueChanged.connect(lambda: self.saveSpinValue(spritesAnimationScaleYSpinbox, key, True, "scale", "y", "sprite",str(self.id)))
+        self.spritesScaleXSpinbox.valueChanged.connect(lambda: self.saveSpinValue(self.spritesScaleXSpinbox, self.key, False, "scale", "x", "sprite", str(self.id)))
+        self.spritesScaleYSpinbox.valueChanged.connect(lambda: self.saveSpinValue(self.spritesScaleYSpinbox, self.key, False, "scale", "y", "sprite", str(self.id)))
 
+        self.spritesAnimationCheckbox.toggled.connect(self.spritesAnimationCheckboxClicked)
 
+        self.spritesListWidget.itemClicked.connect(self.spriteSettings)
 
+        self.spritesAnimationPositionXSpinbox.valueChanged.connect(lambda: self.saveSpinValue(self.spritesAnimationPositionXSpinbox, self.key, True, "position", "x", "sprite", str(self.id)))
+        self.spritesAnimationPositionYSpinbox.valueChanged.connect(lambda: self.saveSpinValue(self.spritesAnimationPositionYSpinbox, self.key, True, "position", "y", "sprite", str(self.id)))
+        self.spritesAnimationScaleXSpinbox.valueChanged.connect(lambda: self.saveSpinValue(self.spritesAnimationScaleXSpinbox, self.key, True, "scale", "x", "sprite", str(self.id)))
+        self.spritesAnimationScaleYSpinbox.valueChanged.connect(lambda: self.saveSpinValue(self.spritesAnimationScaleYSpinbox, self.key, True, "scale", "y", "sprite", str(self.id)))
+        self.spritesAnimationOpacitySpinbox.valueChanged.connect(lambda: self.saveSpinValue(self.spritesAnimationOpacitySpinbox, self.key, True, "opacity", None, "sprite", str(self.id)))
+        self.spritesAnimationEasingCombobox.currentTextChanged.connect(lambda: self.saveEasing(self.spritesAnimationEasingCombobox, self.key, "sprite", str(self.id)))
 
         formLayout.addRow(self.createLine())
 
         commentsLayout = QHBoxLayout()
         commentsLabel = QLabel("Comment")
         commentsLabel.setStyleSheet("padding-left: 20px;")
-        commentsTextBox = QTextEdit()
+        self.commentsTextBox = QTextEdit()
 
         commentsLayout.addWidget(commentsLabel)
-        commentsLayout.addWidget(commentsTextBox)
+        commentsLayout.addWidget(self.commentsTextBox)
 
         formLayout.addRow(commentsLayout)
 
-        commentsTextBox.setText(BUFFER_DATA[key]["comment"])
+        self.commentsTextBox.textChanged.connect(lambda: self.saveComment(self.commentsTextBox.toPlainText(), self.key))
+
+        # Все поля ввода: при перепривязке к кадру значения выставляются с заблокированными сигналами
+        self.inspectorInputs = [
+            self.backgroundPositionX, self.backgroundPositionY, self.backgroundScaleX, self.backgroundScaleY,
+            self.backgroundAnimationCheckbox, self.backgroundAnimationTime,
+            self.backgroundAnimationPositionX, self.backgroundAnimationPositionY,
+            self.backgroundAnimationScaleX, self.backgroundAnimationScaleY,
+            self.backgroundAnimationOpacity, self.backgroundAnimationEasing,
+            self.textCharaNameCombobox, self.textAdvancedNameLineEdit, self.textTextTextEdit,
+            self.uiTimeOfDayCombobox, self.uiChapterLineEdit, self.emotionCheckbox,
+            self.uiCharaBackgroundPositionX, self.uiCharaBackgroundPositionY,
+            self.uiCharaBackgroundScaleX, self.uiCharaBackgroundScaleY,
+            self.spritesListWidget, self.spritesPositionXSpinbox, self.spritesPositionYSpinbox,
+            self.spritesScaleXSpinbox, self.spritesScaleYSpinbox, self.spritesAnimationCheckbox,
+            self.spritesAnimationTimeSpinbox, self.spritesAnimationPositionXSpinbox,
+            self.spritesAnimationPositionYSpinbox, self.spritesAnimationScaleXSpinbox,
+            self.spritesAnimationScaleYSpinbox, self.spritesAnimationOpacitySpinbox,
+            self.spritesAnimationEasingCombobox, self.commentsTextBox
+        ]
+        # Любое изменение поля инспектора — повод для записи в историю правок
+        for widget in self.inspectorInputs:
+            if isinstance(widget, (QSpinBox, QDoubleSpinBox)):
+                widget.valueChanged.connect(self.scheduleHistoryCheckpoint)
+            elif isinstance(widget, (QLineEdit, QTextEdit)):
+                widget.textChanged.connect(self.scheduleHistoryCheckpoint)
+            elif isinstance(widget, QComboBox):
+                widget.currentIndexChanged.connect(self.scheduleHistoryCheckpoint)
+            elif isinstance(widget, QCheckBox):
+                widget.toggled.connect(self.scheduleHistoryCheckpoint)
+        self.id = None
+
+    def inspectorLoad(self, path):
+        key = path[0]
+        # Просмотр анимации относится к текущему кадру — останавливаем его до смены
+        if self.scenarioPlayer.isActive():
+            self.scenarioPlayer.stop(notify=False)
+            self.button_play_scenario.setText("Play Scenario")
+        if self.animation_active:
+            self.toggle_animation(self.button_start_animation)
+        self.playbackOverlay.setVisible(False)
+        self.selectFrameRow(key)
+        self.key = key
+        # Снимок для журнала до привязки: инспектор сам дописывает в кадр значения по умолчанию,
+        # они записываются сразу после нее как "auto"
+        JOURNAL.watch(key)
+        SEARCH_INDEX.watch(key)
+        self.createCanvas()
+        self.bindInspector(key)
+        JOURNAL.absorb()
+        # Привязка сама вызывает обновления холста; правкой они не считаются
+        UNDO_HISTORY.watch(key)
+        self.historyPending = False
+        FRAME_PREFETCHER.prefetch(self.frameListModel.keys, self.frameListModel.rows.get(key))
+
+    def bindInspector(self, key):
+        """Перепривязывает уже созданную форму инспектора к кадру key."""
+        for widget in self.inspectorInputs:
+            widget.blockSignals(True)
+        try:
+            self.bindInspectorValues(key)
+        finally:
+            for widget in self.inspectorInputs:
+                widget.blockSignals(False)
+
+        self.animationSwitch(self.backgroundAnimationCheckbox, self.backgroundAnimationTime, self.backgroundAnimationPositionX, self.backgroundAnimationPositionY, self.backgroundAnimationScaleX, self.backgroundAnimationScaleY, "background", key, None,
+                             self.backgroundAnimationOpacity, self.backgroundAnimationEasing)
+        self.toggleEmotionFields()
+        self.inspectorScrollArea.setVisible(True)
+
+    def bindInspectorValues(self, key):
+        frame = BUFFER_DATA[key]
+
+        if frame.background.name != "":
+            backgroundSelectButtonText = frame.background.name
+            backgroundSelectButtonText = backgroundSelectButtonText.replace("backgrounds/", "")
+            backgroundSelectButtonText = backgroundSelectButtonText.replace(".png", "")
+            self.backgroundSelectButton.setText(backgroundSelectButtonText)
+        else:
+            self.backgroundSelectButton.setText("Select")
+
+        self.backgroundPositionX.setValue(int(frame.background.position.x))
+        self.backgroundPositionY.setValue(int(frame.background.position.y))
+        self.backgroundScaleX.setValue(frame.background.scale.x)
+        self.backgroundScaleY.setValue(frame.background.scale.y)
+
+        self.backgroundAnimationCheckbox.setChecked(frame.background.animation == True)
+
+        # Текст
+        charaName = frame.text.charaName
+        advancedName = None
+        if charaName == '':
+            index = 0
+        elif charaName in self.charaList:
+            index = self.charaList.index(charaName)
+            if index == 18:
+                advancedName = ''
+        else:
+            index = 18
+            advancedName = charaName
+        self.textCharaNameCombobox.setCurrentIndex(index)
+        self.textAdvancedNameLineEdit.setText(advancedName or '')
+        self.textAdvancedNameWidget.setVisible(advancedName is not None)
+
+        self.textTextTextEdit.setPlainText(frame.text.text)
+
+        # UI
+        if frame.ui.time in self.timeList[1:]:
+            self.uiTimeOfDayCombobox.setCurrentIndex(self.timeList.index(frame.ui.time))
+        else:
+            frame.ui.time = ''
+            self.uiTimeOfDayCombobox.setCurrentIndex(0)
+
+        if frame.ui.chapter == '':
+            try:
+                previous_chapter = BUFFER_DATA[str(int(key) - 1)].ui.chapter
+                frame.ui.chapter = previous_chapter
+                self.uiChapterLineEdit.setText(previous_chapter)
+            except KeyError as e:
+                print(f"Error accessing previous chapter data: {e}")
+                frame.ui.chapter = ''
+                self.uiChapterLineEdit.setText('')
+        else:
+            self.uiChapterLineEdit.setText(frame.ui.chapter)
+
+        self.emotionCheckbox.setChecked(bool(frame.ui.emotion))
+
+        if frame.ui.charaEmotion == '':
+            self.uiCharaEmotionButton.setText('Select')
+        else:
+            uiCharaEmotionText = frame.ui.charaEmotion
+            uiCharaEmotionText = uiCharaEmotionText.replace("sprites/makishiro/", "")
+            uiCharaEmotionText = uiCharaEmotionText.replace(".png", "")
+            self.uiCharaEmotionButton.setText(uiCharaEmotionText)
+
+        if frame.ui.charaEmotionBackground == '':
+            self.uiCharaBackgroundPushbutton.setText("Select")
+        else:
+            uiCharaBackgroundText = frame.ui.charaEmotionBackground
+            uiCharaBackgroundText = uiCharaBackgroundText.replace("backgrounds/", "")
+            uiCharaBackgroundText = uiCharaBackgroundText.replace(".png", "")
+            self.uiCharaBackgroundPushbutton.setText(uiCharaBackgroundText)
+
+        if frame.ui.charaEmotionBackgroundPosition is None:
+            frame.ui.charaEmotionBackgroundPosition = Vec2(0, 0)
+        if frame.ui.charaEmotionBackgroundScale is None:
+            frame.ui.charaEmotionBackgroundScale = Vec2(1, 1)
+
+        self.uiCharaBackgroundPositionX.setValue(int(frame.ui.charaEmotionBackgroundPosition.x))
+        self.uiCharaBackgroundPositionY.setValue(int(frame.ui.charaEmotionBackgroundPosition.y))
+        self.uiCharaBackgroundScaleX.setValue(frame.ui.charaEmotionBackgroundScale.x)
+        self.uiCharaBackgroundScaleY.setValue(frame.ui.charaEmotionBackgroundScale.y)
+
+        # Спрайты
+        self.bindSpriteList(key)
+
+        self.commentsTextBox.setPlainText(frame.comment)
+
+    def bindSpriteList(self, key):
+        """Заполняет иерархию спрайтов кадра и сбрасывает выбранный спрайт."""
+        self.spritesListWidget.blockSignals(True)
+        self.spritesListWidget.clear()
+        self.spriteList = []
+        for i, sprite in enumerate(BUFFER_DATA[key].sprites):
+            if sprite.spriteId != '':
+                item = QListWidgetItem(sprite.spriteId)
+            else:
+                item = QListWidgetItem(f'Sprite: {i}')
+                sprite.spriteId = f'Sprite: {i}'
 
-        commentsTextBox.textChanged.connect(lambda: self.saveComment(commentsTextBox.toPlainText(), key))
+            self.spriteList.append(i)
+            self.spritesListWidget.addItem(item)
+        self.spritesListWidget.blockSignals(False)
 
+        self.id = None
+        self.spritesSelectButton.setText("select")
+        self.spritesSelectButton.setEnabled(False)
+
+        spriteInputs = (self.spritesPositionXSpinbox, self.spritesPositionYSpinbox, self.spritesScaleXSpinbox,
+                        self.spritesScaleYSpinbox, self.spritesAnimationTimeSpinbox, self.spritesAnimationPositionXSpinbox,
+                        self.spritesAnimationPositionYSpinbox, self.spritesAnimationScaleXSpinbox, self.spritesAnimationScaleYSpinbox,
+                        self.spritesAnimationOpacitySpinbox)
+        for widget in spriteInputs:
+            widget.blockSignals(True)
+            widget.setValue(0)
+            widget.setEnabled(False)
+            widget.blockSignals(False)
+        self.spritesAnimationEasingCombobox.setEnabled(False)
+
+        self.spritesAnimationCheckbox.blockSignals(True)
+        self.spritesAnimationCheckbox.setChecked(False)
+        self.spritesAnimationCheckbox.setEnabled(False)
+        self.spritesAnimationCheckbox.blockSignals(False)
+
+    def backgroundAnimationSwitch(self):
+        self.animationSwitch(self.backgroundAnimationCheckbox, self.backgroundAnimationTime, self.backgroundAnimationPositionX, self.backgroundAnimationPositionY, self.backgroundAnimationScaleX, self.backgroundAnimationScaleY, "background", self.key, None,
+                             self.backgroundAnimationOpacity, self.backgroundAnimationEasing)
+
+    def toggleEmotionFields(self):
+        key = self.key
+        emotionEnabled = self.emotionCheckbox.isChecked()
+
+        # Включаем или отключаем поля, связанные с эмоциями
+        self.uiCharaEmotionButton.setEnabled(emotionEnabled)
+        self.uiCharaBackgroundPushbutton.setEnabled(emotionEnabled)
+        self.uiCharaBackgroundPositionX.setEnabled(emotionEnabled)
+        self.uiCharaBackgroundPositionY.setEnabled(emotionEnabled)
+        self.uiCharaBackgroundScaleX.setEnabled(emotionEnabled)
+        self.uiCharaBackgroundScaleY.setEnabled(emotionEnabled)
+
+        # Если отключаем, очищаем данные в BUFFER_DATA
+        if not emotionEnabled:
+            BUFFER_DATA[key].ui.charaEmotion = ""
+            BUFFER_DATA[key].ui.charaEmotionBackground = ""
+            BUFFER_DATA[key].ui.charaEmotionBackgroundPosition = Vec2(0, 0)
+            BUFFER_DATA[key].ui.charaEmotionBackgroundScale = Vec2(1.0, 1.0)
         
+        # Сохраняем состояние эмоций в BUFFER_DATA
+        BUFFER_DATA[key].ui.emotion = emotionEnabled
+        self.requestCanvasRefresh("emotion", key=key)
 
     
 
     def saveComment(self, text, key):
-        BUFFER_DATA[key]["comment"] = text
+        BUFFER_DATA[key].comment = text
 
 
 
@@ -1738,200 +5035,146 @@ class MainWindow(QMainWindow):
 
     def duplicateSprite(self, item):
         itemIndex = self.spritesListWidget.row(item)
-        buffer = copy.deepcopy(BUFFER_DATA[self.key]["sprite"][str(itemIndex)])
-        buffer["spriteId"] = f"Sprite: {BUFFER_DATA[self.key]['sprite']['count']}"
-        count = BUFFER_DATA[self.key]["sprite"]['count']
-        BUFFER_DATA[self.key]["sprite"][str(count)] = buffer
-        BUFFER_DATA[self.key]["sprite"]['count'] += 1
-        self.inspectorLoad(self.path)
+        sprites = BUFFER_DATA[self.key].sprites
+        buffer = copy.deepcopy(sprites[itemIndex])
+        buffer.spriteId = f"Sprite: {len(sprites)}"
+        sprites.append(buffer)
+        self.bindSpriteList(self.key)
+        self.requestCanvasRefresh("sprites", key=self.key)
 
 
     def deleteSprite(self, item):
         itemIndex = self.spritesListWidget.row(item)
         
         # Удаляем выбранный спрайт из BUFFER_DATA
-        del BUFFER_DATA[self.key]["sprite"][str(itemIndex)]
+        sprites = BUFFER_DATA[self.key].sprites
+        del sprites[itemIndex]
         
-        # Уменьшаем количество спрайтов на один
-        BUFFER_DATA[self.key]["sprite"]['count'] -= 1
+        # Перенумеровываем оставшиеся спрайты после удалённого
+        for i in range(itemIndex, len(sprites)):
+            sprites[i].spriteId = f'Sprite: {i}'
         
-        # Сдвигаем оставшиеся спрайты, чтобы заполнить пробел
-        for i in range(itemIndex, BUFFER_DATA[self.key]["sprite"]['count']):
-            BUFFER_DATA[self.key]["sprite"][str(i)] = BUFFER_DATA[self.key]["sprite"][str(i + 1)]
-            BUFFER_DATA[self.key]["sprite"][str(i)]["spriteId"] = f'Sprite: {i}'
-        
-        # Проверяем, существует ли последний элемент, и удаляем его, если он есть
-        last_index = str(BUFFER_DATA[self.key]["sprite"]['count'])
-        if last_index in BUFFER_DATA[self.key]["sprite"]:
-            del BUFFER_DATA[self.key]["sprite"][last_index]
-        
-        # Обновляем список спрайтов и панель инспектора
-        self.inspectorLoad(self.path)
+        # Обновляем список спрайтов и холст
+        self.bindSpriteList(self.key)
+        self.requestCanvasRefresh("sprites", key=self.key)
 
         
         
 
 
-    def spritesAnimationCheckboxClicked(self, spritesAnimationCheckbox, spritesAnimationTimeSpinbox, 
-                                        spritesAnimationPositionXSpinbox, spritesAnimationPositionYSpinbox, 
-                                        spritesAnimationScaleXSpinbox, spritesAnimationScaleYSpinbox):
-        sprite_data = BUFFER_DATA[self.key]["sprite"][str(self.id)]
-        sprite_data["animation"] = spritesAnimationCheckbox.isChecked()
+    def spritesAnimationCheckboxClicked(self):
+        sprite_data = BUFFER_DATA[self.key].sprites[self.id]
+        sprite_data.animation = self.spritesAnimationCheckbox.isChecked()
         
-        if sprite_data["animation"] == False:
-            if "animationSettings" in sprite_data:
-                del sprite_data["animationSettings"]
-        else:
-            if "animationSettings" not in sprite_data:
-                sprite_data["animationSettings"] = {
-                    "time": 0,
-                    "position": {"x": 0, "y": 0},
-                    "scale": {"x": 1.0, "y": 1.0}
-                }
+        if sprite_data.animation == False:
+            sprite_data.animationSettings = None
+        elif sprite_data.animationSettings is None:
+            sprite_data.animationSettings = AnimationSettings()
         
-        # Передаем sprite_data в animationSpriteSettings
-        self.animationSpriteSettings(spritesAnimationCheckbox, spritesAnimationTimeSpinbox, 
-                                    spritesAnimationPositionXSpinbox, spritesAnimationPositionYSpinbox, 
-                                    spritesAnimationScaleXSpinbox, spritesAnimationScaleYSpinbox, 
-                                    sprite_data)
-        self.createCanvas()
+        self.animationSpriteSettings(sprite_data)
+
 
+    def selectSprite(self, index):
+        item = self.spritesListWidget.item(index)
+        if item is None:
+            return
+        self.spritesListWidget.setCurrentItem(item)
+        self.spriteSettings(item)
 
-    def spriteSettings(self, item, key, spritesSelectButton, spritesPositionXSpinbox, spritesPositionYSpinbox, 
-                    spritesScaleXSpinbox, spritesScaleYSpinbox, spritesAnimationCheckbox, 
-                    spritesAnimationTimeSpinbox, spritesAnimationPositionXSpinbox, 
-                    spritesAnimationPositionYSpinbox, spritesAnimationScaleXSpinbox, 
-                    spritesAnimationScaleYSpinbox):
+    def spriteSettings(self, item):
+        key = self.key
         itemText = item.text()
         self.id = None
 
         # Найти индекс текущего спрайта
-        for i in range(BUFFER_DATA[key]["sprite"]["count"]):
-            if itemText == BUFFER_DATA[key]["sprite"][str(i)]["spriteId"]:
+        for i, sprite in enumerate(BUFFER_DATA[key].sprites):
+            if itemText == sprite.spriteId:
                 self.id = i
 
-        # Проверить наличие настроек анимации и других параметров для этого спрайта
-        sprite_data = BUFFER_DATA[key]["sprite"][str(self.id)]
-        
-        if "animationSettings" not in sprite_data:
-            # Если настройки анимации отсутствуют, инициализируем их
-            sprite_data["animationSettings"] = {
-                "time": 0,
-                "position": {"x": 0, "y": 0},
-                "scale": {"x": 1.0, "y": 1.0}
-            }
+        if self.id is None:
+            return
+
+        # Выбор спрайта кадр не меняет: настройки анимации создаются при первой их правке
+        sprite_data = BUFFER_DATA[key].sprites[self.id]
 
         # Обновление интерфейса с использованием данных спрайта
-        spritesSelectButton.setEnabled(True)
-        spritesSelectButtonText = sprite_data["name"]
+        self.spritesSelectButton.setEnabled(True)
+        spritesSelectButtonText = sprite_data.name
         spritesSelectButtonText = spritesSelectButtonText[spritesSelectButtonText.find("/", spritesSelectButtonText.find("/") + 1) + 1:].strip()
-        spritesSelectButton.setText(spritesSelectButtonText)
+        self.spritesSelectButton.setText(spritesSelectButtonText)
+
+        spriteInputs = (self.spritesPositionXSpinbox, self.spritesPositionYSpinbox, self.spritesScaleXSpinbox, self.spritesScaleYSpinbox)
+        for widget in spriteInputs:
+            widget.blockSignals(True)
+            widget.setEnabled(True)
 
-        spritesPositionXSpinbox.setEnabled(True)
-        spritesPositionYSpinbox.setEnabled(True)
-        spritesPositionXSpinbox.setValue(int(sprite_data["position"]["x"]))
-        spritesPositionYSpinbox.setValue(int(sprite_data["position"]["y"]))
+        self.spritesPositionXSpinbox.setValue(int(sprite_data.position.x))
+        self.spritesPositionYSpinbox.setValue(int(sprite_data.position.y))
+        self.spritesScaleXSpinbox.setValue(sprite_data.scale.x)
+        self.spritesScaleYSpinbox.setValue(sprite_data.scale.y)
 
-        spritesScaleXSpinbox.setEnabled(True)
-        spritesScaleYSpinbox.setEnabled(True)
-        spritesScaleXSpinbox.setValue(sprite_data["scale"]["x"])
-        spritesScaleYSpinbox.setValue(sprite_data["scale"]["y"])
+        for widget in spriteInputs:
+            widget.blockSignals(False)
 
         # Настройки анимации
-        self.animationSpriteSettings(spritesAnimationCheckbox, spritesAnimationTimeSpinbox, 
-                                    spritesAnimationPositionXSpinbox, spritesAnimationPositionYSpinbox, 
-                                    spritesAnimationScaleXSpinbox, spritesAnimationScaleYSpinbox, 
-                                    sprite_data)
-        self.createCanvas()
+        self.animationSpriteSettings(sprite_data)
 
-    def animationSpriteSettings(self, spritesAnimationCheckbox, spritesAnimationTimeSpinbox, 
-                                spritesAnimationPositionXSpinbox, spritesAnimationPositionYSpinbox, 
-                                spritesAnimationScaleXSpinbox, spritesAnimationScaleYSpinbox, 
-                                sprite_data):
-        
+    def animationSpriteSettings(self, sprite_data):
         # Активация чекбокса анимации
-        spritesAnimationCheckbox.setEnabled(True)
-        
-        # Проверка состояния анимации
-        if sprite_data["animation"] == False:
-            # Если анимация отключена, отключаем поля и обнуляем значения
-            spritesAnimationTimeSpinbox.setEnabled(False)
-            spritesAnimationPositionXSpinbox.setEnabled(False)
-            spritesAnimationPositionYSpinbox.setEnabled(False)
-            spritesAnimationScaleXSpinbox.setEnabled(False)
-            spritesAnimationScaleYSpinbox.setEnabled(False)
-
-            spritesAnimationCheckbox.setChecked(False)
-            spritesAnimationTimeSpinbox.setValue(0)
-            spritesAnimationPositionXSpinbox.setValue(0)
-            spritesAnimationPositionYSpinbox.setValue(0)
-            spritesAnimationScaleXSpinbox.setValue(0)
-            spritesAnimationScaleYSpinbox.setValue(0)
+        self.spritesAnimationCheckbox.setEnabled(True)
+        condition = sprite_data.animation == True
+
+        self.spritesAnimationCheckbox.blockSignals(True)
+        self.spritesAnimationCheckbox.setChecked(condition)
+        self.spritesAnimationCheckbox.blockSignals(False)
+
+        # Если анимация отключена, отключаем поля и обнуляем значения, иначе берем их из данных
+        self.spritesAnimationTimeSpinbox.setEnabled(condition)
+        self.spritesAnimationPositionXSpinbox.setEnabled(condition)
+        self.spritesAnimationPositionYSpinbox.setEnabled(condition)
+        self.spritesAnimationScaleXSpinbox.setEnabled(condition)
+        self.spritesAnimationScaleYSpinbox.setEnabled(condition)
+        self.spritesAnimationOpacitySpinbox.setEnabled(condition)
+        self.spritesAnimationEasingCombobox.setEnabled(condition)
+
+        self.blockSignalsForAnimation(self.spritesAnimationTimeSpinbox, self.spritesAnimationPositionXSpinbox,
+                                      self.spritesAnimationPositionYSpinbox, self.spritesAnimationScaleXSpinbox,
+                                      self.spritesAnimationScaleYSpinbox,
+                                      (sprite_data.animationSettings or AnimationSettings()) if condition else None,
+                                      self.spritesAnimationOpacitySpinbox, self.spritesAnimationEasingCombobox)
+
+    def animationSwitch(self, checkbox, time, positionX, positionY, scaleX, scaleY, type, key, index, opacity=None, easing=None):
+        condition = checkbox.isChecked()
+        for widget in (time, positionX, positionY, scaleX, scaleY, opacity, easing):
+            if widget is not None:
+                widget.setEnabled(condition)
+        if type == "background":
+            target = BUFFER_DATA[key].background
         else:
-            # Если анимация включена, включаем поля и устанавливаем значения из данных
-            spritesAnimationTimeSpinbox.setEnabled(True)
-            spritesAnimationPositionXSpinbox.setEnabled(True)
-            spritesAnimationPositionYSpinbox.setEnabled(True)
-            spritesAnimationScaleXSpinbox.setEnabled(True)
-            spritesAnimationScaleYSpinbox.setEnabled(True)
-
-            spritesAnimationCheckbox.setChecked(True)
-            spritesAnimationTimeSpinbox.setValue(sprite_data["animationSettings"]["time"])
-            spritesAnimationPositionXSpinbox.setValue(sprite_data["animationSettings"]["position"]["x"])
-            spritesAnimationPositionYSpinbox.setValue(sprite_data["animationSettings"]["position"]["y"])
-            spritesAnimationScaleXSpinbox.setValue(sprite_data["animationSettings"]["scale"]["x"])
-            spritesAnimationScaleYSpinbox.setValue(sprite_data["animationSettings"]["scale"]["y"])
-        self.createCanvas()
+            target = BUFFER_DATA[key].sprites[int(index)]
 
-    def animationSwitch(self, checkbox, time, positionX, positionY, scaleX, scaleY, type, key, index):
-        condition = checkbox.isChecked()
-        time.setEnabled(condition)
-        positionX.setEnabled(condition)
-        positionY.setEnabled(condition)
-        scaleX.setEnabled(condition)
-        scaleY.setEnabled(condition)
+        # При привязке к кадру состояние уже совпадает с чекбоксом — кадр меняет только переключение
         if condition == True:
-            if type == "background":
-                BUFFER_DATA[key][type]["animation"] = True
-                if 'animationSettings' not in BUFFER_DATA[key][type]:
-                    BUFFER_DATA[key][type]['animationSettings'] = {
-                        "time": 0,
-                        "position": {
-                            "x": 0,
-                            "y": 0
-                        },
-                        "scale": {
-                            "x": 1.0,
-                            "y": 1.0
-                        }
-                    }
-                self.blockSignalsForAnimation(time, positionX, positionY, scaleX, scaleY, BUFFER_DATA[key]["background"]["animationSettings"])
-            elif type == "sprite":
-                BUFFER_DATA[key][type][index]["animation"] = True
-                if 'animationSettings' not in BUFFER_DATA[key][type][index]:
-                    BUFFER_DATA[key][type][index]['animationSettings'] = {
-                        "time": 0,
-                        "position": {
-                            "x": 0,
-                            "y": 0
-                        },
-                        "scale": {
-                            "x": 1.0,
-                            "y": 1.0
-                        }
-                    }
-                self.blockSignalsForAnimation(time, positionX, positionY, scaleX, scaleY, BUFFER_DATA[key]["sprite"][index]["animationSettings"])
+            if target.animation != True:
+                target.animation = True
+                if target.animationSettings is None:
+                    target.animationSettings = AnimationSettings()
+            self.blockSignalsForAnimation(time, positionX, positionY, scaleX, scaleY,
+                                          target.animationSettings or AnimationSettings(), opacity, easing)
+        else:
+            if target.animation:
+                target.animation = False
+                target.animationSettings = None
+            self.blockSignalsForAnimation(time, positionX, positionY, scaleX, scaleY, None, opacity, easing)
+
+    def saveEasing(self, combobox, key, object, index):
+        if object == "background":
+            target = BUFFER_DATA[key].background
         else:
-            if type == "background":
-                BUFFER_DATA[key][type]["animation"] = False
-                if 'animationSettings' in BUFFER_DATA[key][type]:
-                    del BUFFER_DATA[key][type]['animationSettings']
-                self.blockSignalsForAnimation(time, positionX, positionY, scaleX, scaleY, None)
-            elif type == "sprite":
-                BUFFER_DATA[key][type][index]["animation"] = False
-                if 'animationSettings' in BUFFER_DATA[key][type][index]:
-                    del BUFFER_DATA[key][type][index]['animationSettings']
-                self.blockSignalsForAnimation(time, positionX, positionY, scaleX, scaleY, None)
+            target = BUFFER_DATA[key].sprites[int(index)]
+        if target.animationSettings is None:
+            target.animationSettings = AnimationSettings()
+        target.animationSettings.easing = combobox.currentText()
 
     def createLine(self):
         line = QFrame()
@@ -1940,63 +5183,72 @@ class MainWindow(QMainWindow):
         return line
 
     def saveSpinValue(self, spinbox, key, animation, type, item, object, index):
+        frame = BUFFER_DATA[key]
+        if object == "background":
+            target = frame.background
+        elif object == "sprite" and index is not None:
+            target = frame.sprites[int(index)]
+        elif object == "ui":
+            target = frame.ui
+        else:
+            return
+
+        if animation:
+            if target.animationSettings is None:
+                target.animationSettings = AnimationSettings()
+            target = target.animationSettings
+
+        # type — имя поля, item — компонента x/y для векторных полей
+        if item is None:
+            setattr(target, type, spinbox.value())
+        else:
+            setattr(getattr(target, type), item, spinbox.value())
+
+        # Настройки анимации на статичный кадр не влияют, остальное обновляет один элемент сцены
         if animation == False:
             if object == "background":
-                BUFFER_DATA[key][object][type][item] = spinbox.value()
+                self.requestCanvasRefresh("background", key=key)
             elif object == "sprite" and index is not None:
-                BUFFER_DATA[key][object][index][type][item] = spinbox.value()
+                self.requestCanvasRefresh("sprite", int(index), key)
             elif object == "ui":
-                if type == "charaEmotionBackgroundPosition":
-                    BUFFER_DATA[key][object]["charaEmotionBackgroundPosition"][item] = spinbox.value()
-                elif type == "charaEmotionBackgroundScale":
-                    BUFFER_DATA[key][object]["charaEmotionBackgroundScale"][item] = spinbox.value()
-                else:
-                    BUFFER_DATA[key][object][type] = spinbox.value()
-        else:
-            if object == "background" and type != "time":
-                BUFFER_DATA[key][object]["animationSettings"][type][item] = spinbox.value()
-            elif object == "sprite" and type != "time":
-                BUFFER_DATA[key][object][index]["animationSettings"][type][item] = spinbox.value()
-            elif object == "background" and type == "time":
-                BUFFER_DATA[key][object]["animationSettings"][type] = spinbox.value()
-            elif object == "sprite" and type == "time":
-                BUFFER_DATA[key][object][index]["animationSettings"][type] = spinbox.value()
-
-        self.createCanvas()
+                self.requestCanvasRefresh("emotion", key=key)
 
             
 
 
-    def blockSignalsForAnimation(self, time, positionX, positionY, scaleX, scaleY, animationSettings):
-        time.blockSignals(True)
-        positionX.blockSignals(True)
-        positionY.blockSignals(True)
-        scaleX.blockSignals(True)
-        scaleY.blockSignals(True)
+    def blockSignalsForAnimation(self, time, positionX, positionY, scaleX, scaleY, animationSettings, opacity=None, easing=None):
+        widgets = [widget for widget in (time, positionX, positionY, scaleX, scaleY, opacity, easing) if widget is not None]
+        for widget in widgets:
+            widget.blockSignals(True)
 
         if animationSettings:
-            time.setValue(animationSettings["time"])
-            positionX.setValue(animationSettings["position"]["x"])
-            positionY.setValue(animationSettings["position"]["y"])
-            scaleX.setValue(animationSettings["scale"]["x"])
-            scaleY.setValue(animationSettings["scale"]["y"])
+            time.setValue(animationSettings.time)
+            positionX.setValue(animationSettings.position.x)
+            positionY.setValue(animationSettings.position.y)
+            scaleX.setValue(animationSettings.scale.x)
+            scaleY.setValue(animationSettings.scale.y)
+            if opacity is not None:
+                opacity.setValue(1.0 if animationSettings.opacity is None else animationSettings.opacity)
+            if easing is not None:
+                easing.setCurrentText(animationSettings.easing or DEFAULT_EASING)
         else:
             time.setValue(0)
             positionX.setValue(0)
             positionY.setValue(0)
             scaleX.setValue(0)
             scaleY.setValue(0)
+            if opacity is not None:
+                opacity.setValue(0)
+            if easing is not None:
+                easing.setCurrentText(DEFAULT_EASING)
 
-        time.blockSignals(False)
-        positionX.blockSignals(False)
-        positionY.blockSignals(False)
-        scaleX.blockSignals(False)
-        scaleY.blockSignals(False)
+        for widget in widgets:
+            widget.blockSignals(False)
                 
 
     def onSpriteSelect(self, selectedImage):
         key = self.path[0] if hasattr(self, 'path') and self.path else None
-        BUFFER_DATA[key]['sprite'][self.index]['name'] = selectedImage
+        BUFFER_DATA[key].sprites[int(self.index)].name = selectedImage
         self.spriteSelectButton.setText(selectedImage)
         self.layoutChecker(self.formLayout, self.key, self.item)
 
@@ -2010,19 +5262,11 @@ class MainWindow(QMainWindow):
 
     def saveSpritelist(self, key):
         sprite_order = [self.spritesListWidget.item(i).text() for i in range(self.spritesListWidget.count())]
-        sprite_count = int(BUFFER_DATA[key]['sprite']['count'])
-        buffer = BUFFER_DATA[key]['sprite']
-        updated_sprites = {'count': sprite_count}
-
-        original_indices = {buffer[str(i)]['spriteId']: i for i in range(sprite_count)}
-
-        for new_index, object_name in enumerate(sprite_order):
-            original_index = original_indices[object_name]
-            updated_sprites[str(new_index)] = buffer[str(original_index)]
-
-        BUFFER_DATA[key]['sprite'] = updated_sprites
-        self.inspectorLoad(self.path)
-        self.createCanvas()
+        sprites_by_id = {sprite.spriteId: sprite for sprite in BUFFER_DATA[key].sprites}
+        BUFFER_DATA[key].sprites = [sprites_by_id[object_name] for object_name in sprite_order]
+        # Список уже в новом порядке; сброс выбора откладываем до конца обработки перетаскивания
+        QTimer.singleShot(0, lambda: self.bindSpriteList(key) if key == self.key else None)
+        self.requestCanvasRefresh("sprites", key=key)
 
     def changeSpriteList(self, key):
         self.spriteList.clear()  
@@ -2041,63 +5285,47 @@ class MainWindow(QMainWindow):
         print(f"Selected image: {selected_image}")
         key = self.path[0] if hasattr(self, 'path') and self.path else None
         if key:
-            BUFFER_DATA[key]['ui']['charaEmotion'] = selected_image
+            BUFFER_DATA[key].ui.charaEmotion = selected_image
             self.inspectorLoad(self.path)
 
     def saveChapter(self, text, key):
-        BUFFER_DATA[key]['ui']['chapter'] = text
-        self.createCanvas()
+        BUFFER_DATA[key].ui.chapter = text
+        self.requestCanvasRefresh("ui", key=key)
 
     def timeOfDaySave(self, qbox, key):
         text = qbox.currentText()
-        BUFFER_DATA[key]['ui']['time'] = text
-        self.createCanvas()
+        BUFFER_DATA[key].ui.time = text
+        self.requestCanvasRefresh("ui", key=key)
         
     def saveText(self, text, key):
-        BUFFER_DATA[key]['text']['text'] = text
-        self.createCanvas()
+        BUFFER_DATA[key].text.text = text
+        self.frameListModel.frameChanged(key)
+        self.requestCanvasRefresh("texts", key=key)
 
     def lineEditSave(self, text, key):
-        BUFFER_DATA[key]['text']['charaName'] = text
-        self.createCanvas()
-
-    def lineEdit(self, text, layout, key):
-        textLayout = QHBoxLayout()
-        textName = QLabel("advanced name")
-        textLineEdit = QLineEdit(text)
-
-        textName.setStyleSheet("padding-left: 20px;")
-
-        textLayout.addWidget(textName)
-        textLayout.addWidget(textLineEdit)
-
-        layout.addRow(textLayout)
-        textLineEdit.textChanged.connect(lambda: self.lineEditSave(textLineEdit.text(), key))
+        BUFFER_DATA[key].text.charaName = text
+        self.frameListModel.frameChanged(key)
+        self.requestCanvasRefresh("texts", key=key)
 
-    def charaTextName(self,qbox,key,path):
+    def charaTextName(self, qbox, key):
         text = qbox.currentText()
-        BUFFER_DATA[key]['text']['charaName'] = text
-        self.inspectorLoad(path)
-        self.createCanvas()
+        BUFFER_DATA[key].text.charaName = text
+        self.frameListModel.frameChanged(key)
+
+        # Произвольное имя вводится в отдельном поле
+        self.textAdvancedNameLineEdit.blockSignals(True)
+        self.textAdvancedNameLineEdit.setText('')
+        self.textAdvancedNameLineEdit.blockSignals(False)
+        self.textAdvancedNameWidget.setVisible(qbox.currentIndex() == 18)
+        self.requestCanvasRefresh("texts", key=key)
 
     def togledBackgroundAnimationButton(self, checkbox, data, key, path):
         if checkbox.isChecked():
-            data[key]['background']['animation'] = True
-            data[key]['background']['animationSettings'] = {
-                "time": 0,
-                "position":{
-                    "x": 0,
-                    "y": 0
-                },
-                "scale":{
-                    "x": 1,
-                    "y": 1
-                }
-            }
+            data[key].background.animation = True
+            data[key].background.animationSettings = AnimationSettings(scale=Vec2(1, 1))
         else:
-            data[key]['background']['animation'] = False
-            if 'animationSettings' in data[key]['background']:
-                del data[key]['background']['animationSettings']
+            data[key].background.animation = False
+            data[key].background.animationSettings = None
         
         self.inspectorLoad(path)
 
@@ -2110,7 +5338,140 @@ class MainWindow(QMainWindow):
             self.inspectorLoad(self.path)
 
 
-app = QApplication(sys.argv)
-window = MainWindow()
-window.show()
-sys.exit(app.exec())
+# Пакетный рендер кадров в PNG без интерфейса. Каждый процесс пула держит свое
+# offscreen-приложение Qt и одну FrameScene, кадры приходят в задачи уже разобранными.
+
+RENDER_APP = None
+RENDER_SCENE = None
+RENDER_SIZE = (FrameScene.SCREEN_WIDTH, FrameScene.SCREEN_HEIGHT)
+
+
+def renderWorkerInit(width, height):
+    global RENDER_APP, RENDER_SCENE, RENDER_SIZE
+    os.environ["QT_QPA_PLATFORM"] = "offscreen"
+    RENDER_APP = QApplication([])
+    RENDER_SIZE = (width, height)
+    # Уровень детализации изображений подбирается под выходное разрешение, как под зум холста
+    SETTINGS["scale_factor"] = max(width / FrameScene.SCREEN_WIDTH, height / FrameScene.SCREEN_HEIGHT)
+    RENDER_SCENE = FrameScene()
+
+
+def renderWorkerFrame(task):
+    """Рендер одного кадра в процессе пула. Возвращает (ключ, текст ошибки или None)."""
+    key, data, output_path = task
+    try:
+        BUFFER_DATA[key] = Frame.fromJson(data)
+        image = RENDER_SCENE.renderFrame(key, *RENDER_SIZE)
+        if not image.save(output_path, "PNG"):
+            return key, f"Cannot write {output_path}"
+    except Exception as e:
+        return key, str(e)
+    finally:
+        BUFFER_DATA.pop(key, None)
+    return key, None
+
+
+def renderFileName(index, key):
+    safe_key = "".join(char if char.isalnum() or char in "-_" else "_" for char in key)
+    return f"{index:05d}_{safe_key}.png"
+
+
+def renderScenario(path, output_dir, width, height, jobs, keys=None):
+    """
+    Рендерит кадры сценария в output_dir параллельно в пуле процессов.
+    Пути к изображениям в сценарии относительные, как и в редакторе, — от текущей папки.
+    Возвращает количество ошибок.
+    """
+    # Номер в имени файла — позиция кадра в сценарии, чтобы имена не зависели от --frames
+    with open(path, "rb") as file:
+        tasks = [(key, data, os.path.join(output_dir, renderFileName(index, key)))
+                 for index, (key, data) in enumerate(ScenarioReader(file).frames()) if keys is None or key in keys]
+    os.makedirs(output_dir, exist_ok=True)
+
+    errors = 0
+    # spawn, а не fork: копировать процесс с уже запущенными потоками Qt небезопасно
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=jobs, mp_context=context,
+                             initializer=renderWorkerInit, initargs=(width, height)) as executor:
+        for done, (key, error) in enumerate(executor.map(renderWorkerFrame, tasks, chunksize=8), 1):
+            if error:
+                errors += 1
+                print(f"Frame '{key}': {error}", file=sys.stderr)
+            print(f"[{done}/{len(tasks)}] {key}")
+    return errors
+
+
+def validateScenario(path, jobs):
+    """Проверка ассетов сценария из командной строки. Возвращает количество ошибок."""
+    timer = QElapsedTimer()
+    timer.start()
+    with open(path, "rb") as file:
+        frames = [(key, Frame.fromJson(data)) for key, data in ScenarioReader(file).frames()]
+    references = AssetValidator.collect(frames)
+    index = AssetIndex(ASSET_INDEX_PATH)
+    index.load()
+    index.merge(list(AssetIndex.ROOTS), AssetIndex.scanFolders(AssetIndex.ROOTS, index.folders))
+    index.save()
+    issues = AssetValidator(records=index.snapshot()).validate(references, jobs)
+    for issue in issues:
+        print(AssetValidator.formatIssue(issue))
+    errors = sum(issue["kind"] in AssetValidator.ERRORS for issue in issues)
+    print(f"{len(frames)} frames, {len(references)} assets: {len(issues)} issues, {errors} errors "
+          f"in {timer.elapsed() / 1000:.2f} s")
+    return errors
+
+
+def parseArguments(argv):
+    parser = argparse.ArgumentParser(description="Scenario Editor")
+    parser.add_argument("--render", metavar="SCENARIO", help="render frames of a scenario JSON to PNG and exit")
+    parser.add_argument("--out", default="render", help="output folder for --render (default: render)")
+    parser.add_argument("--size", default=f"{FrameScene.SCREEN_WIDTH}x{FrameScene.SCREEN_HEIGHT}",
+                        help="output resolution WIDTHxHEIGHT (default: %(default)s)")
+    parser.add_argument("--jobs", type=int, default=os.cpu_count() or 1, help="number of render processes")
+    parser.add_argument("--frames", nargs="+", metavar="KEY", help="render only these frame keys")
+    parser.add_argument("--validate", metavar="SCENARIO",
+                        help="check assets referenced by a scenario JSON and exit (status 1 on errors)")
+    # Остальные аргументы (например, -style) достаются QApplication
+    arguments, arguments.qt = parser.parse_known_args(argv)
+    if (arguments.render or arguments.validate) and arguments.qt:
+        parser.error(f"unrecognized arguments: {' '.join(arguments.qt)}")
+    try:
+        width, height = (int(value) for value in arguments.size.lower().split("x"))
+        if width <= 0 or height <= 0:
+            raise ValueError
+    except ValueError:
+        parser.error(f"invalid --size '{arguments.size}', expected WIDTHxHEIGHT")
+    arguments.width, arguments.height = width, height
+    return arguments
+
+
+if __name__ == "__main__":
+    arguments = parseArguments(sys.argv[1:])
+    if arguments.render:
+        try:
+            errors = renderScenario(arguments.render, arguments.out, arguments.width, arguments.height,
+                                    max(1, arguments.jobs), set(arguments.frames) if arguments.frames else None)
+        except (OSError, ValueError) as e:
+            print(f"Failed to render {arguments.render}: {e}", file=sys.stderr)
+            sys.exit(2)
+        sys.exit(1 if errors else 0)
+    if arguments.validate:
+        try:
+            errors = validateScenario(arguments.validate, max(1, arguments.jobs))
+        except (OSError, ValueError) as e:
+            print(f"Failed to validate {arguments.validate}: {e}", file=sys.stderr)
+            sys.exit(2)
+        sys.exit(1 if errors else 0)
+
+    app = QApplication(sys.argv[:1] + arguments.qt)
+    app.aboutToQuit.connect(THUMBNAIL_LOADER.shutdown)
+    app.aboutToQuit.connect(SCENARIO_LOADER.shutdown)
+    app.aboutToQuit.connect(SCENARIO_SAVER.shutdown)
+    app.aboutToQuit.connect(IMAGE_PRELOADER.shutdown)
+    app.aboutToQuit.connect(JOURNAL.shutdown)
+    app.aboutToQuit.connect(ASSET_VALIDATION.shutdown)
+    app.aboutToQuit.connect(ASSET_INDEX.shutdown)
+    ASSET_INDEX.start()
+    window = MainWindow()
+    window.show()
+    sys.exit(app.exec())
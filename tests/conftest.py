@@ -0,0 +1,62 @@
+import json
+import os
+import sys
+import time
+
+import pytest
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "main"))
+
+from PyQt6.QtWidgets import QApplication  # noqa: E402
+
+import main  # noqa: E402
+
+SAMPLE_SCENARIO = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "sample_scenario.json")
+
+
+@pytest.fixture(scope="session")
+def app():
+    return QApplication.instance() or QApplication([])
+
+
+@pytest.fixture
+def sample():
+    """JSON сценария-образца, каждый раз свежая копия."""
+    with open(SAMPLE_SCENARIO, encoding="utf-8") as file:
+        return json.load(file)
+
+
+@pytest.fixture
+def buffer(monkeypatch, tmp_path, sample):
+    """BUFFER_DATA с образцом; кэш (журнал и т.п.) пишется во временный каталог."""
+    monkeypatch.chdir(tmp_path)
+    data = main.Scenario.fromJson(sample)
+    monkeypatch.setattr(main, "BUFFER_DATA", data)
+    return data
+
+
+def settle(app, ms=50):
+    """Прокручивает цикл событий: таймеры холста и истории срабатывают через несколько мс."""
+    end = time.monotonic() + ms / 1000
+    while time.monotonic() < end:
+        app.processEvents()
+
+
+@pytest.fixture
+def window(app, monkeypatch, tmp_path, sample):
+    """Главное окно с образцом, загруженным из временной папки."""
+    monkeypatch.chdir(tmp_path)
+    path = tmp_path / "scenario.json"
+    path.write_text(json.dumps(sample, ensure_ascii=False), encoding="utf-8")
+    window = main.MainWindow()
+    settle(app)  # recoverSession запускается из цикла событий
+    window.loadScenario(str(path))
+    while main.SCENARIO_LOADER.isLoading():
+        app.processEvents()
+    settle(app)
+    yield window
+    main.JOURNAL.shutdown()
+    window.close()
+    window.deleteLater()
+    settle(app)
@@ -0,0 +1,56 @@
+import os
+
+import main
+
+
+def writeFile(path, data=b"png"):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as file:
+        file.write(data)
+
+
+def staleScan(index, roots):
+    """Фоновая сверка, запущенная сейчас, но завершившаяся позже."""
+    generation = index.startGeneration(roots)
+    return index.scanFolders(roots, {}), generation
+
+
+def test_stale_scan_does_not_overwrite_refresh(monkeypatch, tmp_path):
+    monkeypatch.chdir(tmp_path)
+    writeFile(os.path.join("backgrounds", "a.png"))
+    index = main.AssetIndex(str(tmp_path / "index.json"))
+    scanned, generation = staleScan(index, ["backgrounds"])
+
+    writeFile(os.path.join("backgrounds", "b.png"))
+    index.rescanNow("backgrounds")
+    index._onScanned(["backgrounds"], scanned, generation)
+
+    assert sorted(index.folders["backgrounds"]) == ["a.png", "b.png"]
+
+
+def test_stale_scan_keeps_other_folders(monkeypatch, tmp_path):
+    monkeypatch.chdir(tmp_path)
+    writeFile(os.path.join("sprites", "basic", "a.png"))
+    writeFile(os.path.join("sprites", "Amaya", "a.png"))
+    index = main.AssetIndex(str(tmp_path / "index.json"))
+    scanned, generation = staleScan(index, ["sprites"])
+
+    writeFile(os.path.join("sprites", "basic", "b.png"))
+    index.rescanNow(os.path.join("sprites", "basic"))
+    index._onScanned(["sprites"], scanned, generation)
+
+    assert sorted(index.folders[os.path.join("sprites", "basic")]) == ["a.png", "b.png"]
+    assert sorted(index.folders[os.path.join("sprites", "Amaya")]) == ["a.png"]
+
+
+def test_newer_scan_replaces_refresh(monkeypatch, tmp_path):
+    monkeypatch.chdir(tmp_path)
+    writeFile(os.path.join("backgrounds", "a.png"))
+    index = main.AssetIndex(str(tmp_path / "index.json"))
+    index.rescanNow("backgrounds")
+
+    os.remove(os.path.join("backgrounds", "a.png"))
+    scanned, generation = staleScan(index, ["backgrounds"])
+    index._onScanned(["backgrounds"], scanned, generation)
+
+    assert index.folders["backgrounds"] == {}
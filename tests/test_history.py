@@ -0,0 +1,135 @@
+import copy
+
+import pytest
+
+from conftest import settle
+import main
+from main import BatchEdit, UndoHistory, UndoStep
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0
+
+    def elapsed(self):
+        return self.now
+
+
+@pytest.fixture
+def history(buffer):
+    history = UndoHistory()
+    history.clock = FakeClock()
+    history.watch("1")
+    return history
+
+
+def editSprite(history, x, ms=100):
+    """Шаг спинбокса X спрайта: правка кадра и checkpoint, как после valueChanged."""
+    history.clock.now += ms
+    main.BUFFER_DATA["1"].sprites[0].position.x = x
+    history.checkpoint()
+
+
+def test_spinbox_steps_merge(history, sample):
+    for x in range(421, 431):
+        editSprite(history, x)
+    assert len(history.undoSteps) == 1
+    assert history.undoSteps[0].changes == [("1", ("sprite", "0", "position", "x"), 420, 430)]
+
+    history.undo()
+    assert main.BUFFER_DATA.toJson() == sample
+
+
+def test_pause_or_other_field_starts_new_step(history):
+    editSprite(history, 421)
+    editSprite(history, 422, ms=main.SETTINGS["undo_merge_ms"] + 1)
+    history.clock.now += 100
+    main.BUFFER_DATA["1"].sprites[0].position.y = 90
+    history.checkpoint()
+    assert len(history.undoSteps) == 3
+
+
+def test_steps_back_to_start_drop_out(history):
+    editSprite(history, 421)
+    editSprite(history, 420)
+    assert not history.canUndo()
+
+
+def test_batch_undo_redo(history, sample):
+    changes = BatchEdit.shiftSprites(list(main.BUFFER_DATA), 10, -5)
+    BatchEdit.apply(changes)
+    history.pushBatch(changes)
+    shifted = main.BUFFER_DATA.toJson()
+    assert shifted["2"]["sprite"]["0"]["position"] == {"x": 770, "y": 55}
+
+    assert history.undo() == (UndoStep.inverse(changes), True)
+    assert main.BUFFER_DATA.toJson() == sample
+    assert history.redo() == (changes, True)
+    assert main.BUFFER_DATA.toJson() == shifted
+    assert len(history.undoSteps) == 1 and not history.canRedo()
+
+
+def test_batch_is_not_merged_into(history):
+    changes = BatchEdit.shiftSprites(["1"], 1, 0)
+    BatchEdit.apply(changes)
+    history.pushBatch(changes)
+    editSprite(history, 500)
+    assert [step.batch for step in history.undoSteps] == [True, False]
+
+
+def test_new_edit_clears_redo(history, sample):
+    editSprite(history, 421)
+    history.undo()
+    assert history.canRedo()
+
+    editSprite(history, 300, ms=main.SETTINGS["undo_merge_ms"] + 1)
+    assert not history.canRedo()
+    expected = copy.deepcopy(sample)
+    expected["1"]["sprite"]["0"]["position"]["x"] = 300
+    assert main.BUFFER_DATA.toJson() == expected
+
+
+def test_frame_changed_outside_history_resets_it(history):
+    editSprite(history, 421)
+    main.BUFFER_DATA["1"] = main.Frame.fromJson({})
+    history.shadow = main.BUFFER_DATA["1"].toJson()
+    assert history.undo() is None
+    assert not history.canUndo() and not history.canRedo()
+
+
+def tickSpinbox(app, spinbox, values):
+    for value in values:
+        spinbox.setValue(value)
+        settle(app, 20)
+    settle(app)
+
+
+def test_spinbox_ticks_after_selecting_sprite_undo_at_once(app, window, sample):
+    window.openFrame("1")
+    settle(app)
+    # У первого спрайта настроек анимации нет, у второго — есть
+    for index in (0, 1):
+        window.selectSprite(index)
+        original = sample["1"]["sprite"][str(index)]["position"]["x"]
+        tickSpinbox(app, window.spritesPositionXSpinbox, range(original + 1, original + 6))
+    assert len(main.UNDO_HISTORY.undoSteps) == 2
+
+    window.undoEdit()
+    window.undoEdit()
+    assert not main.UNDO_HISTORY.canUndo()
+    assert main.BUFFER_DATA["1"].toJson() == main.Frame.fromJson(sample["1"]).toJson()
+
+
+def test_undo_keeps_selected_sprite(app, window, monkeypatch):
+    monkeypatch.setitem(main.SETTINGS, "undo_merge_ms", 0)
+    window.openFrame("1")
+    settle(app)
+    window.selectSprite(1)
+    tickSpinbox(app, window.spritesPositionXSpinbox, [1101])
+    tickSpinbox(app, window.spritesPositionXSpinbox, [1102])
+
+    window.undoEdit()
+    assert window.id == 1
+    assert window.spritesPositionXSpinbox.value() == 1101
+    window.redoEdit()
+    assert window.spritesPositionXSpinbox.value() == 1102
@@ -0,0 +1,133 @@
+import copy
+import json
+
+import pytest
+
+from conftest import settle
+import main
+from main import MISSING, ScenarioJournal, jsonDiff, jsonPatch
+
+
+def patched(old, new):
+    data = copy.deepcopy(old)
+    for path, before, after in jsonDiff(old, new):
+        assert jsonPatch(data, path, before, after)
+    return data
+
+
+@pytest.mark.parametrize("old, new", [
+    ({"a": {"b": {"c": 1}}}, {"a": {"b": {"c": 2, "d": "x"}}}),
+    ({"list": [1, 2, 3]}, {"list": [1, 2]}),
+    ({"list": [1]}, {"list": [1, {"x": 0}, 3]}),
+    ({"keep": 1, "gone": {"deep": True}}, {"keep": 1}),
+    ({"flag": 1}, {"flag": True}),
+    ({"a": None}, {"a": {"b": None}}),
+])
+def test_patch_applies_diff(old, new):
+    assert patched(old, new) == new
+
+
+def test_patch_applies_diff_between_frames(sample):
+    old = sample["2"]
+    new = copy.deepcopy(old)
+    new["sprite"]["0"]["position"]["x"] += 10
+    new["sprite"]["1"] = copy.deepcopy(sample["1"]["sprite"]["0"])
+    new["sprite"]["count"] = 2
+    del new["background"]["animationSettings"]
+    del new["transition"]
+    assert patched(old, new) == new
+
+
+def test_patch_rejects_stale_old_value():
+    data = {"a": {"b": 2}}
+    assert not jsonPatch(data, ["a", "b"], 1, 3)
+    assert not jsonPatch(data, ["a", "c"], 1, MISSING)
+    assert not jsonPatch(data, ["x", "b"], MISSING, 1)
+    assert data == {"a": {"b": 2}}
+
+
+def writeJournal(path, base, records, tail=""):
+    with open(path, "w", encoding="utf-8") as file:
+        for record in [{"op": "base", "file": base}] + records:
+            file.write(json.dumps(record, ensure_ascii=False) + "\n")
+        file.write(tail)
+
+
+def test_replay_journal_onto_base(buffer, sample, tmp_path):
+    new_frame = copy.deepcopy(sample["0"])
+    new_frame["text"]["text"] = "Новый кадр"
+    records = [
+        {"op": "set", "key": "1", "path": ["text", "text"], "old": "Опять зонт забыла...", "new": "Зонт!"},
+        {"op": "del", "key": "2", "path": ["transition"], "old": "fade"},
+        {"op": "set", "key": "3", "path": ["ui", "charaEmotionBackgroundScale"], "new": {"x": 1, "y": 1}},
+        {"op": "add", "key": "4", "frame": new_frame},
+        {"op": "batch", "changes": [["0", ["ui", "chapter"], "Глава 1", "Пролог"],
+                                    ["1", ["ui", "chapter"], "Глава 1", "Пролог"]]},
+    ]
+    journal = tmp_path / "journal.jsonl"
+    # Оборванная последняя строка — запись, прерванная падением
+    writeJournal(journal, "scenario.json", records, tail='{"op": "set", "key": "0", "pa')
+
+    base, read = ScenarioJournal.read(str(journal))
+    assert base == "scenario.json"
+    assert read == records
+
+    applied, added, changed = ScenarioJournal.replay(read)
+    assert applied == len(records)
+    assert added == ["4"]
+    assert sorted(changed) == ["0", "1", "2", "3"]
+
+    expected = copy.deepcopy(sample)
+    expected["1"]["text"]["text"] = "Зонт!"
+    del expected["2"]["transition"]
+    expected["3"]["ui"]["charaEmotionBackgroundScale"] = {"x": 1, "y": 1}
+    expected["4"] = new_frame
+    expected["0"]["ui"]["chapter"] = expected["1"]["ui"]["chapter"] = "Пролог"
+    assert main.BUFFER_DATA.toJson() == expected
+
+
+def test_replay_stops_at_conflict(buffer, sample):
+    records = [
+        {"op": "set", "key": "0", "path": ["comment"], "old": "вступление", "new": "пролог"},
+        # Пакет целиком не применяется: второе старое значение не совпадает
+        {"op": "batch", "changes": [["1", ["comment"], "", "a"], ["2", ["comment"], "изменен", "b"]]},
+        {"op": "set", "key": "3", "path": ["comment"], "old": "", "new": "c"},
+    ]
+    applied, added, changed = ScenarioJournal.replay(records)
+    assert (applied, added, changed) == (1, [], ["0"])
+    expected = copy.deepcopy(sample)
+    expected["0"]["comment"] = "пролог"
+    assert main.BUFFER_DATA.toJson() == expected
+
+
+def journalRecords():
+    main.JOURNAL.flush()
+    main.JOURNAL.pool.waitForDone()
+    return ScenarioJournal.read(main.JOURNAL.path)[1]
+
+
+def test_browsing_is_not_an_edit(app, window, sample):
+    for key in sample:
+        window.openFrame(key)
+        settle(app)
+    records = journalRecords()
+    # Инспектор дописал значения по умолчанию (фон эмоции кадра 3), но правок нет
+    assert records and all(record.get("auto") for record in records)
+    assert ScenarioJournal.userEdits(records) == 0
+
+
+def test_edit_after_defaults_replays_onto_base(app, window, sample, monkeypatch):
+    window.openFrame("3")
+    settle(app)
+    window.uiCharaBackgroundScaleX.setValue(0.5)
+    settle(app)
+    window.openFrame("0")
+    settle(app)
+    records = journalRecords()
+    assert ScenarioJournal.userEdits(records) == 1
+    edited = main.BUFFER_DATA.toJson()
+
+    monkeypatch.setattr(main, "BUFFER_DATA", main.Scenario.fromJson(sample))
+    applied, _, _ = ScenarioJournal.replay(records)
+    assert applied == len(records)
+    assert main.BUFFER_DATA.toJson() == edited
@@ -0,0 +1,17 @@
+from main import PlaybackStats
+
+
+def test_summary_of_same_millisecond_ticks():
+    stats = PlaybackStats(60)
+    stats.tick(5.0)
+    stats.tick(5.0)
+    assert stats.summary().startswith("0.0 / 60 FPS")
+
+
+def test_summary_counts_dropped_frames():
+    stats = PlaybackStats(50)
+    for now in (0, 20, 40, 100, 120):
+        stats.tick(now)
+    assert stats.dropped == 2
+    summary = stats.summary()
+    assert summary.startswith("33.3 / 50 FPS") and summary.endswith("dropped 2 of 6")
@@ -0,0 +1,71 @@
+import io
+import json
+
+import pytest
+
+from conftest import SAMPLE_SCENARIO
+from main import Frame, Scenario, ScenarioReader, ScenarioSaveTask
+
+
+def test_round_trip(sample):
+    assert Scenario.fromJson(sample).toJson() == sample
+
+
+def test_round_trip_keeps_key_order(sample):
+    text = json.dumps(sample, ensure_ascii=False)
+    assert json.dumps(Scenario.fromJson(sample).toJson(), ensure_ascii=False) == text
+
+
+def test_unknown_and_missing_keys(sample):
+    frame = Frame.fromJson(sample["2"])
+    assert frame.extra == {"transition": "fade"}
+    assert frame.text.extra == {"voice": "kat_0021.ogg"}
+    # В старом файле нет позиции и масштаба фона эмоции — они и не появляются
+    assert "charaEmotionBackgroundPosition" not in Frame.fromJson(sample["3"]).toJson()["ui"]
+
+
+def test_sprite_count_follows_list(sample):
+    frame = Frame.fromJson(sample["1"])
+    frame.sprites.pop()
+    data = frame.toJson()["sprite"]
+    assert data["count"] == 1 and "1" not in data
+
+
+def writeScenario(snapshot, compact):
+    file = io.StringIO()
+    ScenarioSaveTask(None, "", snapshot, compact).write(file)
+    return file.getvalue()
+
+
+def test_save_writes_same_text(sample):
+    with open(SAMPLE_SCENARIO, encoding="utf-8") as file:
+        text = file.read()
+    assert writeScenario(Scenario.fromJson(sample).toJson(), False) == text
+    assert json.loads(writeScenario(Scenario.fromJson(sample).toJson(), True)) == sample
+    assert writeScenario({}, False) == json.dumps({}, indent=4)
+
+
+def readFrames(data, read_size=None):
+    reader = ScenarioReader(io.BytesIO(data))
+    if read_size is not None:
+        reader.READ_SIZE = read_size
+    return list(reader.frames())
+
+
+def test_reader_matches_json_load(sample):
+    data = json.dumps(sample, ensure_ascii=False, indent=4).encode("utf-8")
+    # Маленький блок — кадры и пробелы режутся границами блоков
+    for read_size in (None, 7):
+        assert dict(readFrames(data + b"\n \r\n\t", read_size)) == sample
+    assert readFrames(b"{ } \n") == []
+
+
+@pytest.mark.parametrize("tail", [b" x", b"{}", b"\n,", b"}"])
+def test_reader_rejects_trailing_data(sample, tail):
+    data = json.dumps(sample, ensure_ascii=False).encode("utf-8")
+    for text in (data + tail, b"{}" + tail):
+        with pytest.raises(ValueError):
+            json.loads(text)
+        for read_size in (None, 3):
+            with pytest.raises(ValueError):
+                readFrames(text, read_size)
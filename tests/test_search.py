@@ -0,0 +1,54 @@
+import pytest
+
+import main
+from main import FrameSearchIndex
+
+
+@pytest.fixture
+def index(buffer):
+    return FrameSearchIndex()
+
+
+@pytest.mark.parametrize("query, keys", [
+    ("зонт", ["1"]),
+    ("chara:amaya глава", ["1", "3"]),
+    ('chara:amaya chapter:"глава 1"', ["1"]),
+    ('"глава 1" -chara:amaya', ["0", "2"]),
+    ("sprite:katsu*", ["1", "2"]),
+    ("sprite:basic", ["1", "2"]),
+    ("sprite:splash* name:amaya", ["3"]),
+    ('bg:"копия 11"', ["2", "3"]),
+    ("дожд*", ["0"]),
+    ("sprite:amaya/amaya_b*", ["1"]),
+    ("-chara:amaya", ["0", "2"]),
+    ("chara:amaya зонт спасибо", []),
+    ("", []),
+])
+def test_search(index, query, keys):
+    assert index.search(query) == (keys, "")
+
+
+def test_unknown_field(index):
+    assert index.search("voice:kat") == ([], "Unknown field: voice")
+
+
+def test_update_after_edit(index):
+    assert index.search("зонт")[0] == ["1"]
+    main.BUFFER_DATA["1"].text.text = "Дождь кончился."
+    main.BUFFER_DATA["4"] = main.Frame.fromJson({"text": {"text": "Снова дождь"}})
+    index.updateKeys(["1", "4"])
+    assert index.search("зонт")[0] == []
+    assert index.search("дожд*")[0] == ["0", "1", "4"]
+
+
+def test_prefix_of_hyphenated_word(index):
+    main.BUFFER_DATA["4"] = main.Frame.fromJson({"text": {"text": "Katsu-chan waves"}})
+    assert index.search("katsu-chan")[0] == ["4"]
+    assert index.search("katsu-ch*")[0] == ["4"]
+
+
+def test_watched_frame_reindexed_before_query(index):
+    index.search("")
+    index.watch("2")
+    main.BUFFER_DATA["2"].text.charaName = "Amaya"
+    assert index.search("chara:amaya")[0] == ["1", "2", "3"]